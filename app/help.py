@@ -92,6 +92,12 @@ def display_cli_help():
     Terminal.inst().message("\t --paper-mode instanciate paper mode trader and simulate as best as possible.")
     Terminal.inst().message("\t --backtest process a backtesting, uses paper mode traders and data history avalaible in the database.")
     Terminal.inst().message("\t --timestep=<seconds> Timestep in seconds to increment the backesting. More precise is more accurate but need more computing simulation. Adjust to at least fits to the minimal candles size uses in the backtested strategies. Default is 60 seconds.")
+    Terminal.inst().message("\t --shards=<count> in backtesting mode only, distribute the markets of the appliances over count processes. The shards are synchronized at each timestep and the results are merged at the end (non interactive).")
+    Terminal.inst().message("\t --optimize --sweep=<name> backtest the profile for each parameters combination of the named sweep (SWEEPS of appliance.py), with --from and --to, and write the ranked results table. Optionals --broker, --market and --timeframe (0 for ticks) preload the market data once.")
+    Terminal.inst().message("\t --workers=<count> number of processes of the parameters sweep. Default is the number of CPUs.")
+    Terminal.inst().message("\t --optimize --timeframe=0 validate, sort and de-duplicate the tick files of --broker and --market (comma separated) between --from and --to, update their index and write a gaps report. Unchanged files are skipped, and the current month too because a running watcher appends to its file.")
+    Terminal.inst().message("\t --market-hours=<hours> always (default), forex, stock, indice or HH:MM-HH:MM (UTC, monday to friday). Only the open market time counts for the ticks gaps.")
+    Terminal.inst().message("\t --max-gap=<seconds> ticks gaps detection threshold in seconds of open market time. Default is 3600.")
     Terminal.inst().message("\t --time-factor=<factor> in backtesting mode only allow the user to change the time factor and permit to interact during the backtesting. Default speed factor is as fast as possible.")
     Terminal.inst().message("\t --check-data @todo Process a test on candles data. Check if there is inconsitencies into the time of the candles and if there is some gaps. The test is done only on the defined range of time.")
     Terminal.inst().message("\t --from=<YYYY-MM-DDThh:mm:ss> define the date time from which start the backtesting, fetcher or binarizer. If ommited use whoole data set (take care).")
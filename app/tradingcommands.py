@@ -202,6 +202,44 @@ class InfoCommand(Command):
         return args, 0
 
 
+class MemoryCommand(Command):
+
+    SUMMARY = "<appliance-id> <appliance-market-id> to get the memory usage of the ticks and candles of the instruments."
+
+    def __init__(self, strategy_service):
+        super().__init__('memory', 'MEM')
+
+        self._strategy_service = strategy_service
+
+    def execute(self, args):
+        if len(args) > 2:
+            Terminal.inst().action("Invalid parameters", view='status')
+            return False
+
+        data = {}
+
+        if len(args) >= 1:
+            data['appliance'] = args[0]
+
+        if len(args) == 2:
+            data['market-id'] = args[1]
+
+        self._strategy_service.command(Strategy.COMMAND_MEMORY_INFO, data)
+
+        return True
+
+    def completion(self, args, tab_pos, direction):
+        if len(args) <= 1:
+            return self.iterate(0, self._strategy_service.appliances_identifiers(), args, tab_pos, direction)
+
+        elif len(args) <= 2:
+            appliance = self._strategy_service.appliance(args[0])
+            if appliance:
+                return self.iterate(1, appliance.symbols_ids(), args, tab_pos, direction)
+
+        return args, 0
+
+
 class LongCommand(Command):
 
     SUMMARY = "to manually create to a new trade in LONG direction"
@@ -916,6 +954,9 @@ def register_trading_commands(commands_handler, trader_service, strategy_service
     cmd = InfoCommand(trader_service, strategy_service)
     commands_handler.register(cmd)
 
+    cmd = MemoryCommand(strategy_service)
+    commands_handler.register(cmd)
+
     cmd = ChartCommand(strategy_service, monitor_service)
     commands_handler.register(cmd)
 
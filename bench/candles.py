@@ -0,0 +1,227 @@
+# @date 2019-06-19
+# @author Frederic SCHERMA
+# @license Copyright (c) 2019 Dream Overflow
+# Candle objects versus CandleBatch, memory usage and throughput of the common operations,
+# per tick versus vectorized generation of candles from ticks, and per timeframe versus cascaded generation.
+#
+# Usage : python -m bench.candles [num-candles]
+
+import sys
+import copy
+import timeit
+import tracemalloc
+
+import numpy as np
+
+from instrument.instrument import Instrument, Candle, CandleBatch
+from instrument.candlegenerator import CandleGenerator, CandleCascade
+from strategy.indicator.price.price import PriceIndicator
+
+
+class GenericCopyCandle(Candle):
+    """
+    Candle without the __copy__ method, to measure the generic copy.copy.
+    """
+
+    __slots__ = ()
+    __copy__ = None
+
+
+def make_candles(num, tf=60.0):
+    t0 = 1546300800.0  # 2019-01-01
+    prices = 100.0 + np.cumsum(np.random.normal(0.0, 0.1, num))
+
+    candles = []
+
+    for i, p in enumerate(prices.tolist()):
+        candle = Candle(t0 + i * tf, tf)
+
+        candle.set_bid_ohlc(p, p + 0.2, p - 0.2, p + 0.05)
+        candle.set_ofr_ohlc(p + 0.01, p + 0.21, p - 0.19, p + 0.06)
+        candle.set_volume(float(i % 100))
+
+        candles.append(candle)
+
+    return candles
+
+
+def make_ticks(num, interval=0.5):
+    t0 = 1546300800.0  # 2019-01-01
+    timestamps = t0 + np.cumsum(np.random.exponential(interval, num))
+    bids = 100.0 + np.cumsum(np.random.normal(0.0, 0.01, num))
+
+    return list(zip(timestamps.tolist(), bids.tolist(), (bids + 0.01).tolist(), np.random.rand(num).tolist()))
+
+
+def per_tick_generate(generator, ticks):
+    """
+    Previous implementation of CandleGenerator.generate_from_ticks.
+    """
+    to_candles = []
+
+    for tick in ticks:
+        to_candle = generator.update_from_tick(tick)
+        if to_candle:
+            to_candles.append(to_candle)
+
+    return to_candles
+
+
+def make_unordered_ticks(num, interval):
+    """
+    Ticks with some swapped consecutive ticks and some repeated timestamps, ignored by the generators.
+    """
+    ticks = make_ticks(num, interval)
+
+    for i in np.random.randint(1, num, num // 50).tolist():
+        ticks[i-1], ticks[i] = ticks[i], ticks[i-1]
+
+    for i in np.random.randint(1, num, num // 50).tolist():
+        ticks[i] = (ticks[i-1][0],) + ticks[i][1:]
+
+    return ticks
+
+
+def candle_values(candles):
+    return [(c.timestamp, c.timeframe, c.bid_open, c.bid_high, c.bid_low, c.bid_close,
+            c.ofr_open, c.ofr_high, c.ofr_low, c.ofr_close, c.volume, c.ended) for c in candles if c is not None]
+
+
+def check_tick_array(ticks, tf):
+    """
+    Generate from random size blocks of ticks, the vectorized version must give exactly the same closed candles,
+    and the same current candle after each block, than the per tick update.
+    """
+    ticks_array = np.array(ticks)
+
+    per_tick = CandleGenerator(0, tf)
+    vectorized = CandleGenerator(0, tf)
+
+    i = 0
+
+    while i < len(ticks):
+        n = np.random.randint(1, 5000)
+
+        expected = per_tick_generate(per_tick, ticks[i:i+n])
+        generated = vectorized.generate_from_tick_array(ticks_array[i:i+n])
+
+        assert candle_values(generated) == candle_values(expected), "%s closed candles differ" % tf
+        assert candle_values([vectorized.current]) == candle_values([per_tick.current]), "%s current candle differs" % tf
+
+        i += n
+
+
+def measure_memory(func):
+    tracemalloc.start()
+    result = func()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return result, current
+
+
+def bench(label, before, after, number, names=("objects", "batch")):
+    t0 = timeit.timeit(before, number=number) / number
+    t1 = timeit.timeit(after, number=number) / number
+
+    print("%-24s %s %9.3f ms  %s %9.3f ms  speedup x%.1f" % (label, names[0], t0 * 1000.0, names[1], t1 * 1000.0, t0 / t1 if t1 > 0 else 0.0))
+
+
+def main(argv):
+    num = int(argv[1]) if len(argv) > 1 else 100000
+
+    np.random.seed(0)
+
+    #
+    # memory
+    #
+
+    candles, candles_bytes = measure_memory(lambda: make_candles(num))
+    batch, batch_bytes = measure_memory(lambda: CandleBatch.from_candles(candles))
+
+    print("%i candles : objects %.1f bytes/candle, batch %.1f bytes/candle" % (num, candles_bytes / num, batch_bytes / num))
+
+    #
+    # throughput
+    #
+
+    # same results
+    gen_list = CandleGenerator(60, 3600)
+    gen_batch = CandleGenerator(60, 3600)
+
+    generated = gen_list.generate_from_candles(candles)
+    generated_batch = gen_batch.generate_from_candles(batch)
+
+    assert len(generated) == len(generated_batch)
+    assert np.allclose(CandleBatch.from_candles(generated).data, generated_batch.data)
+    assert np.allclose(PriceIndicator.Price(PriceIndicator.PRICE_HLC3, candles), PriceIndicator.Price(PriceIndicator.PRICE_HLC3, batch))
+
+    candle = candles[-1]
+    generic = GenericCopyCandle(candle.timestamp, candle.timeframe)
+
+    bench("copy.copy", lambda: [copy.copy(generic) for i in range(0, 10000)], lambda: [copy.copy(candle) for i in range(0, 10000)], 5, ("generic", "__copy__"))
+
+    bench("generate 1m to 1h", lambda: CandleGenerator(60, 3600).generate_from_candles(candles),
+            lambda: CandleGenerator(60, 3600).generate_from_candles(batch), 3)
+
+    price = PriceIndicator(60)
+    bench("price indicator", lambda: price.compute(0, candles), lambda: price.compute(0, batch), 3)
+
+    def add_objects():
+        instrument = Instrument("bench", "BENCH", "BENCH")
+        instrument.add_candle(candles, 10000)
+
+    def add_batch():
+        instrument = Instrument("bench", "BENCH", "BENCH")
+        instrument.add_candle(batch, 10000)
+
+    bench("instrument add candles", add_objects, add_batch, 3)
+
+    #
+    # candles from ticks
+    #
+
+    ticks = make_ticks(num)
+    ticks_array = np.array(ticks)
+
+    generated = per_tick_generate(CandleGenerator(0, 60), ticks)
+    generated_vec = CandleGenerator(0, 60).generate_from_ticks(ticks)
+
+    assert [(c.timestamp, c.bid_high, c.ofr_low, c.bid_close) for c in generated] == [(c.timestamp, c.bid_high, c.ofr_low, c.bid_close) for c in generated_vec]
+
+    # exactly the same candles, from 1m to monthly over about 4 months
+    unordered_ticks = make_unordered_ticks(num, 120.0)
+
+    for tf in (60, 300, 900, 3600, 4*3600, 86400, Instrument.TF_WEEK, Instrument.TF_MONTH):
+        check_tick_array(unordered_ticks, tf)
+
+    for label, tf in (("generate ticks to 1m", 60), ("generate ticks to 1h", 3600)):
+        bench(label, lambda: per_tick_generate(CandleGenerator(0, tf), ticks),
+                lambda: CandleGenerator(0, tf).generate_from_ticks(ticks), 3, ("per tick", "list"))
+
+        bench(label, lambda: per_tick_generate(CandleGenerator(0, tf), ticks),
+                lambda: CandleGenerator(0, tf).generate_from_tick_array(ticks_array), 3, ("per tick", "array"))
+
+    #
+    # multiple timeframes from ticks, by blocks of 100 ticks as in live
+    #
+
+    tfs = (60, 300, 900, 3600, 4*3600, 86400, Instrument.TF_WEEK)
+    blocks = [ticks[i:i+100] for i in range(0, len(ticks), 100)]
+
+    def per_timeframe():
+        generators = [CandleGenerator(0, tf) for tf in tfs]
+        for block in blocks:
+            for generator in generators:
+                generator.generate_from_ticks(block)
+
+    def cascaded():
+        cascade = CandleCascade(0, tfs)
+        for block in blocks:
+            cascade.generate_from_ticks(block)
+
+    bench("generate %i timeframes" % len(tfs), per_timeframe, cascaded, 3, ("per tf", "cascade"))
+
+
+if __name__ == "__main__":
+    main(sys.argv)
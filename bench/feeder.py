@@ -0,0 +1,88 @@
+# @date 2019-06-10
+# @author Frederic SCHERMA
+# @license Copyright (c) 2019 Dream Overflow
+# Strategy data feeder benchmark, tuple versus batch feed over a synthetic month of ticks.
+#
+# Usage : python -m bench.feeder [num-ticks] [timestep]
+
+import sys
+import time
+import tempfile
+import pathlib
+
+import numpy as np
+
+from datetime import datetime
+
+from common.utils import UTC
+
+from instrument.instrument import Instrument
+from database.tickstorage import TickStreamer
+from strategy.strategydatafeeder import StrategyDataFeeder
+
+
+BROKER_ID = "bench"
+MARKET_ID = "BENCHUSD"
+
+
+def make_month(markets_path, from_date, num_ticks):
+    """
+    Write a synthetic binary month of ticks, uniformly distributed over the month.
+    """
+    data_path = pathlib.Path(markets_path, BROKER_ID, MARKET_ID, 'T')
+    data_path.mkdir(parents=True)
+
+    to_date = from_date.replace(month=from_date.month+1)
+    t0 = from_date.timestamp()
+    t1 = to_date.timestamp()
+
+    ticks = np.empty(num_ticks, dtype=TickStreamer.TICK_DTYPE)
+    ticks['t'] = np.linspace(t0, t1, num_ticks, endpoint=False)
+    ticks['b'] = 100.0 + np.cumsum(np.random.normal(0.0, 0.01, num_ticks))
+    ticks['o'] = ticks['b'] + 0.01
+    ticks['v'] = np.random.random(num_ticks)
+
+    ticks.tofile(str(data_path / ("%s%s.dat" % (from_date.strftime('%Y%m'), MARKET_ID))))
+
+    return to_date
+
+
+def run(markets_path, from_date, to_date, timestep, batch):
+    instrument = Instrument(MARKET_ID, MARKET_ID, MARKET_ID)
+
+    feeder = StrategyDataFeeder(None, MARKET_ID, [], True, batch)
+    feeder._tick_streamer = TickStreamer(markets_path, BROKER_ID, MARKET_ID, from_date, to_date, 32768, True, batch)
+    feeder.set_instrument(instrument)
+
+    count = 0
+    timestamp = from_date.timestamp()
+
+    begin = time.perf_counter()
+
+    while not feeder.finished():
+        timestamp += timestep
+        feeder.feed(timestamp)
+
+        # as the strategy-trader does once the ticks are processed
+        count += instrument.num_samples(Instrument.TF_TICK)
+        instrument.clear_ticks()
+
+    return count, time.perf_counter() - begin
+
+
+def main(argv):
+    num_ticks = int(argv[1]) if len(argv) > 1 else 2000000
+    timestep = float(argv[2]) if len(argv) > 2 else 60.0
+
+    from_date = datetime(2019, 1, 1, tzinfo=UTC())
+
+    with tempfile.TemporaryDirectory() as markets_path:
+        to_date = make_month(markets_path, from_date, num_ticks)
+
+        for label, batch in (("tuple", False), ("batch", True)):
+            count, elapsed = run(markets_path, from_date, to_date, timestep, batch)
+            print("%s feed: %i ticks in %.3fs, %.0f ticks/s" % (label, count, elapsed, count / elapsed if elapsed > 0 else 0.0))
+
+
+if __name__ == "__main__":
+    main(sys.argv)
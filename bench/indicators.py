@@ -0,0 +1,125 @@
+# @date 2019-06-25
+# @author Frederic SCHERMA
+# @license Copyright (c) 2019 Dream Overflow
+# Incremental indicators versus TA-Lib, equivalence of the push/replace sequences and per sample throughput
+# compared to a TA-Lib computation over the last samples at each new sample.
+#
+# Usage : python -m bench.indicators [num-samples] [depth]
+
+import sys
+import timeit
+
+import numpy as np
+
+import talib
+
+from strategy.indicator.sma.sma import SMAIndicator
+from strategy.indicator.ema.ema import EMAIndicator
+from strategy.indicator.rsi.rsi import RSIIndicator
+from strategy.indicator.atr.atr import ATRIndicator
+from strategy.indicator.macd.macd import MACDIndicator
+from strategy.indicator.bollingerbands.bollingerbands import BollingerBandsIndicator
+from strategy.indicator.stochastic.stochastic import StochasticIndicator
+
+
+def make_ohlc(num):
+    close = 100.0 + np.cumsum(np.random.normal(0.0, 0.5, num))
+    high = close + np.random.uniform(0.0, 1.0, num)
+    low = close - np.random.uniform(0.0, 1.0, num)
+
+    return high, low, close
+
+
+# name, indicator factory, input columns (of high, low, close), outputs of the indicator after an update,
+# TA-Lib reference as a tuple of arrays
+CASES = (
+    ('sma', lambda: SMAIndicator(60, 14), (2,), lambda ind: (ind.last,),
+        lambda h, l, c: (talib.SMA(c, 14),)),
+    ('ema', lambda: EMAIndicator(60, 14), (2,), lambda ind: (ind.last,),
+        lambda h, l, c: (talib.EMA(c, 14),)),
+    ('rsi', lambda: RSIIndicator(60, 14), (2,), lambda ind: (ind.last,),
+        lambda h, l, c: (talib.RSI(c, 14) * 0.01,)),
+    ('atr', lambda: ATRIndicator(60, 14), (0, 1, 2), lambda ind: (ind.last,),
+        lambda h, l, c: (talib.ATR(h, l, c, timeperiod=14),)),
+    ('macd', lambda: MACDIndicator(60, 12, 26, 9), (2,), lambda ind: (ind.last, ind.last_signal),
+        lambda h, l, c: talib.MACD(c, fastperiod=12, slowperiod=26, signalperiod=9)[0:2]),
+    ('bollingerbands', lambda: BollingerBandsIndicator(60, 20), (2,), lambda ind: (ind.last_top, ind.last_ma, ind.last_bottom),
+        lambda h, l, c: talib.BBANDS(c, timeperiod=20, nbdevup=2, nbdevdn=2, matype=0)),
+    ('stochastic', lambda: StochasticIndicator(60, 9, 3), (0, 1, 2), lambda ind: (ind.last_k, ind.last_d),
+        lambda h, l, c: talib.STOCHF(h, l, c, fastk_period=9, fastd_period=3, fastd_matype=0)),
+)
+
+
+def run_incremental(factory, columns, outputs, data, replaces):
+    """
+    Update an indicator sample per sample. With replaces > 0 each sample is first pushed with random values, then
+    replaced replaces - 1 times with others random values, and finally by the real one, as a non consolidated candle.
+    @return Tuple of arrays, one per output.
+    """
+    indicator = factory()
+    inputs = [data[c] for c in columns]
+    results = []
+
+    for i in range(len(data[0])):
+        sample = [x[i] for x in inputs]
+
+        if replaces:
+            for k in range(replaces):
+                noise = np.random.normal(0.0, 0.5)
+                indicator.update(float(i), *[x + noise for x in sample], new=(k == 0))
+
+            indicator.update(float(i), *sample, new=False)
+        else:
+            indicator.update(float(i), *sample)
+
+        results.append(outputs(indicator))
+
+    return tuple(np.array(r, dtype=np.float64) for r in zip(*results))
+
+
+def check(name, factory, columns, outputs, reference, data):
+    expected = reference(*data)
+
+    for replaces in (0, 3):
+        results = run_incremental(factory, columns, outputs, data, replaces)
+
+        for result, ref in zip(results, expected):
+            # compare where TA-Lib is defined, the incremental version can be defined before (MACD signal)
+            defined = ~np.isnan(ref)
+
+            assert defined.any(), name
+            assert np.allclose(result[defined], ref[defined], rtol=1e-9, atol=1e-9), "%s differs with %i replaces" % (name, replaces)
+
+
+def main(argv):
+    num = int(argv[1]) if len(argv) > 1 else 5000
+    depth = int(argv[2]) if len(argv) > 2 else 200
+
+    np.random.seed(0)
+
+    data = make_ohlc(num)
+
+    for name, factory, columns, outputs, reference in CASES:
+        check(name, factory, columns, outputs, reference, data)
+
+    for name, factory, columns, outputs, reference in CASES:
+        inputs = [data[c] for c in columns]
+
+        def incremental():
+            indicator = factory()
+            for sample in zip(*(x.tolist() for x in inputs)):
+                indicator.update(0.0, *sample)
+
+        def batch():
+            for i in range(depth, num):
+                reference(*(x[i-depth:i] for x in data))
+
+        t0 = timeit.timeit(batch, number=1) / (num - depth)
+        t1 = timeit.timeit(incremental, number=1) / num
+
+        print("%s : talib over %i samples %.2f us  incremental %.2f us  speedup x%.1f" % (
+            name, depth, t0 * 1e6, t1 * 1e6, t0 / t1 if t1 > 0 else 0.0))
+
+
+if __name__ == "__main__":
+    main(sys.argv)
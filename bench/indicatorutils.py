@@ -0,0 +1,85 @@
+# @date 2019-06-11
+# @author Frederic SCHERMA
+# @license Copyright (c) 2019 Dream Overflow
+# Indicator utils micro-benchmark, previous pure Python loops versus the vectorized versions.
+#
+# Usage : python -m bench.indicatorutils [num-samples] [length]
+
+import sys
+import timeit
+
+import numpy as np
+
+from strategy.indicator.utils import MM_n, MMexp_n
+from strategy.indicator.rsi.rsi import RSIIndicator
+
+
+def loop_MM_n(N, data):
+    """
+    Previous implementation of MM_n.
+    """
+    out = np.zeros(len(data))
+
+    for j in range(N):
+        out[j] = np.average(data[:j+1])
+    for (j,d) in enumerate(data[N-1:]):
+        out[j+N-1] = np.average(data[j:j+N])
+
+    return out
+
+
+def loop_MMexp_n(N, data):
+    """
+    Previous implementation of MMexp_n (without previous value).
+    """
+    An = 2.0 / (1.0 + N)
+    out = np.zeros(len(data))
+
+    for j in range(N):
+        out[j] = np.average(data[:j+1])
+    for (j,d) in enumerate(data[N-1:]):
+        out[j+N-1] = d*An + (1-An)*out[j+N-2]
+
+    return out
+
+
+def loop_RSI_n(N, data):
+    """
+    Previous implementation of RSIIndicator.RSI_n.
+    """
+    variations = np.diff(data)
+
+    h = np.array(list(map(lambda x: max(x,0.000000001), variations)))
+    b = np.array(list(map(lambda x: abs(min(x,-0.000000001)), variations)))
+
+    hn = loop_MM_n(N, h)
+    bn = loop_MM_n(N, b)
+
+    return hn/(hn+bn)
+
+
+def bench(label, before, after, number):
+    t0 = timeit.timeit(before, number=number) / number
+    t1 = timeit.timeit(after, number=number) / number
+
+    print("%-8s loop %9.3f ms  vectorized %9.3f ms  speedup x%.1f" % (label, t0 * 1000.0, t1 * 1000.0, t0 / t1 if t1 > 0 else 0.0))
+
+
+def main(argv):
+    num = int(argv[1]) if len(argv) > 1 else 10000
+    N = int(argv[2]) if len(argv) > 2 else 14
+
+    data = 100.0 + np.cumsum(np.random.normal(0.0, 1.0, num))
+
+    # same results
+    assert np.allclose(loop_MM_n(N, data), MM_n(N, data))
+    assert np.allclose(loop_MMexp_n(N, data), MMexp_n(N, data))
+    assert np.allclose(loop_RSI_n(N, data), RSIIndicator.RSI_n(N, data))
+
+    bench("MM_n", lambda: loop_MM_n(N, data), lambda: MM_n(N, data), 5)
+    bench("MMexp_n", lambda: loop_MMexp_n(N, data), lambda: MMexp_n(N, data), 5)
+    bench("RSI_n", lambda: loop_RSI_n(N, data), lambda: RSIIndicator.RSI_n(N, data), 5)
+
+
+if __name__ == "__main__":
+    main(sys.argv)
@@ -0,0 +1,94 @@
+# @date 2019-06-24
+# @author Frederic SCHERMA
+# @license Copyright (c) 2019 Dream Overflow
+# Closed trades statistics, iteration over the per strategy-trader records versus the vectorized trade journal.
+#
+# Usage : python -m bench.journal [num-markets] [num-trades]
+
+import sys
+import math
+import timeit
+
+import numpy as np
+
+from strategy.tradejournal import TradeJournal
+
+
+def iterate(records):
+    """
+    Stats computed from the list of records dict of each market, as kept by the strategy-traders.
+    """
+    markets = {}
+    rates = []
+
+    for market_id, trades in records.items():
+        perf = best = worst = 0.0
+        success = failed = roe = 0
+
+        for r in trades:
+            rate = r['rate']
+            perf += rate
+            best = max(best, rate)
+            worst = min(worst, rate)
+
+            if rate > 0.0:
+                success += 1
+            elif rate < 0.0:
+                failed += 1
+            else:
+                roe += 1
+
+            rates.append((r['xt'], rate))
+
+        markets[market_id] = (perf, best, worst, success, failed, roe)
+
+    cumulated = peak = drawdown = 0.0
+    for xt, rate in sorted(rates):
+        cumulated += rate
+        peak = max(peak, cumulated)
+        drawdown = max(drawdown, peak - cumulated)
+
+    n = len(rates)
+    mean = sum(rate for xt, rate in rates) / n
+    std = math.sqrt(sum((rate - mean) ** 2 for xt, rate in rates) / (n - 1))
+
+    return markets, drawdown, mean / std
+
+
+def vectorized(journal):
+    snapshot = journal.snapshot()
+    return snapshot.market_stats(), snapshot.stats()
+
+
+def main(argv):
+    num = int(argv[1]) if len(argv) > 1 else 100
+    count = int(argv[2]) if len(argv) > 2 else 100000
+
+    np.random.seed(0)
+
+    journal = TradeJournal()
+    records = {}
+
+    markets = np.random.randint(0, num, count).tolist()
+    rates = np.random.normal(0.001, 0.02, count).tolist()
+
+    for i, (m, rate) in enumerate(zip(markets, rates)):
+        market_id = "M%i" % m
+        journal.append(market_id, i, 1, i * 60.0, i * 60.0 + 30.0, 100.0, 100.0 * (1.0 + rate), 1.0, 0.0015, rate)
+        records.setdefault(market_id, []).append({'id': i, 'xt': i * 60.0 + 30.0, 'rate': rate})
+
+    ref = iterate(records)
+    res = vectorized(journal)
+
+    assert np.isclose(ref[1], res[1]['max-drawdown']) and np.isclose(ref[2], res[1]['sharpe'])
+    assert all(np.isclose(ref[0][k][0], v['perf']) and ref[0][k][3] == v['success'] for k, v in res[0].items())
+
+    t0 = timeit.timeit(lambda: iterate(records), number=3) / 3
+    t1 = timeit.timeit(lambda: vectorized(journal), number=3) / 3
+
+    print("%i markets, %i trades : iterate %.3f ms  journal %.3f ms  speedup x%.1f" % (
+        num, count, t0 * 1000.0, t1 * 1000.0, t0 / t1 if t1 > 0 else 0.0))
+
+
+if __name__ == "__main__":
+    main(sys.argv)
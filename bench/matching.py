@@ -0,0 +1,82 @@
+# @date 2019-06-22
+# @author Frederic SCHERMA
+# @license Copyright (c) 2019 Dream Overflow
+# Paper trader resting orders, scan of each order at each price update versus the matching engine.
+#
+# Usage : python -m bench.matching [num-orders] [num-updates]
+
+import sys
+import timeit
+
+import numpy as np
+
+from trader.order import Order
+from trader.position import Position
+from trader.connector.papertrader.matching import MatchingEngine
+
+
+def make_orders(num, price):
+    orders = []
+
+    for i, offset in enumerate(np.random.uniform(1.0, 50.0, num).tolist()):
+        order = Order(None, "BENCH")
+        order.set_order_id(str(i))
+        order.quantity = 1.0
+
+        if i % 2:
+            order.direction = Position.LONG
+            order.order_type = Order.ORDER_LIMIT
+            order.order_price = price - offset
+        else:
+            order.direction = Position.SHORT
+            order.order_type = Order.ORDER_STOP
+            order.order_price = price - offset
+
+        orders.append(order)
+
+    return orders
+
+
+def scan(orders, bid, ofr):
+    """
+    Check of each order, as the previous per order iteration of PaperTrader.update.
+    """
+    results = []
+
+    for order in orders:
+        if order.direction == Position.LONG:
+            if ofr <= order.order_price:
+                results.append((order, order.order_price))
+        elif bid <= order.order_price:
+            results.append((order, bid))
+
+    return results
+
+
+def main(argv):
+    num = int(argv[1]) if len(argv) > 1 else 10000
+    updates = int(argv[2]) if len(argv) > 2 else 1000
+
+    np.random.seed(0)
+
+    price = 100.0
+    orders = make_orders(num, price)
+
+    engine = MatchingEngine("BENCH")
+    for order in orders:
+        engine.add(order)
+
+    # prices near the market, crossing a few orders
+    bids = (price + np.cumsum(np.random.normal(0.0, 0.05, updates))).tolist()
+
+    assert sorted(o.order_id for o, p in scan(orders, 98.0, 98.01)) == sorted(o.order_id for o, p in engine.match(98.0, 98.01))
+
+    t0 = timeit.timeit(lambda: [scan(orders, bid, bid + 0.01) for bid in bids], number=3) / 3
+    t1 = timeit.timeit(lambda: [engine.match(bid, bid + 0.01) for bid in bids], number=3) / 3
+
+    print("%i resting orders, %i updates : scan %.3f ms  engine %.3f ms  speedup x%.1f" % (
+        num, updates, t0 * 1000.0, t1 * 1000.0, t0 / t1 if t1 > 0 else 0.0))
+
+
+if __name__ == "__main__":
+    main(sys.argv)
@@ -0,0 +1,104 @@
+# @date 2019-06-15
+# @author Frederic SCHERMA
+# @license Copyright (c) 2019 Dream Overflow
+# OHLC insert benchmark, per row upsert versus bulk insert (COPY for PostgreSQL, multi-rows VALUES for MySQL).
+# Needs the configured local database, the inserted rows are deleted at the end.
+#
+# Usage : python -m bench.ohlcinsert [num-rows] [batch-size] [config-path]
+
+import sys
+import time
+
+from config.utils import databases
+from database.database import Database
+
+
+BROKER_ID = "bench"
+MARKET_ID = "BENCHUSD"
+
+
+def make_ohlcs(num_rows, market_id):
+    """
+    Synthetic 1m ohlcs with the store_market_ohlc format.
+    """
+    t0 = 1546300800000  # 2019-01-01 in ms
+
+    return [(BROKER_ID, market_id, t0 + i * 60000, 60,
+            '1.0', '1.2', '0.9', '1.1', '1.01', '1.21', '0.91', '1.11', '100.0') for i in range(0, num_rows)]
+
+
+def per_row_upsert(db, ohlcs):
+    """
+    One parameterized upsert statement per row.
+    """
+    cursor = db._db.cursor()
+
+    if type(db).__name__ == 'PgSql':
+        conflict = "ON CONFLICT (broker_id, market_id, timestamp, timeframe) DO UPDATE SET bid_close = EXCLUDED.bid_close"
+    else:
+        conflict = "ON DUPLICATE KEY UPDATE bid_close = VALUES(bid_close)"
+
+    for mk in ohlcs:
+        cursor.execute(' '.join((
+            "INSERT INTO ohlc(broker_id, market_id, timestamp, timeframe, bid_open, bid_high, bid_low, bid_close, ask_open, ask_high, ask_low, ask_close, volume)",
+            "VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)", conflict)), mk)
+
+    db._db.commit()
+
+
+def bulk_insert(db, ohlcs, batch_size):
+    for i in range(0, len(ohlcs), batch_size):
+        db.insert_ohlcs(ohlcs[i:i+batch_size])
+
+    db._db.commit()
+
+
+def cleanup(db):
+    cursor = db._db.cursor()
+    cursor.execute("DELETE FROM ohlc WHERE broker_id = %s", (BROKER_ID,))
+    db._db.commit()
+
+
+def bench(label, func, num_rows):
+    t = time.time()
+    func()
+    elapsed = time.time() - t
+
+    print("%-24s %8.3fs %10i rows/s" % (label, elapsed, int(num_rows / elapsed) if elapsed > 0 else 0))
+
+
+def main(argv):
+    num_rows = int(argv[1]) if len(argv) > 1 else 20000
+    batch_size = int(argv[2]) if len(argv) > 2 else Database.OHLC_BATCH_SIZE
+    config_path = argv[3] if len(argv) > 3 else './user/config'
+
+    config = databases(config_path) or {}
+
+    # only the connection, without the database thread
+    Database.create({'config-path': config_path})
+    db = Database.inst()
+
+    db.connect(config)
+    db.setup_ohlc_sql()
+
+    print("%i ohlcs, batch of %i, using %s" % (num_rows, batch_size, type(db).__name__))
+
+    try:
+        cleanup(db)
+
+        ohlcs = make_ohlcs(num_rows, MARKET_ID)
+
+        bench("per row insert", lambda: per_row_upsert(db, ohlcs), num_rows)
+        bench("per row update", lambda: per_row_upsert(db, ohlcs), num_rows)
+
+        cleanup(db)
+
+        bench("bulk insert", lambda: bulk_insert(db, ohlcs, batch_size), num_rows)
+        bench("bulk update", lambda: bulk_insert(db, ohlcs, batch_size), num_rows)
+    finally:
+        cleanup(db)
+        db.disconnect()
+
+
+if __name__ == "__main__":
+    main(sys.argv)
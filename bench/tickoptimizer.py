@@ -0,0 +1,128 @@
+# @date 2019-06-25
+# @author Frederic SCHERMA
+# @license Copyright (c) 2019 Dream Overflow
+# Tick files optimizer, in memory tuples sort and de-duplication versus the blocks external merge, and verify pass.
+#
+# Usage : python -m bench.tickoptimizer [num-ticks] [block-size]
+
+import os
+import sys
+import time
+import shutil
+import tempfile
+import pathlib
+
+import numpy as np
+
+from datetime import datetime
+
+from common.utils import UTC
+
+from database.tickstorage import TickStreamer
+from database.optimizer import TickOptimizer
+
+
+BROKER_ID = "bench"
+MARKET_ID = "BENCHUSD"
+
+
+def make_month(pathname, from_date, num_ticks):
+    """
+    Write a synthetic month of ticks, with 10% of distinct ticks sharing the timestamp of the previous one, 10% of
+    duplicates and partially unordered (two interleaved watchers).
+    """
+    to_date = from_date.replace(month=from_date.month+1)
+
+    ticks = np.empty(num_ticks, dtype=TickStreamer.TICK_DTYPE)
+    ticks['t'] = np.round(np.linspace(from_date.timestamp(), to_date.timestamp(), num_ticks, endpoint=False), 3)
+    ticks['b'] = 100.0 + np.cumsum(np.random.normal(0.0, 0.01, num_ticks))
+    ticks['o'] = ticks['b'] + 0.01
+    ticks['v'] = np.random.randint(1, 10, num_ticks)
+
+    same = np.random.randint(1, num_ticks, num_ticks // 10)
+    ticks['t'][same] = ticks['t'][same-1]
+
+    dups = ticks[np.sort(np.random.randint(0, num_ticks, num_ticks // 10))]
+
+    ticks = np.concatenate((ticks, dups))
+    ticks = ticks[np.argsort(ticks['t'] + np.random.uniform(0.0, 60.0, len(ticks)), kind='stable')]
+
+    ticks.tofile(pathname)
+
+
+def python_sort(pathname):
+    """
+    In memory first occurrence of the tuples and stable sort by timestamp.
+    """
+    ticks = np.fromfile(pathname, dtype=TickStreamer.TICK_DTYPE)
+    return sorted(dict.fromkeys(ticks.tolist()), key=lambda tick: tick[0])
+
+
+def check_same_timestamp_order(markets_path, from_date):
+    """
+    The distinct ticks sharing a timestamp keep their order, only the later duplicates are removed, by the run
+    and by the merge of the runs.
+    """
+    t = from_date.timestamp()
+    ticks = [(t, 3.0, 3.1, 1.0), (t+1, 2.0, 2.1, 1.0), (t+1, 1.0, 1.1, 1.0), (t+1, 2.0, 2.1, 1.0), (t, 1.0, 1.1, 2.0),
+            (t+1, 0.5, 0.6, 1.0), (t+1, 1.0, 1.1, 1.0), (t+2, 1.0, 1.1, 1.0)]
+
+    pathname = '/'.join((markets_path, BROKER_ID, MARKET_ID, 'T', "%s%s.dat" % (from_date.strftime('%Y%m'), MARKET_ID)))
+    np.array(ticks, dtype=TickStreamer.TICK_DTYPE).tofile(pathname)
+
+    for block_size in (1 << 20, 2):
+        TickOptimizer(markets_path, BROKER_ID, MARKET_ID, block_size=block_size).optimize(force=True)
+
+        assert np.fromfile(pathname, dtype=TickStreamer.TICK_DTYPE).tolist() == [ticks[0], ticks[4], ticks[1], ticks[2], ticks[5], ticks[7]]
+
+    os.remove(pathname)
+
+
+def main(argv):
+    num = int(argv[1]) if len(argv) > 1 else 2000000
+    block_size = int(argv[2]) if len(argv) > 2 else 1 << 20
+
+    np.random.seed(0)
+
+    markets_path = tempfile.mkdtemp()
+
+    try:
+        data_path = pathlib.Path(markets_path, BROKER_ID, MARKET_ID, 'T')
+        data_path.mkdir(parents=True)
+
+        from_date = datetime(2019, 5, 1, tzinfo=UTC())
+
+        check_same_timestamp_order(markets_path, datetime(2019, 4, 1, tzinfo=UTC()))
+        pathname = '/'.join((str(data_path), "%s%s.dat" % (from_date.strftime('%Y%m'), MARKET_ID)))
+
+        make_month(pathname, from_date, num)
+        total = os.path.getsize(pathname) // TickStreamer.TICK_SIZE
+
+        t = time.time()
+        ref = python_sort(pathname)
+        t0 = time.time() - t
+
+        optimizer = TickOptimizer(markets_path, BROKER_ID, MARKET_ID, block_size=block_size)
+
+        t = time.time()
+        reports = optimizer.optimize()
+        t1 = time.time() - t
+
+        assert reports[0]['rewritten'] and reports[0]['count'] == len(ref)
+        assert np.fromfile(pathname, dtype=TickStreamer.TICK_DTYPE).tolist() == ref
+
+        # verify pass of the optimized file
+        t = time.time()
+        reports = optimizer.optimize(force=True)
+        t2 = time.time() - t
+
+        assert not reports[0]['rewritten']
+
+        print("%i ticks, block %i : python %.3f s  rewrite %.3f s  speedup x%.1f  verify %.3f s (%.1f M ticks/s)" % (
+            total, block_size, t0, t1, t0 / t1 if t1 > 0 else 0.0, t2, len(ref) / t2 / 1000000.0 if t2 > 0 else 0.0))
+    finally:
+        shutil.rmtree(markets_path)
+
+
+if __name__ == "__main__":
+    main(sys.argv)
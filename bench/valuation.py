@@ -0,0 +1,125 @@
+# @date 2019-06-23
+# @author Frederic SCHERMA
+# @license Copyright (c) 2019 Dream Overflow
+# Paper trader asset account valuation, full recomputation versus incremental, one market update per step.
+#
+# Usage : python -m bench.valuation [num-assets] [num-steps]
+
+import sys
+import timeit
+
+import numpy as np
+
+from trader.asset import Asset
+from trader.market import Market
+from trader.connector.papertrader.valuation import AccountValuation
+
+
+class BenchAccount(object):
+    currency = "BTC"
+    alt_currency = "USDT"
+
+
+class BenchTrader(object):
+    """
+    The part of the paper trader used by the valuation.
+    """
+
+    def __init__(self):
+        self.account = BenchAccount()
+        self._assets = {}
+        self._markets = {}
+        self._positions = {}
+
+
+def full(trader):
+    """
+    Previous implementation of PaperTrader.update for asset accounts.
+    """
+    account = trader.account
+
+    balance = 0.0
+    margin_balance = 0.0
+    profit_loss = 0.0
+
+    for k, asset in trader._assets.items():
+        asset_name = asset.symbol
+        free = asset.free
+        locked = asset.locked
+
+        if free or locked:
+            if asset_name == account.alt_currency:
+                market = trader._markets.get(account.currency+account.alt_currency)
+                base_price = 1.0 / market.price if market else 1.0
+            elif asset_name != account.currency:
+                market = trader._markets.get(asset_name+account.currency)
+                base_price = market.price if market else 1.0
+            else:
+                base_price = 1.0
+
+            if asset.quote == account.alt_currency:
+                market = trader._markets.get(account.currency+account.alt_currency)
+                base_exchange_rate = market.price if market else 1.0
+            elif asset.quote == account.currency:
+                base_exchange_rate = 1.0
+            else:
+                market = trader._markets.get(asset.quote+account.currency)
+                base_exchange_rate = 1.0 / market.price if market else 1.0
+
+            balance += free * base_price + locked * base_price
+            margin_balance += free * base_price
+            profit_loss += asset.profit_loss_market / base_exchange_rate
+
+    return balance, margin_balance, profit_loss
+
+
+def main(argv):
+    num = int(argv[1]) if len(argv) > 1 else 500
+    steps = int(argv[2]) if len(argv) > 2 else 2000
+
+    np.random.seed(0)
+
+    trader = BenchTrader()
+
+    for i, price in enumerate(np.random.uniform(0.0001, 0.01, num).tolist()):
+        name = "C%i" % i
+
+        market = Market(name + "BTC", name + "BTC")
+        market.set_base(name, name)
+        market.set_quote("BTC", "BTC")
+        market.bid = price
+        market.ofr = price * 1.001
+        trader._markets[market.market_id] = market
+
+        asset = Asset(trader, name)
+        asset.quote = "BTC"
+        asset.set_quantity(0.0, 10.0)
+        asset.update_price(0, 0, price, "BTC")
+        trader._assets[name] = asset
+
+    valuation = AccountValuation(trader)
+    valuation.update_assets()
+
+    market_ids = list(trader._markets.keys())
+    updated = [market_ids[i] for i in np.random.randint(0, num, steps).tolist()]
+
+    def incremental():
+        for market_id in updated:
+            valuation.market_updated(market_id)
+            valuation.update_assets()
+
+    def recompute():
+        for market_id in updated:
+            full(trader)
+
+    assert np.allclose(full(trader), (valuation.balance, valuation.margin_balance, valuation.asset_profit_loss))
+
+    t0 = timeit.timeit(recompute, number=3) / 3
+    t1 = timeit.timeit(incremental, number=3) / 3
+
+    print("%i assets, %i steps : full %.3f ms  incremental %.3f ms  speedup x%.1f" % (
+        num, steps, t0 * 1000.0, t1 * 1000.0, t0 / t1 if t1 > 0 else 0.0))
+
+
+if __name__ == "__main__":
+    main(sys.argv)
@@ -46,6 +46,17 @@ class Service(Notifiable):
 	def notify(self, signal_type, source_name, signal_data):
 		pass
 
+	def subscribe(self, notifiable, signal_types=None, source_names=None, market_ids=None, queue=None):
+		"""
+		Subscribe to the signals of this service, filtered by signal type, source name and market id.
+		@see Notifier.subscribe
+		"""
+		self.lock()
+		subscription = self._notifier.subscribe(notifiable, signal_types, source_names, market_ids, queue)
+		self.unlock()
+
+		return subscription
+
 	def add_listener(self, notifiable):
 		self.lock()
 		self._notifier.add_listener(notifiable)
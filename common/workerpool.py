@@ -66,17 +66,19 @@ class Worker(threading.Thread):
             self._running = False
 
     def __process_once(self):
-        count_down, job = self._pool.next_job()
+        # block until a job, a ping or a stop
+        entry = self._pool.wait_job(self)
 
-        if job:
-            job[0](*job[1])
+        if entry:
+            count_down, job, key, start = entry
 
-        if count_down:
-            count_down.done()
+            try:
+                job[0](*job[1])
+            finally:
+                self._pool.job_done(key, start)
 
-        if not job:
-            # avoid CPU usage
-            time.sleep(0.00001)
+                if count_down:
+                    count_down.done()
 
         if self._ping:
             # process the pong message
@@ -105,7 +107,11 @@ class Worker(threading.Thread):
     @property
     def uid(self):
         return self._uid
-    
+
+    @property
+    def pinged(self):
+        return self._ping
+
     def ping(self):
         self._ping = True
 
@@ -114,8 +120,16 @@ class Worker(threading.Thread):
 
 
 class WorkerPool(object):
+    """
+    Pool of workers threads, sleeping on a condition until a job is queued.
+
+    A job can be given an affinity key (ie the instrument), then jobs of the same key are never processed
+    concurrently and are processed in their order of arrival. The next ones wait in a per key queue until
+    the running one is done.
+    """
 
-    __slots__ = '_num_workers', '_workers', '_queue', '_mutex'
+    __slots__ = '_num_workers', '_workers', '_queue', '_mutex', '_condition', '_keys', '_pending', \
+                '_num_jobs', '_total_wait', '_max_wait', '_total_exec', '_max_depth'
 
     def __init__(self, num_workers=None):
         if not num_workers:
@@ -126,6 +140,17 @@ class WorkerPool(object):
         self._workers = [Worker(self, i) for i in range(0, self._num_workers)]
         self._queue = collections.deque()
         self._mutex = threading.RLock()
+        self._condition = threading.Condition(self._mutex)
+
+        self._keys = set()   # keys having a queued or running job
+        self._pending = {}   # per key deque of jobs waiting for the running one
+
+        # metrics
+        self._num_jobs = 0
+        self._total_wait = 0.0
+        self._max_wait = 0.0
+        self._total_exec = 0.0
+        self._max_depth = 0
 
     def start(self):
         for worker in self._workers:
@@ -133,29 +158,131 @@ class WorkerPool(object):
 
     def stop(self):
         for worker in self._workers:
-            if worker._running:
-                worker.stop()
+            worker.stop()
+
+        # wake up the sleeping workers
+        with self._condition:
+            self._condition.notify_all()
+
+        for worker in self._workers:
+            if worker.is_alive():
                 worker.join()
 
     def ping(self):
         for worker in self._workers:
             worker.ping()
 
-    def add_job(self, count_down, job):
-        self._mutex.acquire()
-        self._queue.append((count_down, job))
-        self._mutex.release()
+        with self._condition:
+            self._condition.notify_all()
 
-    def next_job(self):
-        count_down = None
-        job = None
+        stats = self.stats()
+
+        Terminal.inst().action("WorkerPool queue depth %i (max %i), %i jobs, avg latency %.3fms (max %.3fms), avg exec %.3fms" % (
+                stats['depth'], stats['max-depth'], stats['jobs'],
+                stats['avg-latency'] * 1000.0, stats['max-latency'] * 1000.0, stats['avg-exec'] * 1000.0), view='content')
+
+    def add_job(self, count_down, job, key=None):
+        """
+        @param count_down Optional CountDown, done once the job is processed.
+        @param job Tuple (callable, args).
+        @param key Optional affinity key, jobs having the same key are never processed concurrently.
+        """
+        with self._condition:
+            entry = (count_down, job, key, time.time())
 
-        self._mutex.acquire()
-        if len(self._queue):
-            count_down, job = self._queue.popleft()
-        self._mutex.release()
+            if key is not None and key in self._keys:
+                # wait for the queued or running job of the same key
+                self._pending.setdefault(key, collections.deque()).append(entry)
+            else:
+                if key is not None:
+                    self._keys.add(key)
 
-        return count_down, job
+                self._queue.append(entry)
+                self._condition.notify()
+
+            depth = self.__depth()
+            if depth > self._max_depth:
+                self._max_depth = depth
+
+    def next_job(self):
+        """
+        Non blocking version, returns (count_down, job, key, start time) or None.
+        """
+        with self._condition:
+            return self.__pop_job()
+
+    def wait_job(self, worker):
+        """
+        Block until there is a job, or the worker is stopped or pinged.
+        @return (count_down, job, key, start time) or None.
+        """
+        with self._condition:
+            while not self._queue and worker.running and not worker.pinged:
+                self._condition.wait()
+
+            return self.__pop_job()
+
+    def __pop_job(self):
+        if not self._queue:
+            return None
+
+        count_down, job, key, queued = self._queue.popleft()
+        start = time.time()
+
+        wait = start - queued
+        self._total_wait += wait
+        if wait > self._max_wait:
+            self._max_wait = wait
+
+        # the key is kept until the job is done
+        return count_down, job, key, start
+
+    def job_done(self, key, start):
+        with self._condition:
+            self._num_jobs += 1
+            self._total_exec += time.time() - start
+
+            if key is not None:
+                pending = self._pending.get(key)
+                if pending:
+                    # the next job of the same key can be processed now
+                    self._queue.append(pending.popleft())
+                    if not pending:
+                        del self._pending[key]
+
+                    self._condition.notify()
+                else:
+                    self._keys.discard(key)
 
     def new_count_down(self, n):
         return CountDown(n)
+
+    #
+    # metrics
+    #
+
+    def __depth(self):
+        if self._pending:
+            return len(self._queue) + sum(len(x) for x in self._pending.values())
+
+        return len(self._queue)
+
+    def queue_depth(self):
+        """
+        Number of queued jobs, including those waiting for their affinity key.
+        """
+        with self._condition:
+            return self.__depth()
+
+    def stats(self):
+        with self._condition:
+            num_jobs = self._num_jobs
+
+            return {
+                'depth': self.__depth(),
+                'max-depth': self._max_depth,
+                'jobs': num_jobs,
+                'avg-latency': self._total_wait / num_jobs if num_jobs else 0.0,
+                'max-latency': self._max_wait,
+                'avg-exec': self._total_exec / num_jobs if num_jobs else 0.0,
+            }
@@ -0,0 +1,397 @@
+# @date 2019-06-21
+# @author Frederic SCHERMA
+# @license Copyright (c) 2019 Dream Overflow
+# Shared asyncio websocket ingest, hosting the streams of any connectors into a single thread.
+
+import ssl
+import json
+import time
+import asyncio
+import threading
+import traceback
+import collections
+
+from urllib.parse import urlparse
+
+from autobahn.asyncio.websocket import WebSocketClientProtocol, WebSocketClientFactory
+
+try:
+    import orjson  # optional, faster decoding directly from the payload bytes
+except ImportError:
+    orjson = None
+
+import logging
+logger = logging.getLogger('siis.common.wsingest')
+error_logger = logging.getLogger('siis.error.common.wsingest')
+
+
+def decode_json(payload):
+    """
+    Decode a JSON payload (bytes), using orjson if available.
+    """
+    if orjson is not None:
+        return orjson.loads(payload)
+
+    return json.loads(payload.decode('utf8'))
+
+
+class IngestClientProtocol(WebSocketClientProtocol):
+
+    def onOpen(self):
+        self.factory.stream._opened(self)
+
+    def onMessage(self, payload, isBinary):
+        if isBinary:
+            return
+
+        try:
+            message = decode_json(payload)
+        except ValueError:
+            logger.warning("Invalid JSON message from %s" % self.factory.stream.name)
+        else:
+            self.factory.stream._received(message)
+
+    def onClose(self, wasClean, code, reason):
+        self.factory.stream._closed(self)
+
+        if not self.factory.closed.done():
+            self.factory.closed.set_result(code)
+
+
+class WebSocketStream(object):
+    """
+    A websocket client stream hosted by the ingest, reconnected on connection lost.
+
+    In direct mode the callback is called by the ingest thread at each message. In queued mode the messages are
+    buffered and the consumer calls drain from its own thread, and once max_pending messages are waiting the stream
+    stops reading its socket until the consumer catches up (backpressure up to the exchange).
+
+    @param callback Called with each decoded message.
+    @param on_open Optional, called by the ingest thread once (re)connected.
+    @param on_close Optional, called by the ingest thread once the connection is lost.
+    @param on_error Optional, called by the ingest thread once the reconnection is abandoned.
+    @param reconnect If False the stream is terminated at the first connection lost or failure, for the connectors
+        that must renew their authentication at each connection.
+    """
+
+    RECONNECT_DELAY = 0.1
+    MAX_RECONNECT_DELAY = 10.0
+    MAX_RETRIES = 5
+
+    def __init__(self, ingest, name, url, callback, headers=None, queued=False, max_pending=10000,
+                 on_open=None, on_close=None, on_error=None, reconnect=True):
+        self._ingest = ingest
+        self._name = name
+        self._url = url
+        self._callback = callback
+        self._headers = headers or {}
+        self._queued = queued
+        self._max_pending = max_pending
+
+        self._on_open = on_open
+        self._on_close = on_close
+        self._on_error = on_error
+        self._reconnect = reconnect
+
+        self._protocol = None
+        self._connected = threading.Event()
+        self._closing = False
+        self._retries = 0
+
+        self._pending = collections.deque()
+        self._paused = False
+
+        self._received_count = 0
+        self._paused_count = 0
+
+    @property
+    def name(self):
+        return self._name
+
+    @property
+    def url(self):
+        return self._url
+
+    @property
+    def headers(self):
+        return self._headers
+
+    @property
+    def connected(self):
+        return self._connected.is_set()
+
+    @property
+    def closing(self):
+        return self._closing
+
+    @property
+    def pending(self):
+        return len(self._pending)
+
+    @property
+    def received_count(self):
+        return self._received_count
+
+    @property
+    def paused_count(self):
+        """Number of times the reading was paused because of a slow consumer."""
+        return self._paused_count
+
+    def wait_connected(self, timeout=None):
+        """
+        Wait until connected and the on_open callback is done, returns False on timeout.
+        """
+        return self._connected.wait(timeout)
+
+    def send(self, message):
+        """
+        Send a message (a dict or list encoded as JSON, or a str). Thread safe.
+        """
+        if isinstance(message, (dict, list)):
+            message = json.dumps(message)
+
+        self._ingest.call_soon(self.__send, message.encode('utf8'))
+
+    def close(self):
+        """
+        Close the stream, without reconnection. Thread safe.
+        """
+        self._closing = True
+        self._ingest.call_soon(self.__close)
+
+    def drain(self, max_count=-1):
+        """
+        Call the callback for the pending messages in queued mode, from the consumer thread.
+        @return Number of processed messages.
+        """
+        count = 0
+
+        while self._pending and count != max_count:
+            self._callback(self._pending.popleft())
+            count += 1
+
+        if self._paused and len(self._pending) <= self._max_pending // 2:
+            self._paused = False
+            self._ingest.call_soon(self.__resume)
+
+        return count
+
+    #
+    # ingest thread side
+    #
+
+    def _opened(self, protocol):
+        self._protocol = protocol
+        self._retries = 0
+
+        logger.debug("Stream %s connected" % self._name)
+
+        try:
+            if self._on_open:
+                self._on_open()
+        finally:
+            # only once on_open is done, then the waiters see the state it defines
+            self._connected.set()
+
+    def _received(self, message):
+        self._received_count += 1
+
+        if not self._queued:
+            try:
+                self._callback(message)
+            except Exception as e:
+                error_logger.error(traceback.format_exc())
+
+            return
+
+        self._pending.append(message)
+
+        if len(self._pending) >= self._max_pending and not self._paused:
+            # let the socket buffers fill until the consumer drains
+            self._paused = True
+            self._paused_count += 1
+
+            if self._protocol and self._protocol.transport:
+                self._protocol.transport.pause_reading()
+
+    def _closed(self, protocol):
+        self._protocol = None
+        self._connected.clear()
+
+        logger.debug("Stream %s closed" % self._name)
+
+        if self._on_close:
+            self._on_close()
+
+    def _failed(self):
+        """
+        Connection lost or failed, returns the delay before a retry or None to abandon.
+        """
+        self._protocol = None
+        self._connected.clear()
+
+        if self._closing:
+            return None
+
+        self._retries += 1
+
+        if not self._reconnect or self._retries > WebSocketStream.MAX_RETRIES:
+            self._closing = True
+
+            if self._reconnect:
+                logger.error("Stream %s max reconnect retries reached" % self._name)
+
+            if self._on_error:
+                self._on_error()
+
+            return None
+
+        return min(WebSocketStream.RECONNECT_DELAY * 2 ** (self._retries - 1), WebSocketStream.MAX_RECONNECT_DELAY)
+
+    def __send(self, payload):
+        if self._protocol:
+            self._protocol.sendMessage(payload, isBinary=False)
+
+    def __close(self):
+        if self._protocol:
+            self._protocol.sendClose()
+
+    def __resume(self):
+        if self._protocol and self._protocol.transport:
+            self._protocol.transport.resume_reading()
+
+
+class WebSocketIngest(object):
+    """
+    Single asyncio event loop thread hosting the websocket client streams of any connectors, in place of a thread
+    (or a reactor) per connector. The messages are decoded into the loop thread, then delivered directly or queued
+    for the consumer with backpressure (@see WebSocketStream).
+
+    Singleton, started at the first stream.
+    """
+
+    __instance = None
+
+    @classmethod
+    def inst(cls):
+        if WebSocketIngest.__instance is None:
+            WebSocketIngest.__instance = WebSocketIngest()
+
+        return WebSocketIngest.__instance
+
+    @classmethod
+    def terminate(cls):
+        if WebSocketIngest.__instance is not None:
+            WebSocketIngest.__instance.stop()
+            WebSocketIngest.__instance = None
+
+    def __init__(self):
+        self._mutex = threading.Lock()
+        self._loop = None
+        self._thread = None
+        self._streams = []
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    @property
+    def streams(self):
+        return list(self._streams)
+
+    def start(self):
+        with self._mutex:
+            if self._thread is not None:
+                return
+
+            self._loop = asyncio.new_event_loop()
+
+            self._thread = threading.Thread(name="ws-ingest", target=self.run)
+            self._thread.daemon = True
+            self._thread.start()
+
+    def stop(self):
+        with self._mutex:
+            if self._thread is None:
+                return
+
+            streams = list(self._streams)
+            thread = self._thread
+
+        for stream in streams:
+            stream.close()
+
+        # let the close frames be sent
+        time.sleep(0.1)
+
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        thread.join()
+
+        with self._mutex:
+            self._loop.close()
+
+            self._loop = None
+            self._thread = None
+            self._streams = []
+
+    def run(self):
+        asyncio.set_event_loop(self._loop)
+
+        try:
+            self._loop.run_forever()
+        except Exception as e:
+            error_logger.error(traceback.format_exc())
+
+    def call_soon(self, func, *args):
+        """
+        Call a function into the loop thread. Thread safe.
+        """
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(func, *args)
+
+    def connect(self, name, url, callback, headers=None, queued=False, max_pending=10000,
+                on_open=None, on_close=None, on_error=None, reconnect=True):
+        """
+        Create and connect a stream (@see WebSocketStream for the parameters).
+        @return WebSocketStream
+        """
+        self.start()
+
+        stream = WebSocketStream(self, name, url, callback, headers, queued, max_pending,
+                                 on_open, on_close, on_error, reconnect)
+
+        with self._mutex:
+            self._streams.append(stream)
+
+        asyncio.run_coroutine_threadsafe(self.__run_stream(stream), self._loop)
+
+        return stream
+
+    async def __run_stream(self, stream):
+        parsed = urlparse(stream.url)
+        secure = parsed.scheme == 'wss'
+        port = parsed.port or (443 if secure else 80)
+
+        while not stream.closing:
+            factory = WebSocketClientFactory(stream.url, headers=stream.headers)
+            factory.protocol = IngestClientProtocol
+            factory.stream = stream
+            factory.closed = self._loop.create_future()
+
+            try:
+                await self._loop.create_connection(factory, parsed.hostname, port, ssl=ssl.create_default_context() if secure else None)
+
+                # wait until the connection is lost
+                await factory.closed
+            except Exception as e:
+                logger.warning("Stream %s connection failed : %s" % (stream.name, repr(e)))
+
+            delay = stream._failed()
+            if delay is None:
+                break
+
+            await asyncio.sleep(delay)
+
+        with self._mutex:
+            if stream in self._streams:
+                self._streams.remove(stream)
@@ -373,3 +373,34 @@ APPLIANCES = {
         }
     },
 }
+
+# Parameters sweeps for the optimizer (--optimize --sweep=<name>). Each run is a backtesting of the profile with the
+# strategy parameters of the appliance overrided by a combination. The parameters are given by dotted path.
+# In 'grid' mode each parameter is a list of values, or a tuple (start, stop, step), and any combination is tested.
+# In 'random' mode 'samples' combinations are drawn, a list by choice and a tuple (low, high) uniformly
+# (integers if low and high are integers).
+# The results are ranked by a key of the trade journal stats : perf, win-rate, sharpe, avg or max-drawdown (lesser is better).
+
+SWEEPS = {
+    'binance-altbtc-rsi': {
+        'appliance': 'binance-altbtc',
+        'mode': 'grid',
+        'rank': 'perf',
+        'parameters': {
+            'timeframes.hourly.constants.rsi_low': [0.2, 0.25, 0.3],
+            'timeframes.hourly.constants.rsi_high': [0.7, 0.75, 0.8],
+            'timeframes.hourly.indicators.atr': [('atr', 14, 2.5), ('atr', 21, 3.5)],
+        }
+    },
+    'binance-altbtc-random': {
+        'appliance': 'binance-altbtc',
+        'mode': 'random',
+        'samples': 20,
+        'seed': 0,
+        'rank': 'sharpe',
+        'parameters': {
+            'timeframes.hourly.constants.rsi_low': (0.15, 0.35),
+            'timeframes.hourly.depth': (20, 60),
+        }
+    },
+}
@@ -10,7 +10,8 @@ DATABASES = {
         'password': 'siis',
         'host': '127.0.0.1',
         'port': 5432,
-        'conn_max_age': 86400
+        'conn_max_age': 86400,
+        'ohlc_cache_size': 64*1024*1024  # in bytes, LRU cache of the last ohlcs
     }
 }
 
@@ -111,6 +111,24 @@ def profiles(config_path):
 	return default_config
 
 
+def sweeps(config_path):
+	from config import appliance
+	default_config = appliance.SWEEPS or {}
+
+	try:
+		spec = importlib.util.spec_from_file_location("config.appliance", '/'.join((config_path, 'appliance.py')))
+		mod = importlib.util.module_from_spec(spec)
+		spec.loader.exec_module(mod)
+		if hasattr(mod, 'SWEEPS'):
+			return mod.SWEEPS
+	except FileNotFoundError:
+		pass
+	except Exception as e:
+		logger.error(repr(e))
+
+	return default_config
+
+
 def monitoring(config_path):
 	from config import config
 	default_config = config.MONITORING or {}
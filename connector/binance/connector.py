@@ -52,21 +52,14 @@ class Connector(object):
 			self._session = Client(self.__api_key, self.__api_secret, None)
 
 		if self._ws is None and use_ws:
-			self._ws = BinanceSocketManager(self._session)
+			# messages are processed by the watcher thread (@see BinanceSocketManager.drain)
+			self._ws = BinanceSocketManager(self._session, queued=True)
 
 	def disconnect(self):
 		if self._ws:
 			self._ws.close()
 			self._ws = None
 
-			# but might be more general with a ref counter
-			from twisted.internet import reactor
-			try:
-				reactor.stop()
-			except:
-				# if not running avoid exception
-				pass
-
 		if self._session:
 			self._session = None
 
@@ -1,8 +1,9 @@
 # coding=utf-8
 
-from operator import itemgetter
 import time
 
+from instrument.orderbook import OrderBook
+
 from .websockets import BinanceSocketManager
 
 
@@ -16,34 +17,39 @@ class DepthCache(object):
 
         """
         self.symbol = symbol
-        self._bids = {}
-        self._asks = {}
+        self._order_book = OrderBook(symbol)
+
+    @property
+    def order_book(self):
+        """Sorted price levels of the cache
+
+        :return: OrderBook
+
+        """
+        return self._order_book
 
     def add_bid(self, bid):
-        """Add a bid to the cache
+        """Add a bid to the cache, a zero quantity removes the level
 
         :param bid:
         :return:
 
         """
-        self._bids[bid[0]] = float(bid[1])
-        if bid[1] == "0.00000000":
-            del self._bids[bid[0]]
+        self._order_book.set_bid(float(bid[0]), float(bid[1]))
 
     def add_ask(self, ask):
-        """Add an ask to the cache
+        """Add an ask to the cache, a zero quantity removes the level
 
         :param ask:
         :return:
 
         """
-        self._asks[ask[0]] = float(ask[1])
-        if ask[1] == "0.00000000":
-            del self._asks[ask[0]]
+        self._order_book.set_ask(float(ask[0]), float(ask[1]))
 
-    def get_bids(self):
-        """Get the current bids
+    def get_bids(self, depth=-1):
+        """Get the current bids, best first
 
+        :param depth: Optional number of levels, any if negative
         :return: list of bids with price and quantity as floats
 
         .. code-block:: python
@@ -56,27 +62,16 @@ class DepthCache(object):
                 [
                     0.00019459,
                     2384.0
-                ],
-                [
-                    0.00019158,
-                    5219.0
-                ],
-                [
-                    0.00019157,
-                    1180.0
-                ],
-                [
-                    0.00019082,
-                    287.0
                 ]
             ]
 
         """
-        return DepthCache.sort_depth(self._bids, reverse=True)
+        return [[price, quantity] for price, quantity in self._order_book.bids.top(depth)]
 
-    def get_asks(self):
-        """Get the current asks
+    def get_asks(self, depth=-1):
+        """Get the current asks, best first
 
+        :param depth: Optional number of levels, any if negative
         :return: list of asks with price and quantity as floats
 
         .. code-block:: python
@@ -89,31 +84,11 @@ class DepthCache(object):
                 [
                     0.00019699,
                     778.0
-                ],
-                [
-                    0.000197,
-                    64.0
-                ],
-                [
-                    0.00019709,
-                    1130.0
-                ],
-                [
-                    0.0001971,
-                    385.0
                 ]
             ]
 
         """
-        return DepthCache.sort_depth(self._asks, reverse=False)
-
-    @staticmethod
-    def sort_depth(vals, reverse=False):
-        """Sort bids or asks by price
-        """
-        lst = [[float(price), quantity] for price, quantity in vals.items()]
-        lst = sorted(lst, key=itemgetter(0), reverse=reverse)
-        return lst
+        return [[price, quantity] for price, quantity in self._order_book.asks.top(depth)]
 
 
 class DepthCacheManager(object):
@@ -156,11 +131,8 @@ class DepthCacheManager(object):
 
         res = self._client.get_order_book(symbol=self._symbol, limit=500)
 
-        # process bid and asks from the order book
-        for bid in res['bids']:
-            self._depth_cache.add_bid(bid)
-        for ask in res['asks']:
-            self._depth_cache.add_ask(ask)
+        # replace bid and asks from the order book
+        self._depth_cache.order_book.snapshot(res['bids'], res['asks'], res['lastUpdateId'])
 
         # set first update id
         self._last_update_id = res['lastUpdateId']
@@ -1,65 +1,19 @@
 # coding=utf-8
 
-import json
 import threading
 
-from autobahn.twisted.websocket import WebSocketClientFactory, WebSocketClientProtocol, connectWS
-from twisted.internet import reactor, ssl
-from twisted.internet.protocol import ReconnectingClientFactory
-from twisted.internet.error import ReactorAlreadyRunning
+from common.wsingest import WebSocketIngest
 
 from connector.binance.client import Client
 
 
-class BinanceClientProtocol(WebSocketClientProtocol):
+class BinanceSocketManager(object):
+    """
+    Binance websocket streams, hosted by the shared websocket ingest (@see common.wsingest).
 
-    def __init__(self):
-        super().__init__()
-
-    def onConnect(self, response):
-        # reset the delay after reconnecting
-        self.factory.resetDelay()
-
-    def onMessage(self, payload, isBinary):
-        if not isBinary:
-            try:
-                payload_obj = json.loads(payload.decode('utf8'))
-            except ValueError:
-                pass
-            else:
-                self.factory.callback(payload_obj)
-
-
-class BinanceReconnectingClientFactory(ReconnectingClientFactory):
-
-    # set initial delay to a short time
-    initialDelay = 0.1
-
-    maxDelay = 10
-
-    maxRetries = 5
-
-
-class BinanceClientFactory(WebSocketClientFactory, BinanceReconnectingClientFactory):
-
-    protocol = BinanceClientProtocol
-    _reconnect_error_payload = {
-        'e': 'error',
-        'm': 'Max reconnect retries reached'
-    }
-
-    def clientConnectionFailed(self, connector, reason):
-        self.retry(connector)
-        if self.retries > self.maxRetries:
-            self.callback(self._reconnect_error_payload)
-
-    def clientConnectionLost(self, connector, reason):
-        self.retry(connector)
-        if self.retries > self.maxRetries:
-            self.callback(self._reconnect_error_payload)
-
-
-class BinanceSocketManager(threading.Thread):
+    In queued mode the messages are buffered by each stream and the callbacks are called from the thread calling
+    drain (the watcher), else directly from the ingest thread.
+    """
 
     STREAM_URL = 'wss://stream.binance.com:9443/'
 
@@ -69,36 +23,39 @@ class BinanceSocketManager(threading.Thread):
 
     DEFAULT_USER_TIMEOUT = 30 * 60  # 30 minutes
 
-    def __init__(self, client, user_timeout=DEFAULT_USER_TIMEOUT):
+    _reconnect_error_payload = {
+        'e': 'error',
+        'm': 'Max reconnect retries reached'
+    }
+
+    def __init__(self, client, user_timeout=DEFAULT_USER_TIMEOUT, queued=False):
         """Initialise the BinanceSocketManager
 
         :param client: Binance API client
         :type client: binance.Client
         :param user_timeout: Custom websocket timeout
         :type user_timeout: int
+        :param queued: Buffer the messages until drain
+        :type queued: bool
 
         """
-        threading.Thread.__init__(self, name="binance-ws")
-
         self._conns = {}
         self._user_timer = None
         self._user_listen_key = None
         self._user_callback = None
         self._client = client
         self._user_timeout = user_timeout
+        self._queued = queued
 
     def _start_socket(self, path, callback, prefix='ws/'):
         if path in self._conns:
             return False
 
-        factory_url = self.STREAM_URL + prefix + path
-        factory = BinanceClientFactory(factory_url)
-        factory.protocol = BinanceClientProtocol
-        factory.callback = callback
-        factory.reconnect = True
-        context_factory = ssl.ClientContextFactory()
+        url = self.STREAM_URL + prefix + path
+
+        self._conns[path] = WebSocketIngest.inst().connect("binance:" + path[:32], url, callback, queued=self._queued,
+                on_error=lambda: callback(self._reconnect_error_payload))
 
-        self._conns[path] = connectWS(factory, context_factory)
         return path
 
     def start_depth_socket(self, symbol, callback, depth=None):
@@ -491,9 +448,7 @@ class BinanceSocketManager(threading.Thread):
         if conn_key not in self._conns:
             return
 
-        # disable reconnecting if we are closing
-        self._conns[conn_key].factory = WebSocketClientFactory(self.STREAM_URL + 'tmp_path')
-        self._conns[conn_key].disconnect()
+        self._conns[conn_key].close()
         del(self._conns[conn_key])
 
         # check if we have a user stream socket
@@ -508,12 +463,28 @@ class BinanceSocketManager(threading.Thread):
         self._user_timer = None
         self._user_listen_key = None
 
-    def run(self):
-        try:
-            reactor.run(installSignalHandlers=False)
-        except ReactorAlreadyRunning:
-            # Ignore error about reactor already running
-            pass
+    def start(self):
+        """Start the websocket ingest if not already running (the sockets are connected as soon as started)
+        """
+        WebSocketIngest.inst().start()
+
+    def is_alive(self):
+        return WebSocketIngest.inst().running
+
+    def drain(self, max_count=-1):
+        """Process the pending messages of each socket in queued mode, from the calling thread
+
+        :param max_count: Maximum number of messages per socket, -1 for any
+        :type max_count: int
+
+        :returns: number of processed messages
+        """
+        count = 0
+
+        for stream in list(self._conns.values()):
+            count += stream.drain(max_count)
+
+        return count
 
     def close(self):
         """Close all connections
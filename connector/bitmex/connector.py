@@ -30,7 +30,7 @@ class Connector(object):
 
     BIN_SIZE = ('1m', '5m', '1h', '1d')
 
-    def __init__(self, service, api_key, api_secret, symbols, host="www.bitmex.com", callback=None):
+    def __init__(self, service, api_key, api_secret, symbols, host="www.bitmex.com", callback=None, order_book=False):
         self._protocol = "https://"
         self._host = host or "www.bitmex.com"
 
@@ -39,6 +39,7 @@ class Connector(object):
         self._retries = 0  # initialize counter
         
         self._watched_symbols = symbols  # followed instruments or ['*'] for any
+        self._order_book = order_book    # subscribe to the order book of the followed instruments
         self._all_instruments = []   # availables listed instruments
 
         self.__api_key = api_key
@@ -87,7 +88,7 @@ class Connector(object):
 
                 self._watched_symbols = symbols
 
-            self._ws.connect("wss://" + self._host, symbols, should_auth=True)
+            self._ws.connect("wss://" + self._host, symbols, should_auth=True, order_book=self._order_book)
 
     def disconnect(self):
         if self._ws:
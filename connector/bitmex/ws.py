@@ -4,12 +4,8 @@
 # Websocket connector for bitmex.com
 
 import sys
-import websocket
-import threading
 import traceback
-import ssl
 from time import sleep
-import json
 import decimal
 import logging
 from .apikeyauth import generate_nonce, generate_signature
@@ -17,6 +13,9 @@ from urllib.parse import urlparse, urlunparse
 
 from decimal import Decimal
 
+from instrument.orderbook import OrderBook
+from common.wsingest import WebSocketIngest
+
 import logging
 logger = logging.getLogger('siis.connector.bitmex.ws')
 
@@ -63,9 +62,10 @@ class BitMEXWebsocket():
 	def __del__(self):
 		self.exit()
 
-	def connect(self, endpoint="", symbols=["XBTUSD"], should_auth=True):
+	def connect(self, endpoint="", symbols=["XBTUSD"], should_auth=True, order_book=False):
 		"""
 		Connect to the websocket and initialize data stores.
+		@param order_book If True subscribe to the L2 order book of the symbols.
 		"""
 		self.symbols = symbols
 		self.should_auth = should_auth
@@ -75,7 +75,10 @@ class BitMEXWebsocket():
 		# We can subscribe right in the connection querystring, so let's build that.
 		# Subscribe to all pertinent endpoints
 		for symbol in symbols:
-			subscriptions += [sub + ':' + symbol for sub in ["quote", "trade"]]  # , BitMEXWebsocket.PREFERED_ORDER_BOOK]]
+			subscriptions += [sub + ':' + symbol for sub in ["quote", "trade"]]
+
+			if order_book:
+				subscriptions.append(BitMEXWebsocket.PREFERED_ORDER_BOOK + ':' + symbol)
 	
 		subscriptions += ["instrument"]  # We want all of them
 
@@ -159,23 +162,21 @@ class BitMEXWebsocket():
 	def funds(self):
 		return self.data.get('margin', [{}])[0]
 
-	def market_depth(self, symbol):
+	def order_book(self, symbol):
 		"""
-		Return order book for a symbol.
+		Return the OrderBook of a symbol or None.
 		"""
-		order_book = self.data.get(self.PREFERED_ORDER_BOOK, {})
-
-		buys = []
-		sells = []
+		return self._order_books.get(symbol)
 
-		for order in order_book:
-			if order['symbol'] == symbol:
-				if order['side'] == 'Buy':
-					buys.append({'id': str(order['id']), 'size': order['size'], 'price': order['price']})
-				elif order['side'] == 'Sell':
-					sells.append({'id': str(order['id']), 'size': order['size'], 'price': order['price']})
+	def market_depth(self, symbol, depth=-1):
+		"""
+		Return order book for a symbol, as a tuple of the buys and sells lists of (price, size) from the best.
+		"""
+		order_book = self._order_books.get(symbol)
+		if order_book is None:
+			return ([], [])
 
-		return (buys, sells)
+		return order_book.top(depth)
 
 	def open_orders(self, clOrdIDPrefix):
 		orders = self.data.get('order', [])
@@ -212,21 +213,11 @@ class BitMEXWebsocket():
 
 		if self.ws is not None:
 			try:
-				if self._connected:
-					self.ws.close()
-			except:
-				pass
-
-			self.ws = None			
-
-		if self.wst is not None:
-			try:
-				if self.wst.is_alive():
-					self.wst.join()
+				self.ws.close()
 			except:
 				pass
 
-			self.wst = None
+			self.ws = None
 
 		self._connected = False
 
@@ -236,60 +227,37 @@ class BitMEXWebsocket():
 
 	def __connect(self, wsURL):
 		"""
-		Connect to the websocket in a thread.
+		Connect to the websocket, hosted by the shared websocket ingest.
+		The stream is not reconnected by itself because the authentication must be renewed, the watcher does it.
 		"""
-		logger.debug("BitMex starting thread")
-		ssl_defaults = ssl.get_default_verify_paths()
-		sslopt_ca_certs = {'ca_certs': ssl_defaults.cafile}
-		#sslopt_ca_certs = {'ca_certs': ssl.CERT_NONE, 'check_hostname': False}
-
-		# websocket.enableTrace(True)
-		self.ws = websocket.WebSocketApp(wsURL,
-										on_message=self.__on_message,
-										on_close=self.__on_close,
-										on_open=self.__on_open,
-										on_error=self.__on_error,
-										header=self.__get_auth())
-
-		# self.wst = threading.Thread(name="bitmex.ws", target=lambda: self.ws.run_forever(sslopt=sslopt_ca_certs, ping_timeout=10, ping_interval=60))
-		self.wst = threading.Thread(name="bitmex.ws", target=lambda: self.ws.run_forever(sslopt=sslopt_ca_certs, ping_timeout=None, ping_interval=None))
-		self.wst.daemon = True
-		self.wst.start()
-
-		logger.debug("BitMex WS started thread")
-		self.ws.last_ping_tm = 0.0
-
-		# Wait for connect before continuing
-		conn_timeout = 10
-		while (not hasattr(self.ws, 'sock') or not self.ws.sock or not self.ws.sock.connected) and conn_timeout > 0:  # and not self._error:
-		 	if hasattr(self.ws, 'sock') and self.ws and self.ws.sock:
-		 		self.ws.sock.last_ping_tm = 0.0
+		logger.debug("BitMex starting stream")
 
-		 	sleep(1)
-		 	conn_timeout -= 1
+		self.ws = WebSocketIngest.inst().connect("bitmex", wsURL, self.__on_message, headers=self.__get_auth(),
+				on_open=self.__on_open, on_close=self.__on_close, on_error=self.__on_error, reconnect=False)
 
-		if conn_timeout <= 0: # or self._error:
+		# Wait for connect before continuing
+		if not self.ws.wait_connected(10):
 			logger.error("Couldn't connect to WS. Max conn timeout !")
 			self.exit()
 
-		if not self._connected or self._error:  # not hasattr(self.ws, 'sock') or not self.ws.sock or not self.ws.sock.connected or self._error:
+		if not self._connected or self._error:
 			logger.error("Couldn't connect to WS. Error !")
 			self.exit()
 
 	def __get_auth(self):
 		'''Return auth headers. Will use API Keys.'''
 		if self.should_auth is False:
-			return []
+			return {}
 
 		logger.debug("Authenticating with API Key.")
 		# To auth to the WS using an API key, we generate a signature of a nonce and
 		# the WS API endpoint.
 		nonce = generate_nonce()
-		return [
-			"api-nonce: " + str(nonce),
-			"api-signature: " + generate_signature(self.__api_secret, 'GET', '/realtime', nonce, ''),
-			"api-key:" + self.__api_key
-		]
+		return {
+			"api-nonce": str(nonce),
+			"api-signature": generate_signature(self.__api_secret, 'GET', '/realtime', nonce, ''),
+			"api-key": self.__api_key
+		}
 
 	# def __get_url(self, endpoint):
 	# 	'''
@@ -334,18 +302,13 @@ class BitMEXWebsocket():
 		"""
 		Send a raw command.
 		"""
-		self.ws.send(json.dumps({"op": command, "args": args or []}))
+		if self.ws is not None:
+			self.ws.send({"op": command, "args": args or []})
 
 	def __on_message(self, message):
 		"""
-		Handler for parsing WS messages.
+		Handler for the WS messages, already decoded by the ingest.
 		"""
-		try:
-			message = json.loads(message)
-		except Exception as e:
-			logger.error("Unable to loads json message for : " % (str(message)))
-			message = []
-
 		table = message['table'] if 'table' in message else None
 		action = message['action'] if 'action' in message else None
 
@@ -372,6 +335,12 @@ class BitMEXWebsocket():
 					if self._callback:
 						self._callback[1](self._callback[0], 'error', 401)
 
+			elif action and table == self.PREFERED_ORDER_BOOK:
+				updated = self.__on_order_book(action, message['data'])
+
+				if self._callback and self.ready:
+					self._callback[1](self._callback[0], 'action', (action, table, updated, message['data']))
+
 			elif action:
 
 				if table not in self.data:
@@ -447,6 +416,63 @@ class BitMEXWebsocket():
 		except Exception as e:
 			logger.error(traceback.format_exc())			
 
+	def __on_order_book(self, action, data):
+		"""
+		Maintain the order book of the symbols from the L2 table actions.
+		The updates and deletes only give the id of the levels, then the price of each id is kept.
+		@return Set of the updated symbols.
+		"""
+		updated = set()
+
+		if action == 'partial':
+			# full image of the order book of the symbols
+			levels = {}
+
+			for level in data:
+				bids, asks = levels.setdefault(level['symbol'], ([], []))
+				(bids if level['side'] == 'Buy' else asks).append((level['price'], level['size']))
+
+				self._order_book_prices[level['id']] = level['price']
+
+			for symbol, (bids, asks) in levels.items():
+				order_book = self._order_books.get(symbol)
+				if order_book is None:
+					order_book = self._order_books[symbol] = OrderBook(symbol)
+
+				order_book.snapshot(bids, asks)
+				updated.add(symbol)
+
+			return updated
+
+		for level in data:
+			order_book = self._order_books.get(level['symbol'])
+			if order_book is None:
+				continue  # before the partial
+
+			if action == 'insert':
+				price = self._order_book_prices[level['id']] = level['price']
+				size = level['size']
+			elif action == 'update':
+				price = self._order_book_prices.get(level['id'])
+				size = level['size']
+			elif action == 'delete':
+				price = self._order_book_prices.pop(level['id'], None)
+				size = 0.0
+			else:
+				raise Exception("Unknown action: %s" % action)
+
+			if price is None:
+				continue
+
+			if level['side'] == 'Buy':
+				order_book.set_bid(price, size)
+			else:
+				order_book.set_ask(price, size)
+
+			updated.add(level['symbol'])
+
+		return updated
+
 	def __on_open(self):
 		logger.debug("BitMex websocket Opened.")
 		self._connected = True
@@ -455,23 +481,23 @@ class BitMEXWebsocket():
 		logger.debug('BitMex websocket Closed')
 		self._connected = False
 
-	def __on_error(self, error):
+	def __on_error(self):
 		self._connected = False
 		if not self.exited:
-			self.error(error)
+			logger.error("BitMex websocket connection lost or failed")
 
 	def __reset(self):
 		self.data = {}
 		self.keys = {}
+		self._order_books = {}       # OrderBook per symbol
+		self._order_book_prices = {}  # price per L2 level id
 		self.ws = None
-		self.wst = None
 		self.exited = False
 		self._error = None
 		self._connected = False
 
 	@property
 	def connected(self):
-		# return self.ws and hasattr(self.ws, 'sock') and self.ws.sock and self.ws.sock.connected
 		return self.ws is not None and self._connected
 
 def find_item_by_keys(keys, table, match_data):
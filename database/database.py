@@ -22,7 +22,8 @@ from trader.asset import Asset
 from config.utils import databases
 
 from .tickstorage import TickStorage, TickStreamer
-from .ohlcstorage import OhlcStorage, OhlcStreamer
+from .ohlcstorage import OhlcStorage, OhlcFileStorage, OhlcStreamer
+from .ohlccache import OhlcCache
 
 import logging
 logger = logging.getLogger('siis.database')
@@ -55,6 +56,12 @@ class Database(object):
     OHLCs
     =======
 
+    OHLCs are also stored locally per market, one binary file per timeframe next to the ticks files
+    (see OhlcFileStorage), and backtesting streams them from these files (OhlcStreamer).
+
+    The most recent OHLCs loaded per market and timeframe are kept into an LRU cache (see OhlcCache),
+    limited to ohlc_cache_size bytes (siis database configuration), and kept up to date by the stores.
+
     Prefered ohlc of interest are 1m, 5m, 15m, 1h, 4h, daily, weekly.
 
         - Weekly, daily, 4h and 3h ohlc are always kept and store in the SQL DB.
@@ -66,6 +73,9 @@ class Database(object):
     Optimizer can be used to detect gaps.
     Cleaner delete older ohlc according to previously defined rules.
 
+    Pending ohlcs are bulk inserted (or replaced) every OHLC_FLUSH_DELAY seconds or once there is more than
+    OHLC_FLUSH_SIZE of them, by batches of OHLC_BATCH_SIZE rows (COPY with PostgreSQL, multi-rows VALUES with MySQL).
+
     Ticks
     =====
 
@@ -79,9 +89,15 @@ class Database(object):
 
     If you launch many watcher writing to the same market it could multiply the ticks entries,
     or if you make a manual fetch of a specific market. Then the tick file will be broken and need to be optimized or re-fetched.
+    The tick optimizer (--optimize --timeframe=0) sorts, de-duplicates and validates the binary files, and is
+    incremental, then it can be run nightly. The current month is skipped, its file being appended by the watchers.
     """
     __instance = None
 
+    OHLC_FLUSH_DELAY = 60     # flush pending ohlcs every minute
+    OHLC_FLUSH_SIZE = 500     # or once there is more than
+    OHLC_BATCH_SIZE = 10000   # max rows per bulk insert
+
     @classmethod
     def inst(cls):
         if Database.__instance is None:
@@ -128,6 +144,9 @@ class Database(object):
 
         self._pending_ohlc_insert = []
         self._pending_ohlc_select = []
+        self._pending_ohlc_cached = []
+
+        self._ohlc_cache = OhlcCache()
 
         self._pending_user_trade_insert = []
         self._pending_user_trade_select = []
@@ -143,6 +162,9 @@ class Database(object):
         self._tick_storages = {}    # TickStorage per market
         self._pending_tick_insert = []
 
+        self._ohlc_storages = {}    # OhlcFileStorage per market
+        self._pending_ohlc_file_insert = {}  # OhlcFileStorage having data to process per market
+
     def lock(self, blocking=True, timeout=-1):
         self._mutex.acquire(blocking, timeout)
 
@@ -153,6 +175,8 @@ class Database(object):
         # load database
         config = databases(options.get('config-path')) or {}
 
+        self._ohlc_cache = OhlcCache(config.get('siis', {}).get('ohlc_cache_size', OhlcCache.DEFAULT_MAX_BYTES))
+
         self.connect(config)
 
         # optionnal tables creation
@@ -197,6 +221,10 @@ class Database(object):
 
         self.disconnect()
 
+        stats = self._ohlc_cache.stats()
+        logger.info("Ohlc cache %i hits, %i misses (%.2f%%), %i evictions, %i entries using %i bytes" % (
+            stats['hits'], stats['misses'], stats['hit-ratio']*100.0, stats['evictions'], stats['entries'], stats['bytes']))
+
         # flush remaining ticks
         self.lock()
         for k, tick_storage in self._tick_storages.items():
@@ -206,6 +234,13 @@ class Database(object):
         self._tick_storages = {}
         self._pending_tick_insert = []
 
+        # and remaining local ohlcs
+        for k, ohlc_storage in self._ohlc_storages.items():
+            ohlc_storage.flush(force=True)
+
+        self._ohlc_storages = {}
+        self._pending_ohlc_file_insert = {}
+
         self.unlock()
 
     def setup_market_sql(self):
@@ -270,11 +305,29 @@ class Database(object):
 
         @note Replace if exists.
         """
+        self._ohlc_cache.update(data)
+
         self.lock()
+
         if isinstance(data, list):
             self._pending_ohlc_insert.extend(data)
         else:
             self._pending_ohlc_insert.append(data)
+
+        # local file storage, keyed by market
+        for d in (data if isinstance(data, list) else [data]):
+            key = d[0]+'/'+d[1]
+            ohlc_storage = self._ohlc_storages.get(key)
+
+            if not ohlc_storage:
+                ohlc_storage = OhlcFileStorage(self._markets_path, d[0], d[1])
+                self._ohlc_storages[key] = ohlc_storage
+
+            ohlc_storage.store(d)
+
+            # pending OhlcFileStorage having data to process, once per market
+            self._pending_ohlc_file_insert[key] = ohlc_storage
+
         self.unlock()
 
     def store_market_info(self, data):
@@ -333,8 +386,18 @@ class Database(object):
         @param from_datetime Timestamp in ms
         @param to_datetime Timestamp in ms
         """
+        if from_datetime:
+            rows = self._ohlc_cache.from_to(broker_id, market_id, timeframe, from_datetime.timestamp(),
+                    to_datetime.timestamp() if to_datetime else None)
+
+            if rows is not None:
+                self.lock()
+                self._pending_ohlc_cached.append((service, broker_id, market_id, timeframe, rows))
+                self.unlock()
+                return
+
         self.lock()
-        
+
         from_ts = int(from_datetime.timestamp() * 1000) if from_datetime else None
         to_ts = int(to_datetime.timestamp() * 1000) if to_datetime else None
 
@@ -347,8 +410,13 @@ class Database(object):
         @param service to be notified once done
         @param last_n last max n ohlcs to load
         """
+        rows = self._ohlc_cache.last_n(broker_id, market_id, timeframe, last_n)
+
         self.lock()
-        self._pending_ohlc_select.append((service, broker_id, market_id, timeframe, None, None, last_n))
+        if rows is not None:
+            self._pending_ohlc_cached.append((service, broker_id, market_id, timeframe, rows))
+        else:
+            self._pending_ohlc_select.append((service, broker_id, market_id, timeframe, None, None, last_n))
         self.unlock()
 
     def load_market_info(self, service, broker_id, market_id):
@@ -373,17 +441,18 @@ class Database(object):
     # Tick and ohlc streamer
     #
 
-    def create_tick_streamer(self, broker_id, market_id, from_date, to_date, buffer_size=32768):
+    def create_tick_streamer(self, broker_id, market_id, from_date, to_date, buffer_size=32768, use_mmap=False):
         """
         Create a new tick streamer.
+        @param use_mmap Memory-map the binary monthly files (see TickStreamer.next_array).
         """
-        return TickStreamer(self._markets_path, broker_id, market_id, from_date, to_date, buffer_size, True)
+        return TickStreamer(self._markets_path, broker_id, market_id, from_date, to_date, buffer_size, True, use_mmap)
 
     def create_ohlc_streamer(self, broker_id, market_id, timeframe, from_date, to_date, buffer_size=8192):
         """
-        Create a new tick streamer.
+        Create a new ohlc streamer, reading the local memory-mapped ohlc file of the timeframe.
         """
-        return OhlcStreamer(self._db, timeframe, broker_id, market_id, from_date, to_date, buffer_size)
+        return OhlcStreamer(self._markets_path, broker_id, market_id, timeframe, from_date, to_date, buffer_size)
 
     #
     # User
@@ -480,8 +549,10 @@ class Database(object):
         while self._running:
             self.process_userdata()
             self.process_market()
+            self.process_ohlc_cached()
             self.process_ohlc()
             self.process_tick()
+            self.process_ohlc_file()
 
             time.sleep(0.001)  # don't waste the CPU
 
@@ -494,6 +565,85 @@ class Database(object):
     def process_ohlc(self):
         pass
 
+    def process_ohlc_cached(self):
+        """
+        Notify the ohlcs queries served from the cache.
+        """
+        self.lock()
+        mks = self._pending_ohlc_cached
+        self._pending_ohlc_cached = []
+        self.unlock()
+
+        for mk in mks:
+            mk[0].notify(Signal.SIGNAL_CANDLE_DATA_BULK, mk[1], (mk[2], mk[3], OhlcCache.candles(mk[4], mk[3])))
+
+    def cache_ohlcs(self, broker_id, market_id, timeframe, rows, last_n):
+        """
+        Cache the SQL rows result of a last n ohlcs query, plus the not yet flushed ohlcs of the same market and timeframe.
+        """
+        self._ohlc_cache.fill(broker_id, market_id, timeframe, OhlcCache.rows_from_db(rows), last_n)
+
+        self.lock()
+        pending = [d for d in self._pending_ohlc_insert if d[0] == broker_id and d[1] == market_id and d[3] == timeframe]
+        self.unlock()
+
+        if pending:
+            self._ohlc_cache.update(pending)
+
+    def ohlc_cache_stats(self):
+        """
+        Statistics of the ohlc cache (entries, bytes, hits, misses, hit-ratio, evictions).
+        """
+        return self._ohlc_cache.stats()
+
+    def flush_ohlcs(self):
+        """
+        Bulk insert or replace the pending ohlcs, if the flush delay is elapsed or if there is enough pending ohlcs.
+        Done in a single transaction, retried the next time on failure.
+        """
+        if time.time() - self._last_ohlc_flush < Database.OHLC_FLUSH_DELAY and len(self._pending_ohlc_insert) <= Database.OHLC_FLUSH_SIZE:
+            return
+
+        self.lock()
+        mkd = self._pending_ohlc_insert
+        self._pending_ohlc_insert = []
+        self.unlock()
+
+        if mkd:
+            # only keep the last version of each ohlc, an upsert cannot affect the same row twice
+            ohlcs = {}
+            for mk in mkd:
+                ohlcs[(mk[0], mk[1], mk[2], mk[3])] = mk
+
+            ohlcs = list(ohlcs.values())
+
+            try:
+                for i in range(0, len(ohlcs), Database.OHLC_BATCH_SIZE):
+                    self.insert_ohlcs(ohlcs[i:i+Database.OHLC_BATCH_SIZE])
+
+                self._db.commit()
+            except Exception as e:
+                logger.error(repr(e))
+
+                try:
+                    self._db.rollback()
+                except Exception as e:
+                    logger.error(repr(e))
+
+                # retry the next time
+                self.lock()
+                self._pending_ohlc_insert = mkd + self._pending_ohlc_insert
+                self.unlock()
+
+        self._last_ohlc_flush = time.time()
+
+    def insert_ohlcs(self, ohlcs):
+        """
+        Insert or replace a batch of ohlcs, without commit.
+        @param ohlcs list of unique tuples with the format of store_market_ohlc.
+        """
+        pass
+
     def process_tick(self):
         self.lock()
         pti = copy.copy(self._pending_tick_insert)
@@ -503,3 +653,13 @@ class Database(object):
         for tick_storage in pti:
             if tick_storage.has_data():
                 tick_storage.flush()
+
+    def process_ohlc_file(self):
+        self.lock()
+        pofi = copy.copy(self._pending_ohlc_file_insert)
+        self._pending_ohlc_file_insert.clear()
+        self.unlock()
+
+        for k, ohlc_storage in pofi.items():
+            if ohlc_storage.has_data():
+                ohlc_storage.flush()
@@ -23,7 +23,7 @@ from trader.asset import Asset
 from config.utils import databases
 
 from .tickstorage import TickStorage, TickStreamer
-from .ohlcstorage import OhlcStorage, OhlcStreamer
+from .ohlcstorage import OhlcStorage
 
 from .database import Database
 
@@ -152,12 +152,6 @@ class MySql(Database):
 
         self._db.commit()
 
-    def create_ohlc_streamer(self, broker_id, market_id, timeframe, from_date, to_date, buffer_size=8192):
-        """
-        Create a new tick streamer.
-        """
-        return OhlcStreamer(self._db, timeframe, broker_id, market_id, from_date, to_date, buffer_size)
-
     #
     # Processing
     #
@@ -557,38 +551,37 @@ class MySql(Database):
 
             for mk in mks:
                 if mk[6]:
-                    # last n
-                    cursor.execute("""SELECT COUNT(*) FROM ohlc WHERE broker_id = '%s' AND market_id = '%s' AND timeframe = %s""" % (mk[1], mk[2], mk[3]))
-                    count = int(cursor.fetchone()[0])
-                    offset = max(0, count - mk[6])
-
-                    # LIMIT should not be necessary then
+                    # last n, in reverse order
                     cursor.execute("""SELECT timestamp, bid_open, bid_high, bid_low, bid_close, ask_open, ask_high, ask_low, ask_close, volume FROM ohlc
-                                    WHERE broker_id = '%s' AND market_id = '%s' AND timeframe = %s ORDER BY timestamp ASC LIMIT %i OFFSET %i""" % (
-                                        mk[1], mk[2], mk[3], mk[6], offset))
+                                    WHERE broker_id = %s AND market_id = %s AND timeframe = %s ORDER BY timestamp DESC LIMIT %s""", (
+                                        mk[1], mk[2], mk[3], mk[6]))
                 elif mk[4] and mk[5]:
                     # from to
                     cursor.execute("""SELECT timestamp, bid_open, bid_high, bid_low, bid_close, ask_open, ask_high, ask_low, ask_close, volume FROM ohlc
-                                    WHERE broker_id = '%s' AND market_id = '%s' AND timeframe = %s AND timestamp >= %i AND timestamp <= %i ORDER BY timestamp ASC""" % (
+                                    WHERE broker_id = %s AND market_id = %s AND timeframe = %s AND timestamp >= %s AND timestamp <= %s ORDER BY timestamp ASC""", (
                                         mk[1], mk[2], mk[3], mk[4], mk[5]))
                 elif mk[4]:
                     # from to now
                     cursor.execute("""SELECT timestamp, bid_open, bid_high, bid_low, bid_close, ask_open, ask_high, ask_low, ask_close, volume FROM ohlc
-                                    WHERE broker_id = '%s' AND market_id = '%s' AND timeframe = %s AND timestamp >= %i ORDER BY timestamp ASC""" % (
+                                    WHERE broker_id = %s AND market_id = %s AND timeframe = %s AND timestamp >= %s ORDER BY timestamp ASC""", (
                                         mk[1], mk[2], mk[3], mk[4]))
                 elif mk[5]:
                     # to now
                     cursor.execute("""SELECT timestamp, bid_open, bid_high, bid_low, bid_close, ask_open, ask_high, ask_low, ask_close, volume FROM ohlc
-                                    WHERE broker_id = '%s' AND market_id = '%s' AND timeframe = %s AND timestamp <= %i ORDER BY timestamp ASC""" % (
+                                    WHERE broker_id = %s AND market_id = %s AND timeframe = %s AND timestamp <= %s ORDER BY timestamp ASC""", (
                                         mk[1], mk[2], mk[3], mk[5]))
                 else:
                     # all
                     cursor.execute("""SELECT timestamp, bid_open, bid_high, bid_low, bid_close, ask_open, ask_high, ask_low, ask_close, volume FROM ohlc
-                                    WHERE broker_id = '%s' AND market_id = '%s' AND timeframe = %s ORDER BY timestamp ASC""" % (
+                                    WHERE broker_id = %s AND market_id = %s AND timeframe = %s ORDER BY timestamp ASC""", (
                                         mk[1], mk[2], mk[3]))
 
                 rows = cursor.fetchall()
 
+                if mk[6]:
+                    rows = rows[::-1]
+                    self.cache_ohlcs(mk[1], mk[2], mk[3], rows, mk[6])
+
                 ohlcs = []
 
                 for row in rows:
@@ -622,34 +615,7 @@ class MySql(Database):
         # insert market ohlcs
         #
 
-        if time.time() - self._last_ohlc_flush >= 60 or len(self._pending_ohlc_insert) > 500:
-            self.lock()
-            mkd = self._pending_ohlc_insert
-            self._pending_ohlc_insert = []
-            self.unlock()
-
-            if mkd:
-                try:
-                    cursor = self._db.cursor()
-
-                    query = ' '.join((
-                        "INSERT INTO ohlc(broker_id, market_id, timestamp, timeframe, bid_open, bid_high, bid_low, bid_close, ask_open, ask_high, ask_low, ask_close, volume) VALUES",
-                        ','.join(["('%s', '%s', %i, %i, '%s', '%s', '%s', '%s', '%s', '%s', '%s', '%s', '%s')" % (mk[0], mk[1], mk[2], mk[3], mk[4], mk[5], mk[6], mk[7], mk[8], mk[9], mk[10], mk[11], mk[12]) for mk in mkd]),
-                        "ON DUPLICATE KEY UPDATE bid_open = VALUES(bid_open), bid_high = VALUES(bid_high), bid_low = VALUES(bid_low), bid_close = VALUES(bid_close), ask_open = VALUES(ask_open), ask_high = VALUES(ask_high), ask_low = VALUES(ask_low), ask_close = VALUES(ask_close), volume = VALUES(volume)"
-                    ))
-
-                    cursor.execute(query)
-
-                    self._db.commit()
-                except Exception as e:
-                    logger.error(repr(e))
-
-                    # retry the next time
-                    self.lock()
-                    self._pending_ohlc_insert = mkd + self._pending_ohlc_insert
-                    self.unlock()
-
-                self._last_ohlc_flush = time.time()
+        self.flush_ohlcs()
 
         #
         # clean older ohlcs
@@ -670,3 +636,18 @@ class MySql(Database):
                 logger.error(repr(e))
 
             self._last_ohlc_clean = time.time()
+
+    def insert_ohlcs(self, ohlcs):
+        """
+        Parameterized upsert, executemany is rewritten by MySQLdb into multi-rows VALUES statements.
+        """
+        cursor = self._db.cursor()
+
+        cursor.executemany("""
+            INSERT INTO ohlc(broker_id, market_id, timestamp, timeframe, bid_open, bid_high, bid_low, bid_close, ask_open, ask_high, ask_low, ask_close, volume)
+                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+            ON DUPLICATE KEY UPDATE
+                bid_open = VALUES(bid_open), bid_high = VALUES(bid_high), bid_low = VALUES(bid_low), bid_close = VALUES(bid_close),
+                ask_open = VALUES(ask_open), ask_high = VALUES(ask_high), ask_low = VALUES(ask_low), ask_close = VALUES(ask_close),
+                volume = VALUES(volume)""", [(mk[0], mk[1], int(mk[2]), int(mk[3]), str(mk[4]), str(mk[5]), str(mk[6]), str(mk[7]),
+                    str(mk[8]), str(mk[9]), str(mk[10]), str(mk[11]), str(mk[12])) for mk in ohlcs])
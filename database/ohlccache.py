@@ -0,0 +1,280 @@
+# @date 2019-06-16
+# @author Frederic SCHERMA
+# @license Copyright (c) 2019 Dream Overflow
+# In memory LRU cache of the most recent ohlcs per market and timeframe
+
+import threading
+import collections
+
+import numpy as np
+
+from instrument.instrument import Candle
+
+from .ohlcstorage import OhlcFileStorage
+
+import logging
+logger = logging.getLogger('siis.database')
+
+
+class OhlcCacheEntry(object):
+    """
+    Most recent ohlcs of a market for a timeframe, as an ordered array of OhlcFileStorage.OHLC_DTYPE rows
+    with a spare capacity for the appends.
+
+    @param complete True if the whole history is cached, else only the range starting at the first row is
+        guaranteed to be complete.
+    """
+
+    __slots__ = '_data', '_size', '_complete'
+
+    def __init__(self, rows, complete):
+        self._data = rows
+        self._size = len(rows)
+        self._complete = complete
+
+    @property
+    def rows(self):
+        return self._data[:self._size]
+
+    @property
+    def nbytes(self):
+        return self._data.nbytes
+
+    def covers(self, from_ts):
+        """
+        True if any ohlc since from_ts (in second) is into the cache.
+        """
+        if self._complete:
+            return True
+
+        return self._size > 0 and from_ts >= self._data['t'][0]
+
+    def update(self, rows):
+        """
+        Insert or replace ordered rows. Rows older than the cached range are ignored if not complete.
+        """
+        if not self._complete and self._size:
+            rows = rows[rows['t'] >= self._data['t'][0]]
+
+        if not len(rows):
+            return
+
+        if self._size and rows['t'][0] < self._data['t'][self._size-1]:
+            # some rows inside the range, merge (new rows override the existing ones)
+            merged = np.concatenate((self.rows, rows))
+            merged = merged[np.argsort(merged['t'], kind='stable')]
+            merged = merged[np.append(merged['t'][1:] != merged['t'][:-1], True)]
+
+            self._data = merged
+            self._size = len(merged)
+            return
+
+        if self._size and rows['t'][0] == self._data['t'][self._size-1]:
+            # replace the last one (non consolidated)
+            self._size -= 1
+
+        if self._size + len(rows) > len(self._data):
+            # grow with spare capacity
+            data = np.empty(max(2 * len(self._data), self._size + len(rows)), dtype=OhlcFileStorage.OHLC_DTYPE)
+            data[:self._size] = self._data[:self._size]
+            self._data = data
+
+        self._data[self._size:self._size+len(rows)] = rows
+        self._size += len(rows)
+
+
+class OhlcCache(object):
+    """
+    LRU cache of the most recent ohlcs keyed by (broker_id, market_id, timeframe), in the limit of a memory budget.
+
+    Entries are created from the results of the last n ohlcs queries, then kept up to date by the stored ohlcs.
+    A last n or a from/to query is served from the cache if the cached range covers it.
+
+    @note Assumes this process is the only one writing the ohlcs of the cached markets.
+    """
+
+    DEFAULT_MAX_BYTES = 64*1024*1024  # 64MB
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES):
+        self._mutex = threading.Lock()
+
+        self._max_bytes = max_bytes
+        self._entries = collections.OrderedDict()
+        self._bytes = 0
+
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    @staticmethod
+    def rows_from_db(rows):
+        """
+        Array of OHLC_DTYPE from SQL rows (timestamp in ms, then prices and volume as str).
+        """
+        arr = np.empty(len(rows), dtype=OhlcFileStorage.OHLC_DTYPE)
+
+        if rows:
+            arr.view(np.float64).reshape(len(rows), 10)[:] = np.array(rows, dtype=object).astype(np.float64)
+            arr['t'] *= 0.001
+
+        return arr
+
+    @staticmethod
+    def rows_from_store(data):
+        """
+        Array of OHLC_DTYPE from a list of store_market_ohlc tuples.
+        """
+        return OhlcCache.rows_from_db([d[2:3] + d[4:13] for d in data])
+
+    @staticmethod
+    def candles(rows, timeframe):
+        """
+        List of Candle from an array of OHLC_DTYPE rows.
+        """
+        candles = []
+
+        for row in rows.tolist():
+            candle = Candle(row[0], timeframe)
+
+            candle.set_bid_ohlc(row[1], row[2], row[3], row[4])
+            candle.set_ofr_ohlc(row[5], row[6], row[7], row[8])
+            candle.set_volume(row[9])
+
+            candles.append(candle)
+
+        return candles
+
+    def __evict(self):
+        while self._bytes > self._max_bytes and self._entries:
+            key, entry = self._entries.popitem(last=False)
+            self._bytes -= entry.nbytes
+            self._evictions += 1
+
+    #
+    # queries
+    #
+
+    def last_n(self, broker_id, market_id, timeframe, last_n):
+        """
+        Returns a copy of the last n rows, or None if not cached.
+        """
+        key = (broker_id, market_id, timeframe)
+
+        with self._mutex:
+            entry = self._entries.get(key)
+
+            if entry is None or (entry._size < last_n and not entry._complete):
+                self._misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self._hits += 1
+
+            return entry.rows[-last_n:].copy() if last_n > 0 else entry.rows[0:0].copy()
+
+    def from_to(self, broker_id, market_id, timeframe, from_ts, to_ts):
+        """
+        Returns a copy of the rows from_ts <= t <= to_ts (in second, to_ts optional), or None if not cached.
+        """
+        key = (broker_id, market_id, timeframe)
+
+        with self._mutex:
+            entry = self._entries.get(key)
+
+            if entry is None or not entry.covers(from_ts):
+                self._misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self._hits += 1
+
+            t = entry.rows['t']
+
+            first = int(t.searchsorted(from_ts, 'left'))
+            last = int(t.searchsorted(to_ts, 'right')) if to_ts is not None else len(t)
+
+            return entry.rows[first:last].copy()
+
+    #
+    # updates
+    #
+
+    def fill(self, broker_id, market_id, timeframe, rows, last_n):
+        """
+        Cache the result of a last n query.
+        @param rows Ordered array of OHLC_DTYPE, if lesser than last_n then it is the complete history.
+        """
+        key = (broker_id, market_id, timeframe)
+
+        with self._mutex:
+            entry = self._entries.pop(key, None)
+            if entry is not None:
+                self._bytes -= entry.nbytes
+
+            entry = OhlcCacheEntry(rows.copy(), len(rows) < last_n)
+
+            self._entries[key] = entry
+            self._bytes += entry.nbytes
+
+            self.__evict()
+
+    def update(self, data):
+        """
+        Update the cached entries with the stored ohlcs.
+        @param data tuple or list of tuples with the format of Database.store_market_ohlc.
+        """
+        if not isinstance(data, list):
+            data = [data]
+
+        with self._mutex:
+            if not self._entries:
+                return
+
+            per_key = {}
+
+            for d in data:
+                key = (d[0], d[1], d[3])
+                if key in self._entries:
+                    per_key.setdefault(key, []).append(d)
+
+            for key, ohlcs in per_key.items():
+                rows = OhlcCache.rows_from_store(ohlcs)
+
+                # ordered, keeping the last version of duplicated timestamps
+                rows = rows[np.argsort(rows['t'], kind='stable')]
+                rows = rows[np.append(rows['t'][1:] != rows['t'][:-1], True)]
+
+                entry = self._entries[key]
+
+                self._bytes -= entry.nbytes
+                entry.update(rows)
+                self._bytes += entry.nbytes
+
+            if per_key:
+                self.__evict()
+
+    def clear(self):
+        with self._mutex:
+            self._entries.clear()
+            self._bytes = 0
+
+    #
+    # statistics
+    #
+
+    def stats(self):
+        """
+        Dict with the number of entries, used bytes, budget, hits, misses, hit ratio and evictions.
+        """
+        with self._mutex:
+            total = self._hits + self._misses
+
+            return {
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max-bytes': self._max_bytes,
+                'hits': self._hits,
+                'misses': self._misses,
+                'hit-ratio': self._hits / total if total else 0.0,
+                'evictions': self._evictions
+            }
@@ -5,10 +5,14 @@
 
 import os
 import json
+import math
 import time
+import pathlib
 import threading
 import traceback
 
+import numpy as np
+
 from notifier.signal import Signal
 from instrument.instrument import Candle
 
@@ -86,16 +90,16 @@ class OhlcStorage(object):
 
     def flush(self):
         self._mutex.acquire()
-        ohlcs = self._ohlcs = []
+        ohlcs = self._ohlcs
+        self._ohlcs = []
         self._mutex.release()
 
         try:
             cursor = self._db.cursor()
 
-            for ohlc in ohlcs:
-                cursor.execute("""
-                    INSERT INTO ohlc(timestamp, timeframe, bid_open, bid_high, bid_low, bid_close, ask_open, ask_high, ask_low, ask_close, volume)
-                        VALUES(?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""", ohlc)
+            cursor.executemany("""
+                INSERT INTO ohlc(timestamp, timeframe, bid_open, bid_high, bid_low, bid_close, ask_open, ask_high, ask_low, ask_close, volume)
+                    VALUES(?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""", ohlcs)
 
             self._db.commit()
 
@@ -253,108 +257,244 @@ class OhlcStorage(object):
             self.close()
 
 
+class OhlcFileStorage(object):
+    """
+    Local binary storage of the ohlcs of a market, one file per timeframe, next to the ticks files :
+    markets_path/broker_id/market_id/C/<timeframe in seconds>.dat
+
+    A row is 10 float64 (OHLC_DTYPE) : timestamp (second) bid open high low close, ofr open high low close, volume.
+    Rows are ordered by timestamp. Writes are append only, a row with the same timestamp than the last one
+    replace it (non consolidated candle), and only older rows imply to merge and rewrite the file.
+    """
+
+    OHLC_DTYPE = np.dtype([
+        ('t', 'float64'),
+        ('bo', 'float64'), ('bh', 'float64'), ('bl', 'float64'), ('bc', 'float64'),
+        ('oo', 'float64'), ('oh', 'float64'), ('ol', 'float64'), ('oc', 'float64'),
+        ('v', 'float64')])
+
+    OHLC_SIZE = 10*8  # 80B
+
+    def __init__(self, markets_path, broker_id, market_id):
+        self._markets_path = markets_path
+        self._mutex = threading.Lock()
+
+        self._broker_id = broker_id
+        self._market_id = market_id
+
+        self._last_save = 0
+        self._ohlcs = []
+
+    @staticmethod
+    def pathname(markets_path, broker_id, market_id, timeframe):
+        return '/'.join((str(pathlib.Path(markets_path, broker_id, market_id, 'C')), "%i.dat" % int(timeframe)))
+
+    def store(self, data):
+        """
+        @param data tuple or list of tuples with the format of Database.store_market_ohlc.
+        """
+        self._mutex.acquire()
+        if isinstance(data, list):
+            self._ohlcs.extend(data)
+        else:
+            self._ohlcs.append(data)
+        self._mutex.release()
+
+    def has_data(self):
+        return len(self._ohlcs) > 0
+
+    def flush(self, force=False):
+        now = time.time()
+
+        # save only once per minute
+        if not force and ((now - self._last_save) < 60.0):
+            return
+
+        self._mutex.acquire()
+        ohlcs = self._ohlcs
+        self._ohlcs = []
+        self._mutex.release()
+
+        if not ohlcs:
+            return
+
+        # per timeframe
+        rows = {}
+
+        for d in ohlcs:
+            rows.setdefault(int(d[3]), []).append((float(d[2]) * 0.001, float(d[4]), float(d[5]), float(d[6]), float(d[7]),
+                    float(d[8]), float(d[9]), float(d[10]), float(d[11]), float(d[12])))
+
+        failed = []
+
+        for timeframe, data in rows.items():
+            try:
+                self.write(timeframe, np.array(data, dtype=OhlcFileStorage.OHLC_DTYPE))
+            except Exception as e:
+                logger.error(repr(e))
+                failed.extend([d for d in ohlcs if int(d[3]) == timeframe])
+
+        if failed:
+            # retry the next time
+            self._mutex.acquire()
+            self._ohlcs = failed + self._ohlcs
+            self._mutex.release()
+
+        self._last_save = time.time()
+
+    def write(self, timeframe, arr):
+        """
+        Write an array of OHLC_DTYPE rows into the file of the timeframe.
+        """
+        # ordered, keeping the last version of duplicated timestamps
+        arr = arr[np.argsort(arr['t'], kind='stable')]
+        arr = arr[np.append(arr['t'][1:] != arr['t'][:-1], True)]
+
+        pathname = OhlcFileStorage.pathname(self._markets_path, self._broker_id, self._market_id, timeframe)
+
+        data_path = pathlib.Path(pathname).parent
+        if not data_path.exists():
+            data_path.mkdir(parents=True)
+
+        # ignore a possibly partially written trailing row
+        count = os.path.getsize(pathname) // OhlcFileStorage.OHLC_SIZE if os.path.isfile(pathname) else 0
+        last_t = np.fromfile(pathname, dtype=OhlcFileStorage.OHLC_DTYPE, count=1, offset=(count-1)*OhlcFileStorage.OHLC_SIZE)['t'][0] if count else 0.0
+
+        if not count or arr['t'][0] >= last_t:
+            # append, overwriting the last row if same timestamp. never truncated because the file is possibly
+            # memory-mapped by some streamers, the bytes of a partially written row are overwritten by the next row
+            pos = count if not count or arr['t'][0] > last_t else count - 1
+
+            with open(pathname, 'r+b' if os.path.isfile(pathname) else 'wb') as f:
+                f.seek(pos * OhlcFileStorage.OHLC_SIZE)
+                f.write(arr.tobytes())
+        else:
+            # older rows, merge and rewrite (new rows override the existing ones)
+            merged = np.concatenate((np.fromfile(pathname, dtype=OhlcFileStorage.OHLC_DTYPE, count=count), arr))
+            merged = merged[np.argsort(merged['t'], kind='stable')]
+            merged = merged[np.append(merged['t'][1:] != merged['t'][:-1], True)]
+
+            tmp_pathname = pathname + '.tmp'
+            merged.tofile(tmp_pathname)
+
+            # the streamers still mapping the previous file are not affected
+            os.replace(tmp_pathname, pathname)
+
+
 class OhlcStreamer(object):
     """
-    Streamer that read ohlc from a start to end date.
-    @note Generic SQL.
+    Streamer that read the ohlcs of a timeframe from a start to end date, from the memory-mapped OhlcFileStorage file.
+
+    A candle is returned once consolidated, when its close time (timestamp + timeframe) is lesser or equal to the
+    requested timestamp. next_array returns zero-copy views of the mapped file, next returns Candle objects.
     """
 
-    def __init__(self, db, timeframe, from_date, to_date=None, buffer_size=1000):
+    def __init__(self, markets_path, broker_id, market_id, timeframe, from_date, to_date=None, buffer_size=8192):
         """
         @param from_date datetime Object
         @param to_date datetime Object
+        @param buffer_size Number of candles converted at once by next.
         """
+        self._markets_path = markets_path
+        self._broker_id = broker_id
+        self._market_id = market_id
 
-        self._db = db
         self._timeframe = timeframe
 
         self._from_date = from_date
         self._to_date = to_date
-        
-        self._curr_date = from_date
 
         self._buffer_size = buffer_size
 
-    def finished(self):
-        return self._curr_date >= self._to_date and not self._ohlcs
+        self._opened = False
+        self._mmap = None     # mapped array
+        self._mmap_t = None   # timestamp column of the mapped array
+        self._pos = 0         # read position into the mapped array
+        self._end = 0         # last position (excluded) until the to date
 
-    def next(self, timestamp):
-        # @todo
-        return []
+    @property
+    def timeframe(self):
+        return self._timeframe
+
+    def open(self):
+        if self._opened:
+            return
 
-    def __bufferize(self):
-        results = self.query(self, self._timeframe, self._curr_date, None, limit, False)
-        if results:
-            self._buffer.extend(results)
+        self._opened = True
 
-    def query(self, timeframe, from_date, to_date, limit_or_last_n, auto_close=True):
+        pathname = OhlcFileStorage.pathname(self._markets_path, self._broker_id, self._market_id, self._timeframe)
+        if not os.path.isfile(pathname):
+            return
+
+        count = os.path.getsize(pathname) // OhlcFileStorage.OHLC_SIZE
+        if count <= 0:
+            return
+
+        # plain ndarray view, slicing a memmap subclass is costly and the mapping is kept alive by the view
+        self._mmap = np.memmap(pathname, dtype=OhlcFileStorage.OHLC_DTYPE, mode='r', shape=(count,)).view(np.ndarray)
+        self._mmap_t = self._mmap['t']
+
+        # binary search of the range
+        self._pos = int(self._mmap_t.searchsorted(self._from_date.timestamp(), 'left')) if self._from_date else 0
+        self._end = int(self._mmap_t.searchsorted(self._to_date.timestamp(), 'right')) if self._to_date else count
+
+    def close(self):
+        # release the mapping (closed once no more views reference it)
+        self._mmap = None
+        self._mmap_t = None
+        self._pos = self._end = 0
+
+    def finished(self):
         """
-        Query ohlcs for a timeframe.
-        @param from_date Optional
-        @param to_date Optional
-        @param limit_or_last_n Optional
+        All the candles until "to date" are consumed.
         """
-        cursor = self._db.cursor()
+        return self._opened and self._pos >= self._end
 
-        try:
-            if from_date and to_date:
-                from_ts = int(from_date.timestamp() * 1000.0)
-                to_ts = int(to_date.timestamp() * 1000.0)
-                self.query_from_to(cursor, timeframe, from_date, to_date)
-            elif from_date:
-                from_ts = int(from_date.timestamp() * 1000.0)
-                self.query_from_limit(cursor, timeframe, from_date, limit_or_last_n)
-            elif to_date:
-                to_ts = int(to_date.timestamp() * 1000.0)
-                self.query_from_limit(cursor, timeframe, to_date)
-            elif limit:
-                self.query_last(cursor, timeframe, limit_or_last_n)
-            else:
-                self.query_all(cursor, timeframe)
-        except Exception as e:
-            logger.error(repr(e))
-            return []
+    def next_timestamp(self):
+        """
+        Close time of the next candle to be streamed, or math.inf if there is no more candles.
+        """
+        self.open()
 
-        rows = cursor.fetchall()
-        ohlcs = []
+        if self._mmap is None or self._pos >= self._end:
+            return math.inf
 
-        for row in rows:
-            timestamp = float(row[0]) * 0.001  # to float second timestamp
-            ohlc = Candle(timestamp, timeframe)
+        return self._mmap_t[self._pos] + self._timeframe
 
-            ohlc.set_bid_ohlc(float(row[1]), float(row[2]), float(row[3]), float(row[4]))
-            ohlc.set_ofr_ohlc(float(row[5]), float(row[6]), float(row[7]), float(row[8]))
+    def next_array(self, timestamp):
+        """
+        Returns the rows (OHLC_DTYPE) of the candles closed at timestamp.
+        @note Zero-copy view, only valid while the streamer is alive.
+        """
+        self.open()
 
-            ohlc.set_volume(float(row[9]))
+        if self._mmap is None:
+            return np.empty(0, dtype=OhlcFileStorage.OHLC_DTYPE)
 
-            ohlcs.append(ohlc)
+        end = min(int(self._mmap_t.searchsorted(timestamp - self._timeframe, 'right')), self._end)
+        if end <= self._pos:
+            return self._mmap[0:0]
 
-        return data
+        rows = self._mmap[self._pos:end]
+        self._pos = end
 
-    def query_all(self, cursor, timeframe):
-        cursor.execute("""SELECT timestamp, bid_open, bid_high, bid_low, bid_close, ask_open, ask_high, ask_low, ask_close, volume FROM ohlc
-                            WHERE timeframe = %s ORDER BY timestamp ASC""" % (timeframe,))
+        return rows
 
-    def query_last(self, cursor, timeframe, limit):
-        cursor.execute("""SELECT COUNT(*) FROM ohlc WHERE timeframe = %s""" % (timeframe,))
-        count = int(cursor.fetchone()[0])
-        offset = max(0, count - limit)
+    def next(self, timestamp):
+        """
+        Returns the list of Candle closed at timestamp.
+        """
+        candles = []
+        rows = self.next_array(timestamp)
 
-        # LIMIT should not be necessary then
-        cursor.execute("""SELECT timestamp, bid_open, bid_high, bid_low, bid_close, ask_open, ask_high, ask_low, ask_close, volume FROM ohlc
-                        WHERE timeframe = %s ORDER BY timestamp ASC LIMIT %i OFFSET %i""" % (timeframe, limit, offset))
+        for i in range(0, len(rows), self._buffer_size):
+            for row in rows[i:i+self._buffer_size].tolist():
+                candle = Candle(row[0], self._timeframe)
 
-    def query_from_to(self, cursor, timeframe, from_ts, to_ts):
-        cursor.execute("""SELECT timestamp, bid_open, bid_high, bid_low, bid_close, ask_open, ask_high, ask_low, ask_close, volume FROM ohlc
-                        WHERE timeframe = %s AND timestamp >= %i AND timestamp <= %i ORDER BY timestamp ASC""" % (
-                            timeframe, from_ts, to_ts))
+                candle.set_bid_ohlc(row[1], row[2], row[3], row[4])
+                candle.set_ofr_ohlc(row[5], row[6], row[7], row[8])
+                candle.set_volume(row[9])
 
-    def query_from_limit(self, cursor, timeframe, from_ts, limit):
-        cursor.execute("""SELECT timestamp, bid_open, bid_high, bid_low, bid_close, ask_open, ask_high, ask_low, ask_close, volume FROM ohlc
-                        WHERE timeframe = %s AND timestamp >= %i ORDER BY timestamp ASC LIMIT %i""" % (
-                            timeframe, from_ts, limit))
+                candles.append(candle)
 
-    def query_to(self, cursor, timeframe, to_ts):
-        cursor.execute("""SELECT timestamp, bid_open, bid_high, bid_low, bid_close, ask_open, ask_high, ask_low, ask_close, volume FROM ohlc
-                        WHERE timeframe = %s AND timestamp <= %i ORDER BY timestamp ASC""" % (
-                            timeframe, to_ts))
+        return candles
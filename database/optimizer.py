@@ -3,11 +3,22 @@
 # @license Copyright (c) 2019 Dream Overflow
 # Candle market DB checker/optimizer.
 
+import os
+import re
+import math
+import pathlib
+
+import numpy as np
+
+from datetime import datetime, timedelta
+
 import logging
 logger = logging.getLogger('siis.database.optimizer')
 
+from common.utils import UTC
+
 from database.database import Database
-from database.tickstorage import TickStorage, TickSteamer, TextToBinary
+from database.tickstorage import TickStorage, TickStreamer, TextToBinary
 
 
 class OhlcOptimizer(object):
@@ -34,22 +45,509 @@ class OhlcOptimizer(object):
 		return []
 
 
+class MarketHours(object):
+	"""
+	Weekly trading sessions of a market, in UTC, to only count the open time between two ticks.
+	The sessions are intervals in seconds from monday 00:00, and no sessions means always open.
+
+	Presets :
+		- always (crypto) : 24/7
+		- forex : from sunday 22:00 to friday 22:00
+		- stock, indice : from monday to friday 14:30 to 21:00 (US)
+		- HH:MM-HH:MM : from monday to friday, can overlap the next day
+	"""
+
+	DAY = 24*60*60
+	WEEK = 7*DAY
+	WEEK_ORIGIN = 4*DAY  # 1970-01-05 is the first monday
+
+	def __init__(self, sessions=None):
+		self._sessions = np.array(sorted(sessions or []), dtype=np.float64).reshape(-1, 2)
+		self._open_per_week = float((self._sessions[:, 1] - self._sessions[:, 0]).sum()) if len(self._sessions) else float(MarketHours.WEEK)
+
+	@staticmethod
+	def preset(name):
+		D = MarketHours.DAY
+
+		if not name or name in ('always', 'crypto'):
+			return MarketHours()
+
+		if name == 'forex':
+			return MarketHours([(0, 4*D + 22*3600), (6*D + 22*3600, 7*D)])
+
+		if name in ('stock', 'indice'):
+			name = "14:30-21:00"
+
+		m = re.match(r'^(\d{1,2}):(\d{2})-(\d{1,2}):(\d{2})$', name)
+		if not m:
+			raise ValueError("Invalid market hours %s" % name)
+
+		start = int(m.group(1))*3600 + int(m.group(2))*60
+		end = int(m.group(3))*3600 + int(m.group(4))*60
+
+		if end <= start:
+			# overnight session
+			end += D
+
+		return MarketHours([(d*D + start, d*D + end) for d in range(0, 5)])
+
+	def open_time(self, timestamps):
+		"""
+		Cumulated open time in seconds since the week origin, for an array of timestamps.
+		"""
+		t = np.asarray(timestamps, dtype=np.float64)
+
+		if not len(self._sessions):
+			return t
+
+		x = t - MarketHours.WEEK_ORIGIN
+		weeks = np.floor(x / MarketHours.WEEK)
+		s = x - weeks * MarketHours.WEEK
+
+		partial = np.zeros_like(t)
+		for start, end in self._sessions:
+			partial += np.clip(s - start, 0.0, end - start)
+
+		return weeks * self._open_per_week + partial
+
+	def open_duration(self, from_ts, to_ts):
+		"""
+		Open time in seconds between each from and to timestamps.
+		"""
+		return self.open_time(to_ts) - self.open_time(from_ts)
+
+
 class TickOptimizer(object):
 	"""
-	Tick data optimizer/validate.
-	
-	@todo Check for GAP of tick (Take care of week-end/off-market)
-	@todo Reorder the ticks and recreate the file if necessary
+	Tick data optimizer/validate of the binary monthly files of a market.
+
+	Each file is first verified by blocks of memory-mapped ticks : invalid ticks (non finite values, null or negative
+	prices or volume, timestamp out of the month of the file), order and duplicates (many watchers writing the same
+	market). A valid file is left untouched, else it is rewritten by an external merge sort : the blocks are cleaned,
+	stable sorted by timestamp and written as temporary runs, then the runs are memory-mapped and merged by blocks, up
+	to the lowest last timestamp of the current blocks of the runs, and the duplicates are removed. The distinct ticks
+	sharing a timestamp keep their order of arrival, and of a duplicated tick the first one is kept. The new file
+	replaces the previous one once complete.
+
+	The compact index (<market-id>.idx into the tick directory) keeps per file the month, count, first and last
+	timestamps, and the size and modification time. A file whose size and modification time did not changed since
+	is not verified again, so a nightly pass only processes the new and modified months. The current month is only
+	processed when forced, its file being possibly appended by a live watcher.
+
+	Only the binary files are processed, the text files can be converted using the binarizer before.
 	"""
 
-	def __init__(self, broker_id, market_id):
+	BLOCK_SIZE = 1 << 22  # ticks per block (128MB)
+
+	INDEX_DTYPE = np.dtype([
+		('month', 'int32'), ('count', 'int64'), ('first', 'float64'), ('last', 'float64'),
+		('size', 'int64'), ('mtime', 'float64')])
+
+	def __init__(self, markets_path, broker_id, market_id, from_date=None, to_date=None, market_hours=None, max_gap=3600.0, block_size=None):
+		"""
+		@param from_date datetime Object or None for any months
+		@param to_date datetime Object or None for any months
+		@param market_hours MarketHours or None for always open
+		@param max_gap Maximal open time in seconds without tick before reporting a gap
+		"""
+		self._markets_path = markets_path
 		self._broker_id = broker_id
 		self._market_id = market_id
 
-	def optimize(self):
-		# @todo
-		pass
+		self._from_date = from_date
+		self._to_date = to_date
+
+		self._market_hours = market_hours or MarketHours()
+		self._max_gap = max_gap
+
+		self._block_size = block_size or TickOptimizer.BLOCK_SIZE
+
+		self._data_path = pathlib.Path(self._markets_path, self._broker_id, self._market_id, 'T')
+		self._index = {}  # month (YYYYMM) : index row
+
+	@property
+	def index(self):
+		"""
+		Index entries sorted by month.
+		"""
+		return [self._index[month] for month in sorted(self._index.keys())]
+
+	def index_pathname(self):
+		return '/'.join((str(self._data_path), "%s.idx" % self._market_id))
+
+	def load_index(self):
+		self._index = {}
+
+		pathname = self.index_pathname()
+		if os.path.isfile(pathname):
+			for row in np.fromfile(pathname, dtype=TickOptimizer.INDEX_DTYPE):
+				self._index[int(row['month'])] = row
+
+	def save_index(self):
+		rows = np.array(self.index, dtype=TickOptimizer.INDEX_DTYPE)
+
+		pathname = self.index_pathname()
+		rows.tofile(pathname + ".tmp")
+		os.replace(pathname + ".tmp", pathname)
+
+	def months_range(self):
+		"""
+		First and last months YYYYMM of the range.
+		"""
+		from_month = int(self._from_date.strftime('%Y%m')) if self._from_date else 0
+		to_month = int(self._to_date.strftime('%Y%m')) if self._to_date else 999999
+
+		return from_month, to_month
+
+	def months(self):
+		"""
+		List of (month YYYYMM, pathname) of the binary files into the range.
+		"""
+		if not self._data_path.exists():
+			return []
+
+		pattern = re.compile(r'^(\d{6})%s\.dat$' % re.escape(self._market_id))
+		from_month, to_month = self.months_range()
+
+		results = []
+
+		for filename in os.listdir(str(self._data_path)):
+			m = pattern.match(filename)
+			if m and from_month <= int(m.group(1)) <= to_month:
+				results.append((int(m.group(1)), '/'.join((str(self._data_path), filename))))
+
+		return sorted(results)
+
+	def optimize(self, force=False):
+		"""
+		Verify, and if necessary sort, clean and de-duplicate the files, then update the index.
+
+		The files of the current and future months are skipped unless force, because a live watcher appends to
+		the current month file (TickStorage), and the replaced file would lose its next ticks.
+
+		@param force Verify the files even if unchanged since the last pass, and process the current month.
+		@return List of dict per processed file with month, count, invalid, duplicates, unsorted, rewritten.
+		"""
+		self.load_index()
+
+		current_month = int(datetime.now().astimezone(UTC()).strftime('%Y%m'))
+
+		reports = []
+		months = self.months()
+
+		# forget the removed files
+		from_month, to_month = self.months_range()
+		present = set(month for month, pathname in months)
+
+		for month in list(self._index.keys()):
+			if from_month <= month <= to_month and month not in present:
+				del self._index[month]
+
+		for month, pathname in months:
+			if not force and month >= current_month:
+				# possibly being written by a watcher
+				continue
+
+			st = os.stat(pathname)
+			entry = self._index.get(month)
+
+			if not force and entry is not None and entry['size'] == st.st_size and entry['mtime'] == st.st_mtime:
+				# unchanged since validated
+				continue
+
+			report = self.optimize_file(month, pathname)
+			reports.append(report)
+
+			st = os.stat(pathname)
+			self._index[month] = np.array((month, report['count'], report['first'], report['last'], st.st_size, st.st_mtime),
+					dtype=TickOptimizer.INDEX_DTYPE)
+
+		self.save_index()
+
+		return reports
+
+	def optimize_file(self, month, pathname):
+		"""
+		Verify a monthly file and rewrite it if it contains invalid, unordered or duplicated ticks.
+		"""
+		month_start, month_end = TickOptimizer.month_range(month)
+
+		size = os.path.getsize(pathname)
+		count = size // TickStreamer.TICK_SIZE
+
+		ticks = TickOptimizer.map(pathname, count)
+
+		report = {
+			'month': month,
+			'count': count,
+			'invalid': 0,
+			'duplicates': 0,
+			'unsorted': False,
+			'truncated': size % TickStreamer.TICK_SIZE != 0,
+			'rewritten': False,
+			'first': 0.0,
+			'last': 0.0
+		}
+
+		prev_t = -math.inf
+		ofs = 0
+
+		while ofs < count:
+			end = min(ofs + self._block_size, count)
+
+			if not report['unsorted']:
+				# don't split a group of same timestamp, its duplicates must be in the same block
+				t = ticks['t']
+				while end < count and t[end] == t[end-1]:
+					end += 1
+
+			block = ticks[ofs:end]
+			t = block['t']
+
+			report['invalid'] += len(block) - int(np.count_nonzero(TickOptimizer.valid(block, month_start, month_end)))
+
+			if t[0] < prev_t or np.any(t[1:] < t[:-1]):
+				report['unsorted'] = True
+
+			if not report['unsorted']:
+				report['duplicates'] += TickOptimizer.count_duplicates(block)
+
+			prev_t = t[-1]
+			ofs = end
+
+		if report['invalid'] or report['unsorted'] or report['duplicates'] or report['truncated']:
+			ticks = None
+			report['count'], report['duplicates'] = self.rewrite(pathname, count, month_start, month_end)
+			report['rewritten'] = True
+
+			ticks = TickOptimizer.map(pathname, report['count'])
+
+		if report['count']:
+			report['first'] = float(ticks['t'][0])
+			report['last'] = float(ticks['t'][-1])
+
+		return report
+
+	def rewrite(self, pathname, count, month_start, month_end):
+		"""
+		External merge sort of the valid ticks of the file, without the duplicates.
+		@return Tuple (count of ticks written, count of duplicates removed)
+		"""
+		ticks = TickOptimizer.map(pathname, count)
+
+		runs = []
+		duplicates = 0
+
+		# sorted runs, with their own duplicates removed
+		for ofs in range(0, count, self._block_size):
+			block = ticks[ofs:ofs+self._block_size]
+			block = block[TickOptimizer.valid(block, month_start, month_end)]
+
+			block = block[TickOptimizer.sort_order(block)]
+			unique = TickOptimizer.unique_mask(block)
+
+			duplicates += len(block) - int(np.count_nonzero(unique))
+
+			run_pathname = "%s.run%i" % (pathname, len(runs))
+			block[unique].tofile(run_pathname)
+			runs.append(run_pathname)
+
+		ticks = None
+		written = 0
+
+		tmp_pathname = pathname + ".tmp"
+
+		try:
+			if len(runs) <= 1:
+				if runs:
+					os.replace(runs[0], tmp_pathname)
+					written = os.path.getsize(tmp_pathname) // TickStreamer.TICK_SIZE
+				else:
+					open(tmp_pathname, 'wb').close()
+			else:
+				written, dups = self.merge(runs, tmp_pathname)
+				duplicates += dups
+
+			os.replace(tmp_pathname, pathname)
+		finally:
+			for run_pathname in runs:
+				if os.path.exists(run_pathname):
+					os.remove(run_pathname)
+
+		return written, duplicates
+
+	def merge(self, runs, pathname):
+		"""
+		Merge of the sorted runs files into pathname, by blocks.
+		@return Tuple (count of ticks written, count of duplicates removed)
+		"""
+		arrays = [TickOptimizer.map(run, os.path.getsize(run) // TickStreamer.TICK_SIZE) for run in runs]
+		arrays = [a for a in arrays if len(a)]
+
+		positions = [0] * len(arrays)
+		step = max(1, self._block_size // max(1, len(arrays)))
+
+		written = 0
+		duplicates = 0
+
+		with open(pathname, 'wb') as f:
+			while True:
+				active = [i for i, a in enumerate(arrays) if positions[i] < len(a)]
+				if not active:
+					break
+
+				# any tick until the lowest last timestamp of the current blocks can be written, including the same
+				# timestamps of the next blocks, then the duplicates are always into the same merged block
+				threshold = min(arrays[i]['t'][min(positions[i] + step, len(arrays[i])) - 1] for i in active)
+
+				parts = []
+
+				for i in active:
+					t = arrays[i]['t']
+					end = positions[i] + int(t[positions[i]:].searchsorted(threshold, 'right'))
+
+					if end > positions[i]:
+						parts.append(arrays[i][positions[i]:end])
+						positions[i] = end
+
+				block = np.concatenate(parts) if len(parts) > 1 else parts[0]
+				block = block[TickOptimizer.sort_order(block)]
+
+				unique = TickOptimizer.unique_mask(block)
+				block = block[unique]
+
+				duplicates += len(unique) - len(block)
+
+				block.tofile(f)
+				written += len(block)
+
+		return written, duplicates
 
 	def detect_gaps(self):
-		# @todo
-		return []
+		"""
+		Detect the periods without tick longer than max gap of open market time, into and between the indexed files.
+		Must be called after optimize, the files are then sorted.
+
+		@return List of tuple (from timestamp, to timestamp, open duration in seconds).
+		"""
+		if not self._index:
+			self.load_index()
+
+		gaps = []
+		prev_last = None
+
+		for month, pathname in self.months():
+			entry = self._index.get(month)
+			if entry is None or not entry['count']:
+				continue
+
+			if prev_last is not None:
+				# between the last tick of the previous file and the first of this one
+				duration = float(self._market_hours.open_duration(np.array([prev_last]), np.array([entry['first']]))[0])
+				if duration > self._max_gap:
+					gaps.append((prev_last, float(entry['first']), duration))
+
+			t = TickOptimizer.map(pathname, int(entry['count']))['t']
+
+			for ofs in range(0, len(t), self._block_size):
+				# one more tick to overlap the next block
+				block = t[ofs:ofs+self._block_size+1]
+
+				idx = np.flatnonzero(block[1:] - block[:-1] > self._max_gap)
+				if not len(idx):
+					continue
+
+				durations = self._market_hours.open_duration(block[idx], block[idx+1])
+
+				for i, duration in zip(idx[durations > self._max_gap].tolist(), durations[durations > self._max_gap].tolist()):
+					gaps.append((float(block[i]), float(block[i+1]), duration))
+
+			prev_last = float(entry['last'])
+
+		return gaps
+
+	#
+	# helpers
+	#
+
+	@staticmethod
+	def map(pathname, count):
+		if count <= 0:
+			return np.empty(0, dtype=TickStreamer.TICK_DTYPE)
+
+		return np.memmap(pathname, dtype=TickStreamer.TICK_DTYPE, mode='r', shape=(count,)).view(np.ndarray)
+
+	@staticmethod
+	def month_range(month):
+		"""
+		From (included) and to (excluded) timestamps of a month YYYYMM.
+		"""
+		year, month = divmod(month, 100)
+
+		from_date = datetime(year, month, 1, tzinfo=UTC())
+		to_date = from_date.replace(year=year+1, month=1) if month == 12 else from_date.replace(month=month+1)
+
+		return from_date.timestamp(), to_date.timestamp()
+
+	@staticmethod
+	def valid(block, month_start, month_end):
+		"""
+		Mask of the valid ticks : finite values, positive prices, positive or zero volume, into the month.
+		"""
+		t = block['t']
+		b = block['b']
+		o = block['o']
+		v = block['v']
+
+		return np.isfinite(t) & np.isfinite(b) & np.isfinite(o) & np.isfinite(v) & \
+			(t >= month_start) & (t < month_end) & (b > 0.0) & (o > 0.0) & (v >= 0.0)
+
+	@staticmethod
+	def sort_order(block):
+		"""
+		Order of the ticks by timestamp. Stable, the ticks sharing a timestamp keep their order.
+		"""
+		return np.argsort(block['t'], kind='stable')
+
+	@staticmethod
+	def unique_mask(block):
+		"""
+		Mask of the ticks that are not a duplicate of a previous tick, for a block sorted by timestamp. Only the ticks
+		sharing their timestamp are compared, ordered by (t, b, o, v) to find the identical ones, but only to build
+		the mask, the order of the block is not modified.
+		"""
+		mask = np.ones(len(block), dtype=bool)
+
+		t = block['t']
+		if len(t) < 2:
+			return mask
+
+		ties = t[1:] == t[:-1]
+		if not ties.any():
+			return mask
+
+		same = np.zeros(len(t), dtype=bool)
+		same[1:] |= ties
+		same[:-1] |= ties
+
+		idx = np.flatnonzero(same)
+		group = block[idx]
+
+		# stable, then the first of identical ticks is the earliest one
+		order = np.lexsort((group['v'], group['o'], group['b'], group['t']))
+		group = group[order]
+
+		first = np.ones(len(group), dtype=bool)
+		first[1:] = (group['t'][1:] != group['t'][:-1]) | (group['b'][1:] != group['b'][:-1]) | \
+			(group['o'][1:] != group['o'][:-1]) | (group['v'][1:] != group['v'][:-1])
+
+		mask[idx[order]] = first
+
+		return mask
+
+	@staticmethod
+	def count_duplicates(block):
+		"""
+		Number of duplicated ticks of a block sorted by timestamp.
+		"""
+		return len(block) - int(np.count_nonzero(TickOptimizer.unique_mask(block)))
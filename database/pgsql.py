@@ -3,7 +3,9 @@
 # @license Copyright (c) 2018 Dream Overflow
 # Storage service, postgresql implementation
 
+import io
 import os
+import csv
 import json
 import time
 import threading
@@ -23,7 +25,7 @@ from trader.asset import Asset
 from config.utils import databases
 
 from .tickstorage import TickStorage, TickStreamer
-from .ohlcstorage import OhlcStorage, OhlcStreamer
+from .ohlcstorage import OhlcStorage
 
 from .database import Database
 
@@ -138,12 +140,6 @@ class PgSql(Database):
 
         self._db.commit()
 
-    def create_ohlc_streamer(self, broker_id, market_id, timeframe, from_date, to_date, buffer_size=8192):
-        """
-        Create a new tick streamer.
-        """
-        return OhlcStreamer(self._db, timeframe, broker_id, market_id, from_date, to_date, buffer_size)
-
     #
     # Processing
     #
@@ -544,38 +540,37 @@ class PgSql(Database):
 
                 for mk in mks:
                     if mk[6]:
-                        # last n
-                        cursor.execute("""SELECT COUNT(*) FROM ohlc WHERE broker_id = '%s' AND market_id = '%s' AND timeframe = %s""" % (mk[1], mk[2], mk[3]))
-                        count = int(cursor.fetchone()[0])
-                        offset = max(0, count - mk[6])
-
-                        # LIMIT should not be necessary then
+                        # last n, in reverse order
                         cursor.execute("""SELECT timestamp, bid_open, bid_high, bid_low, bid_close, ask_open, ask_high, ask_low, ask_close, volume FROM ohlc
-                                        WHERE broker_id = '%s' AND market_id = '%s' AND timeframe = %s ORDER BY timestamp ASC LIMIT %i OFFSET %i""" % (
-                                            mk[1], mk[2], mk[3], mk[6], offset))
+                                        WHERE broker_id = %s AND market_id = %s AND timeframe = %s ORDER BY timestamp DESC LIMIT %s""", (
+                                            mk[1], mk[2], mk[3], mk[6]))
                     elif mk[4] and mk[5]:
                         # from to
                         cursor.execute("""SELECT timestamp, bid_open, bid_high, bid_low, bid_close, ask_open, ask_high, ask_low, ask_close, volume FROM ohlc
-                                        WHERE broker_id = '%s' AND market_id = '%s' AND timeframe = %s AND timestamp >= %i AND timestamp <= %i ORDER BY timestamp ASC""" % (
+                                        WHERE broker_id = %s AND market_id = %s AND timeframe = %s AND timestamp >= %s AND timestamp <= %s ORDER BY timestamp ASC""", (
                                             mk[1], mk[2], mk[3], mk[4], mk[5]))
                     elif mk[4]:
                         # from to now
                         cursor.execute("""SELECT timestamp, bid_open, bid_high, bid_low, bid_close, ask_open, ask_high, ask_low, ask_close, volume FROM ohlc
-                                        WHERE broker_id = '%s' AND market_id = '%s' AND timeframe = %s AND timestamp >= %i ORDER BY timestamp ASC""" % (
+                                        WHERE broker_id = %s AND market_id = %s AND timeframe = %s AND timestamp >= %s ORDER BY timestamp ASC""", (
                                             mk[1], mk[2], mk[3], mk[4]))
                     elif mk[5]:
                         # to now
                         cursor.execute("""SELECT timestamp, bid_open, bid_high, bid_low, bid_close, ask_open, ask_high, ask_low, ask_close, volume FROM ohlc
-                                        WHERE broker_id = '%s' AND market_id = '%s' AND timeframe = %s AND timestamp <= %i ORDER BY timestamp ASC""" % (
+                                        WHERE broker_id = %s AND market_id = %s AND timeframe = %s AND timestamp <= %s ORDER BY timestamp ASC""", (
                                             mk[1], mk[2], mk[3], mk[5]))
                     else:
                         # all
                         cursor.execute("""SELECT timestamp, bid_open, bid_high, bid_low, bid_close, ask_open, ask_high, ask_low, ask_close, volume FROM ohlc
-                                        WHERE broker_id = '%s' AND market_id = '%s' AND timeframe = %s ORDER BY timestamp ASC""" % (
+                                        WHERE broker_id = %s AND market_id = %s AND timeframe = %s ORDER BY timestamp ASC""", (
                                             mk[1], mk[2], mk[3]))
 
                     rows = cursor.fetchall()
 
+                    if mk[6]:
+                        rows = rows[::-1]
+                        self.cache_ohlcs(mk[1], mk[2], mk[3], rows, mk[6])
+
                     ohlcs = []
 
                     for row in rows:
@@ -609,34 +604,7 @@ class PgSql(Database):
         # insert market ohlcs
         #
 
-        if time.time() - self._last_ohlc_flush >= 60 or len(self._pending_ohlc_insert) > 500:
-            self.lock()
-            mkd = self._pending_ohlc_insert
-            self._pending_ohlc_insert = []
-            self.unlock()
-
-            if mkd:
-                try:
-                    cursor = self._db.cursor()
-
-                    query = ' '.join((
-                        "INSERT INTO ohlc(broker_id, market_id, timestamp, timeframe, bid_open, bid_high, bid_low, bid_close, ask_open, ask_high, ask_low, ask_close, volume) VALUES",
-                        ','.join(["('%s', '%s', %i, %i, '%s', '%s', '%s', '%s', '%s', '%s', '%s', '%s', '%s')" % (mk[0], mk[1], mk[2], mk[3], mk[4], mk[5], mk[6], mk[7], mk[8], mk[9], mk[10], mk[11], mk[12]) for mk in mkd]),
-                        "ON CONFLICT (broker_id, market_id, timestamp, timeframe) DO UPDATE SET bid_open = EXCLUDED.bid_open, bid_high = EXCLUDED.bid_high, bid_low = EXCLUDED.bid_low, bid_close = EXCLUDED.bid_close, ask_open = EXCLUDED.ask_open, ask_high = EXCLUDED.ask_high, ask_low = EXCLUDED.ask_low, ask_close = EXCLUDED.ask_close, volume = EXCLUDED.volume"
-                    ))
-
-                    cursor.execute(query)
-
-                    self._db.commit()
-                except Exception as e:
-                    logger.error(repr(e))
-
-                    # retry the next time
-                    self.lock()
-                    self._pending_ohlc_insert = mkd + self._pending_ohlc_insert
-                    self.unlock()
-
-                self._last_ohlc_flush = time.time()
+        self.flush_ohlcs()
 
         #
         # clean older ohlcs
@@ -657,3 +625,40 @@ class PgSql(Database):
                 logger.error(repr(e))
 
             self._last_ohlc_clean = time.time()
+
+    def insert_ohlcs(self, ohlcs):
+        """
+        COPY the ohlcs as CSV into a temporary table, then upsert from it.
+        """
+        cursor = self._db.cursor()
+
+        cursor.execute("""
+            CREATE TEMPORARY TABLE IF NOT EXISTS ohlc_copy(
+                broker_id VARCHAR(255) NOT NULL, market_id VARCHAR(255) NOT NULL,
+                timestamp BIGINT NOT NULL, timeframe INTEGER NOT NULL,
+                bid_open VARCHAR(32) NOT NULL, bid_high VARCHAR(32) NOT NULL, bid_low VARCHAR(32) NOT NULL, bid_close VARCHAR(32) NOT NULL,
+                ask_open VARCHAR(32) NOT NULL, ask_high VARCHAR(32) NOT NULL, ask_low VARCHAR(32) NOT NULL, ask_close VARCHAR(32) NOT NULL,
+                volume VARCHAR(48) NOT NULL) ON COMMIT DELETE ROWS""")
+
+        cursor.execute("TRUNCATE ohlc_copy")
+
+        # strings are quoted, then empty values are not NULL
+        data = io.StringIO()
+        writer = csv.writer(data, quoting=csv.QUOTE_NONNUMERIC, lineterminator='\n')
+
+        for mk in ohlcs:
+            writer.writerow((str(mk[0]), str(mk[1]), int(mk[2]), int(mk[3]), str(mk[4]), str(mk[5]), str(mk[6]), str(mk[7]),
+                    str(mk[8]), str(mk[9]), str(mk[10]), str(mk[11]), str(mk[12])))
+
+        data.seek(0)
+
+        cursor.copy_expert("""COPY ohlc_copy(broker_id, market_id, timestamp, timeframe, bid_open, bid_high, bid_low, bid_close,
+                ask_open, ask_high, ask_low, ask_close, volume) FROM STDIN WITH (FORMAT csv)""", data)
+
+        cursor.execute("""
+            INSERT INTO ohlc(broker_id, market_id, timestamp, timeframe, bid_open, bid_high, bid_low, bid_close, ask_open, ask_high, ask_low, ask_close, volume)
+                SELECT broker_id, market_id, timestamp, timeframe, bid_open, bid_high, bid_low, bid_close, ask_open, ask_high, ask_low, ask_close, volume FROM ohlc_copy
+            ON CONFLICT (broker_id, market_id, timestamp, timeframe) DO UPDATE SET
+                bid_open = EXCLUDED.bid_open, bid_high = EXCLUDED.bid_high, bid_low = EXCLUDED.bid_low, bid_close = EXCLUDED.bid_close,
+                ask_open = EXCLUDED.ask_open, ask_high = EXCLUDED.ask_high, ask_low = EXCLUDED.ask_low, ask_close = EXCLUDED.ask_close,
+                volume = EXCLUDED.volume""")
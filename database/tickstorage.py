@@ -5,6 +5,7 @@
 
 import os
 import json
+import math
 import copy
 import time
 import threading
@@ -154,14 +155,21 @@ class TickStorage(object):
 class TickStreamer(object):
     """
     Streamer that read data from an initial position.
+
+    In memory-mapped mode (only for binary files) each monthly file is mapped as a structured array of
+    (t, b, o, v) float64, and next_array returns zero-copy slices of it. The tuple API (next, next_to)
+    remains available in that mode, tuples being produced from the mapped array.
     """
 
     TICK_SIZE = 4*8  # 32B
 
-    def __init__(self, markets_path, broker_id, market_id, from_date, to_date=None, buffer_size=1000, binary=True):
+    TICK_DTYPE = np.dtype([('t', 'float64'), ('b', 'float64'), ('o', 'float64'), ('v', 'float64')])
+
+    def __init__(self, markets_path, broker_id, market_id, from_date, to_date=None, buffer_size=1000, binary=True, use_mmap=False):
         """
         @param from_date datetime Object
         @param to_date datetime Object
+        @param use_mmap If True and binary, memory-map the monthly files.
         """
 
         self._markets_path = markets_path
@@ -181,10 +189,23 @@ class TickStreamer(object):
         self._is_binary = False
 
         self._struct = struct.Struct('dddd')
-        self._tick_type = np.dtype([('t', 'float64'), ('b', 'float64'), ('o', 'float64'), ('v', 'float64')])
+        self._tick_type = TickStreamer.TICK_DTYPE
+
+        self._use_mmap = use_mmap and binary
+        self._mmap = None      # current month mapped array
+        self._mmap_t = None    # timestamp column of the mapped array
+        self._mmap_pos = 0     # read position into the mapped array
+
+    @property
+    def use_mmap(self):
+        return self._use_mmap
 
     def open(self):
-        if self._file:
+        if self._file or self._mmap is not None:
+            return
+
+        if self._use_mmap:
+            self.__open_mmap()
             return
 
         data_path = pathlib.Path(self._markets_path, self._broker_id, self._market_id, 'T')
@@ -233,7 +254,9 @@ class TickStreamer(object):
                         # move backward
                         right = pos - TickStreamer.TICK_SIZE
 
-                    elif self._file.tell() == EOF:
+                    else:
+                        # exact match
+                        self._file.seek(-TickStreamer.TICK_SIZE, 1)
                         break
 
                     pos = max(0, left + ((right - left) // TickStreamer.TICK_SIZE) // 2 * TickStreamer.TICK_SIZE)
@@ -249,17 +272,117 @@ class TickStreamer(object):
                 self._file = open(pathname, "rt")
                 self._is_binary = False
 
+    def __open_mmap(self):
+        data_path = pathlib.Path(self._markets_path, self._broker_id, self._market_id, 'T')
+        if not data_path.exists():
+            return
+
+        filename = "%s%s.dat" % (self._curr_date.strftime('%Y%m'), self._market_id)
+        pathname = '/'.join((str(data_path), filename))
+
+        if not os.path.isfile(pathname):
+            return
+
+        # ignore a possibly partially written trailing tick
+        count = os.stat(pathname).st_size // TickStreamer.TICK_SIZE
+        if count <= 0:
+            return
+
+        # plain ndarray view, slicing a memmap subclass is costly and the mapping is kept alive by the view
+        self._mmap = np.memmap(pathname, dtype=self._tick_type, mode='r', shape=(count,)).view(np.ndarray)
+        self._mmap_t = self._mmap['t']
+        self._is_binary = True
+
+        # directly seek to the initial position (file must be ordered)
+        self._mmap_pos = int(self._mmap_t.searchsorted(self._from_date.timestamp(), 'left'))
+
     def close(self):
         if self._file:
             self._file.close()
             self._file = None
 
+        if self._mmap is not None:
+            # release the mapping (closed once no more views reference it)
+            self._mmap = None
+            self._mmap_t = None
+            self._mmap_pos = 0
+
     def finished(self):
         """
         No more data into the buffer and "to date" reached.
         """
         return (self._curr_date >= self._to_date) and not self._buffer
 
+    def next_array(self, timestamp):
+        """
+        Returns a structured array (t, b, o, v) of the ticks having a timestamp lesser or equal to timestamp.
+        Only in memory-mapped mode. The result is a zero-copy view of the mapped file, except when the range
+        overlaps two months, in which case the parts are concatenated.
+
+        @note Don't mix with next/next_to on the same streamer.
+        """
+        parts = []
+
+        while self._curr_date < self._to_date:
+            if self._mmap is None:
+                self.open()
+
+            if self._mmap is not None:
+                # until timestamp
+                end = int(self._mmap_t.searchsorted(timestamp, 'right'))
+
+                if end > self._mmap_pos:
+                    parts.append(self._mmap[self._mmap_pos:end])
+                    self._mmap_pos = end
+
+                if self._mmap_pos < len(self._mmap):
+                    # remaining ticks are after timestamp
+                    break
+
+            # end of the file or no file for this month
+            self.close()
+            self.__next_month()
+
+            if self._curr_date.timestamp() > timestamp:
+                break
+
+        if not parts:
+            return self._mmap[0:0] if self._mmap is not None else np.empty(0, dtype=self._tick_type)
+
+        if len(parts) == 1:
+            return parts[0]
+
+        return np.concatenate(parts)
+
+    def next_timestamp(self):
+        """
+        Timestamp of the next tick to be streamed, without consuming it, or math.inf if there is no more ticks.
+        """
+        if self._use_mmap:
+            while self._curr_date < self._to_date:
+                if self._mmap is None:
+                    self.open()
+
+                if self._mmap is not None and self._mmap_pos < len(self._mmap):
+                    return self._mmap_t[self._mmap_pos]
+
+                # end of the file or no file for this month
+                self.close()
+                self.__next_month()
+
+            return math.inf
+
+        while not self._buffer and self._curr_date < self._to_date:
+            self.__bufferize()
+
+        return self._buffer[0][0] if self._buffer else math.inf
+
+    def __next_month(self):
+        if self._curr_date.month == 12:
+            self._curr_date = self._curr_date.replace(year=self._curr_date.year+1, month=1, day=1)
+        else:
+            self._curr_date = self._curr_date.replace(month=self._curr_date.month+1, day=1)
+
     def next(self, timestamp):
         results = []
 
@@ -313,12 +436,21 @@ class TickStreamer(object):
 
     def __bufferize(self):
         if self._curr_date < self._to_date:
-            if not self._file:
+            if not self._file and self._mmap is None:
                 self.open()
 
             file_end = False
 
-            if self._file:
+            if self._mmap is not None:
+                # tuples from the memory-mapped array
+                end = min(self._mmap_pos + self._buffer_size, len(self._mmap))
+                self._buffer.extend(self._mmap[self._mmap_pos:end].tolist())
+                self._mmap_pos = end
+
+                if end >= len(self._mmap):
+                    file_end = True
+
+            elif self._file:
                 if self._is_binary:
                     arr = self._file.read(4*8*self._buffer_size)  # read 4 float64 * n
                     data = self._struct.iter_unpack(arr)
@@ -361,10 +493,7 @@ class TickStreamer(object):
                 self.close()
 
                 # next month/year
-                if self._curr_date.month == 12:
-                    self._curr_date = self._curr_date.replace(year=self._curr_date.year+1, month=1, day=1)
-                else:
-                    self._curr_date = self._curr_date.replace(month=self._curr_date.month+1, day=1)
+                self.__next_month()
 
 
 class TextToBinary(object):
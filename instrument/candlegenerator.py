@@ -3,15 +3,29 @@
 # @license Copyright (c) 2018 Dream Overflow
 # Higher candle generator.
 
-from datetime import datetime, timedelta
-from common.utils import UTC
+import copy
+import time
+import calendar
 
-from instrument.instrument import Candle
+import numpy as np
+
+from instrument.instrument import Instrument, Candle, CandleBatch
+from instrument.ringbuffer import CandleRingBuffer
 
 
 class CandleGenerator(object):
+    """
+    Generate the candles of a timeframe from ticks or from the candles of a lower timeframe.
+
+    A candle is closed once a tick or a candle reach the base time of the next one. The weekly candles begin
+    on monday 00:00 UTC and the monthly (30 days timeframe) ones on the first day of the month 00:00 UTC.
+    """
+
+    MIN_VECTORIZED_TICKS = 16  # below the per tick update is faster
 
-    __slots__ = '_from_tf', '_to_tf', '_candle', '_last_timestamp', '_last_consumed'
+    WEEK_ORIGIN = 4*24*60*60  # 1970-01-05 was the first monday
+
+    __slots__ = '_from_tf', '_to_tf', '_candle', '_next_base', '_last_timestamp', '_last_consumed'
 
     def __init__(self, from_tf, to_tf):
         """
@@ -23,6 +37,7 @@ class CandleGenerator(object):
         self._from_tf = float(from_tf)
         self._to_tf = float(to_tf)
         self._candle = None
+        self._next_base = 0.0  # base time of the candle following the current one
         self._last_timestamp = 0
         self._last_consumed = 0
 
@@ -36,6 +51,7 @@ class CandleGenerator(object):
     @current.setter
     def current(self, candle):
         self._candle = candle
+        self._next_base = self.nextbase(candle.timestamp) if candle else 0.0
 
     @property
     def last_timestamp(self):
@@ -56,8 +72,12 @@ class CandleGenerator(object):
     def generate_from_candles(self, from_candles, ignore_non_ended=True):
         """
         Generate as many higher candles as possible from the array of candles given in parameters.
+        @param from_candles List of Candle, or a CandleBatch then the generated candles are returned as a CandleBatch.
         @note Non ended candles are ignored because it will false the volume.
         """
+        if isinstance(from_candles, CandleBatch):
+            return self.generate_from_batch(from_candles)
+
         to_candles = []
         self._last_consumed = 0
 
@@ -70,10 +90,89 @@ class CandleGenerator(object):
 
         return to_candles
 
+    def generate_from_batch(self, batch):
+        """
+        Vectorized version of generate_from_candles for a CandleBatch, returns a CandleBatch.
+        The candles are grouped per base time, the last group remains the current non consolidated candle.
+        """
+        self._last_consumed = len(batch)
+
+        if not len(batch):
+            return CandleBatch(self._to_tf)
+
+        if self._from_tf != batch.timeframe:
+            raise ValueError("From candle must be of time unit %s but %s is provided" % (self._from_tf, batch.timeframe))
+
+        data = batch.data
+        data = data[:, (data[CandleRingBuffer.ENDED] != 0.0) & (data[CandleRingBuffer.TIMESTAMP] > self._last_timestamp)]
+
+        n = data.shape[1]
+        if not n:
+            return CandleBatch(self._to_tf)
+
+        timestamps = data[CandleRingBuffer.TIMESTAMP]
+        base_times = self.basetimes(timestamps)
+
+        # first and last index of each group of same base time
+        firsts = np.flatnonzero(np.concatenate(([True], base_times[1:] != base_times[:-1])))
+        lasts = np.concatenate((firsts[1:], [n])) - 1
+
+        groups = np.empty((CandleRingBuffer.NUM_COLUMNS, len(firsts)))
+
+        groups[CandleRingBuffer.TIMESTAMP] = base_times[firsts]
+        groups[CandleRingBuffer.VOLUME] = np.add.reduceat(data[CandleRingBuffer.VOLUME], firsts)
+        groups[CandleRingBuffer.ENDED] = 1.0
+
+        for o, h, l, c in ((CandleRingBuffer.BID_OPEN, CandleRingBuffer.BID_HIGH, CandleRingBuffer.BID_LOW, CandleRingBuffer.BID_CLOSE),
+                           (CandleRingBuffer.OFR_OPEN, CandleRingBuffer.OFR_HIGH, CandleRingBuffer.OFR_LOW, CandleRingBuffer.OFR_CLOSE)):
+            groups[o] = data[o, firsts]
+            groups[h] = np.maximum.reduceat(data[h], firsts)
+            groups[l] = np.minimum.reduceat(data[l], firsts)
+            groups[c] = data[c, lasts]
+
+        ended = []
+
+        if self._candle:
+            if groups[CandleRingBuffer.TIMESTAMP, 0] >= self._next_base:
+                # the current one is closed
+                self._candle.set_consolidated(True)
+                ended.append(CandleBatch.from_candles([self._candle], self._to_tf).data)
+            else:
+                # the first group continue the current one
+                c = self._candle
+                g = groups[:, 0]
+
+                g[CandleRingBuffer.TIMESTAMP] = c._timestamp
+                g[CandleRingBuffer.VOLUME] += c._volume
+
+                g[CandleRingBuffer.BID_OPEN] = c._bid_open
+                g[CandleRingBuffer.BID_HIGH] = max(c._bid_high, g[CandleRingBuffer.BID_HIGH])
+                g[CandleRingBuffer.BID_LOW] = min(c._bid_low, g[CandleRingBuffer.BID_LOW])
+
+                g[CandleRingBuffer.OFR_OPEN] = c._ofr_open
+                g[CandleRingBuffer.OFR_HIGH] = max(c._ofr_high, g[CandleRingBuffer.OFR_HIGH])
+                g[CandleRingBuffer.OFR_LOW] = min(c._ofr_low, g[CandleRingBuffer.OFR_LOW])
+
+        ended.append(groups[:, :-1])
+
+        # the last group is the new current one
+        self.current = CandleBatch(self._to_tf, groups[:, -1:]).candle(0)
+        self._candle.set_consolidated(False)
+
+        self._last_timestamp = timestamps[-1]
+
+        return CandleBatch(self._to_tf, np.concatenate(ended, axis=1))
+
     def generate_from_ticks(self, from_ticks):
         """
         Generate as many higher candles as possible from the array of ticks given in parameters.
+        @param from_ticks List of ticks tuples or 2d array of (timestamp, bid, ofr, volume).
+
+        @note Blocks of ticks are processed by generate_from_tick_array.
         """
+        if len(from_ticks) >= CandleGenerator.MIN_VECTORIZED_TICKS:
+            return self.generate_from_tick_array(np.asarray(from_ticks, dtype=np.float64))
+
         to_candles = []
         self._last_consumed = 0
 
@@ -86,20 +185,207 @@ class CandleGenerator(object):
 
         return to_candles
 
+    def generate_from_tick_array(self, ticks):
+        """
+        Vectorized version of generate_from_ticks, giving the same candles. The ticks of the current candle
+        are found by a binary search, the others are grouped per base time and reduced at once.
+        @param ticks 2d array of (timestamp, bid, ofr, volume), ordered by timestamp.
+        """
+        self._last_consumed = len(ticks)
+
+        if not len(ticks):
+            return []
+
+        # ignore the ticks that are not more recent than the previous ones
+        t = ticks[:, 0]
+        prev = np.maximum.accumulate(np.concatenate(([self._last_timestamp], t[:-1])))
+
+        ticks = ticks[t > prev]
+        n = len(ticks)
+
+        if not n:
+            return []
+
+        t = ticks[:, 0]
+        to_candles = []
+        first = 0
+
+        if self._candle:
+            # update the current candle with its ticks
+            first = int(t.searchsorted(self._next_base, 'left'))
+
+            if first:
+                candle = self._candle
+
+                # added in order, from the current volume
+                candle._volume = np.add.accumulate(np.concatenate(([candle._volume], ticks[:first, 3])))[-1].item()
+
+                candle._bid_high = max(candle._bid_high, ticks[:first, 1].max().item())
+                candle._bid_low = min(candle._bid_low, ticks[:first, 1].min().item())
+                candle._bid_close = ticks[first-1, 1].item()
+
+                candle._ofr_high = max(candle._ofr_high, ticks[:first, 2].max().item())
+                candle._ofr_low = min(candle._ofr_low, ticks[:first, 2].min().item())
+                candle._ofr_close = ticks[first-1, 2].item()
+
+            if first < n:
+                # need to close the candle
+                self._candle.set_consolidated(True)
+                to_candles.append(self._candle)
+
+                self._candle = None
+
+        if first < n:
+            rest = ticks[first:]
+            base_times = self.basetimes(rest[:, 0])
+
+            # first and last index of each group of same base time
+            firsts = np.flatnonzero(np.concatenate(([True], base_times[1:] != base_times[:-1])))
+            lasts = np.concatenate((firsts[1:], [len(rest)])) - 1
+
+            bids = rest[:, 1]
+            ofrs = rest[:, 2]
+
+            columns = (base_times[firsts],
+                    bids[firsts], np.maximum.reduceat(bids, firsts), np.minimum.reduceat(bids, firsts), bids[lasts],
+                    ofrs[firsts], np.maximum.reduceat(ofrs, firsts), np.minimum.reduceat(ofrs, firsts), ofrs[lasts],
+                    CandleGenerator.ordered_sums(rest[:, 3], firsts, lasts))
+
+            for ts, bo, bh, bl, bc, oo, oh, ol, oc, v in zip(*(c.tolist() for c in columns)):
+                candle = Candle(ts, self._to_tf)
+
+                candle.set_bid_ohlc(bo, bh, bl, bc)
+                candle.set_ofr_ohlc(oo, oh, ol, oc)
+                candle.set_volume(v)
+
+                to_candles.append(candle)
+
+            # the last one is the current non consolidated candle
+            self.current = to_candles.pop(-1)
+            self._candle.set_consolidated(False)
+
+        self._last_timestamp = t[-1].item()
+
+        return to_candles
+
+    @staticmethod
+    def ordered_sums(values, firsts, lasts):
+        """
+        Sum of each group of values, added one by one in order as update_from_tick does, to give exactly
+        the same floats (np.add.reduceat sums by pairs).
+
+        The short groups are summed together, a position per step, and the long ones each by an accumulation.
+        @param firsts, lasts Index of the first and last value of each group.
+        """
+        LONG_GROUP = 64
+
+        lengths = lasts - firsts + 1
+        sums = np.zeros(len(firsts))
+
+        # short groups, by decreasing length then the groups still having a value at a position are a prefix
+        short = np.flatnonzero(lengths <= LONG_GROUP)
+        short = short[np.argsort(-lengths[short], kind='stable')]
+        short_firsts = firsts[short]
+        short_sums = np.zeros(len(short))
+
+        counts = np.searchsorted(-lengths[short], -np.arange(1, LONG_GROUP+1), 'right')
+
+        for k, count in enumerate(counts.tolist()):
+            if not count:
+                break
+
+            short_sums[:count] += values[short_firsts[:count] + k]
+
+        sums[short] = short_sums
+
+        for i in np.flatnonzero(lengths > LONG_GROUP).tolist():
+            sums[i] = np.add.accumulate(values[firsts[i]:lasts[i]+1])[-1]
+
+        return sums
+
     def basetime(self, timestamp):
-        if self._to_tf < 7*24*60*60:
-            # simplest
-            return int(timestamp / self._to_tf) * self._to_tf
-        elif self._to_tf == 7*24*60*60:
-            # must find the UTC first day of week
-            dt = datetime.utcfromtimestamp(timestamp)
-            dt = dt.replace(hour=0, minute=0, second=0, microsecond=0, tzinfo=UTC()) - timedelta(days=dt.weekday())
-            return dt.timestamp()
-        elif self._to_tf == 30*24*60*60:
-            # replace by first day of month at 00h00 UTC
-            dt = datetime.utcfromtimestamp(timestamp)
-            dt = dt.replace(day=1, hour=0, minute=0, second=0, microsecond=0, tzinfo=UTC())
-            return dt.timestamp()
+        if self._to_tf == Instrument.TF_WEEK:
+            # monday 00:00 UTC
+            origin = CandleGenerator.WEEK_ORIGIN
+            return int((timestamp - origin) // self._to_tf) * self._to_tf + origin
+        elif self._to_tf == Instrument.TF_MONTH:
+            # first day of month at 00:00 UTC
+            tm = time.gmtime(timestamp)
+            return float(calendar.timegm((tm.tm_year, tm.tm_mon, 1, 0, 0, 0)))
+
+        return int(timestamp / self._to_tf) * self._to_tf
+
+    def basetimes(self, timestamps):
+        """
+        Vectorized basetime for an array of timestamps.
+        """
+        if self._to_tf == Instrument.TF_WEEK:
+            origin = CandleGenerator.WEEK_ORIGIN
+            return np.floor((timestamps - origin) / self._to_tf) * self._to_tf + origin
+        elif self._to_tf == Instrument.TF_MONTH:
+            months = np.floor(timestamps).astype('int64').astype('datetime64[s]').astype('datetime64[M]')
+            return months.astype('datetime64[s]').astype('int64').astype(np.float64)
+
+        return np.floor(timestamps / self._to_tf) * self._to_tf
+
+    def nextbase(self, base_time):
+        """
+        Base time of the candle following the one of base_time.
+        """
+        if self._to_tf == Instrument.TF_MONTH:
+            tm = time.gmtime(base_time)
+            year, month = (tm.tm_year + 1, 1) if tm.tm_mon == 12 else (tm.tm_year, tm.tm_mon + 1)
+
+            return float(calendar.timegm((year, month, 1, 0, 0, 0)))
+
+        return base_time + self._to_tf
+
+    def close(self, timestamp):
+        """
+        Close and return the current candle if timestamp reach the next base time, else returns None.
+        Used to close a candle as soon as the next one begins, without waiting for a consolidated candle of the next one.
+        """
+        if self._candle and timestamp >= self._next_base:
+            ended_candle = self._candle
+            ended_candle.set_consolidated(True)
+
+            self._candle = None
+
+            return ended_candle
+
+        return None
+
+    def current_with(self, candle):
+        """
+        Returns a copy of the current candle updated with a non consolidated candle of the lower timeframe (or a tick),
+        or a new non consolidated candle from it if there is no current candle.
+        The generator state is not modified.
+        """
+        if candle is None:
+            return copy.copy(self._candle) if self._candle else None
+
+        if self._candle is None or candle._timestamp >= self._next_base:
+            result = Candle(self.basetime(candle._timestamp), self._to_tf)
+
+            result.copy_bid(candle)
+            result.copy_ofr(candle)
+            result.set_volume(candle._volume)
+        else:
+            result = copy.copy(self._candle)
+
+            result._volume += candle._volume
+
+            result._bid_high = max(result._bid_high, candle._bid_high)
+            result._bid_low = min(result._bid_low, candle._bid_low)
+            result._bid_close = candle._bid_close
+
+            result._ofr_high = max(result._ofr_high, candle._ofr_high)
+            result._ofr_low = min(result._ofr_low, candle._ofr_low)
+            result._ofr_close = candle._ofr_close
+
+        result.set_consolidated(False)
+
+        return result
 
     def update_from_tick(self, from_tick):
         if from_tick is None:
@@ -113,8 +399,7 @@ class CandleGenerator(object):
         # base_time = self.basetime(from_tick[0])
         ended_candle = None
 
-        # if self._candle and self._candle.timestamp+self._to_tf <= base_time:
-        if self._candle and from_tick[0] >= self._candle.timestamp+self._to_tf:
+        if self._candle and from_tick[0] >= self._next_base:
             # need to close the candle and to open a new one
             self._candle.set_consolidated(True)
             ended_candle = self._candle
@@ -124,7 +409,7 @@ class CandleGenerator(object):
         if self._candle is None:
             # open a new one
             base_time = self.basetime(from_tick[0])  # from_tick[0] directly ?
-            self._candle = Candle(base_time, self._to_tf)
+            self.current = Candle(base_time, self._to_tf)
 
             self._candle.set_consolidated(False)
 
@@ -182,7 +467,7 @@ class CandleGenerator(object):
         base_time = self.basetime(from_candle.timestamp)
         ended_candle = None
 
-        if self._candle and self._candle.timestamp+self._to_tf <= base_time:
+        if self._candle and base_time >= self._next_base:
             # need to close the candle and to open a new one
             self._candle.set_consolidated(True)
             ended_candle = self._candle
@@ -191,7 +476,7 @@ class CandleGenerator(object):
 
         if self._candle is None:
             # open a new one
-            self._candle = Candle(base_time, self._to_tf)
+            self.current = Candle(base_time, self._to_tf)
 
             self._candle.set_consolidated(False)
 
@@ -220,3 +505,127 @@ class CandleGenerator(object):
         self._last_timestamp = from_candle.timestamp
 
         return ended_candle
+
+
+class CandleCascade(object):
+    """
+    Generate the candles of many timeframes in a single pass. Each timeframe is generated from the closed
+    candles of the greatest lower timeframe of the cascade being a divisor of it, or else from the base
+    timeframe (ticks or candles). The weekly and monthly timeframes are only generated from a divisor of a day.
+
+    A candle of a generated timeframe is closed as soon as a candle of its source begins the next period,
+    without waiting for the source candle to be consolidated.
+
+    @param base_tf Base timeframe, 0 for ticks.
+    @param timeframes Iterable of timeframes to generate, lesser or equal than the base one are ignored.
+    """
+
+    __slots__ = '_base_tf', '_levels', '_generators'
+
+    def __init__(self, base_tf, timeframes):
+        self._base_tf = float(base_tf)
+        self._levels = []      # list of (timeframe, source timeframe, generator) ordered by timeframe
+        self._generators = {}  # timeframe : generator
+
+        for tf in sorted(set(float(tf) for tf in timeframes if tf and tf > base_tf)):
+            source_tf = self._base_tf
+
+            for lower_tf, lower_source_tf, lower_gen in self._levels:
+                if lower_tf >= Instrument.TF_WEEK:
+                    continue
+
+                if tf >= Instrument.TF_WEEK and Instrument.TF_DAY % lower_tf != 0:
+                    continue
+
+                if tf % lower_tf == 0:
+                    source_tf = lower_tf
+
+            generator = CandleGenerator(source_tf, tf)
+
+            self._levels.append((tf, source_tf, generator))
+            self._generators[tf] = generator
+
+    @property
+    def base_tf(self):
+        return self._base_tf
+
+    @property
+    def timeframes(self):
+        return [level[0] for level in self._levels]
+
+    def generator(self, tf):
+        return self._generators.get(float(tf)) if tf is not None else None
+
+    def source_tf(self, tf):
+        for level_tf, source_tf, generator in self._levels:
+            if level_tf == tf:
+                return source_tf
+
+        return None
+
+    @property
+    def last_timestamp(self):
+        """
+        Timestamp of the last consumed tick or base candle, the lesser of the generators from the base timeframe.
+        """
+        timestamps = [generator.last_timestamp for tf, source_tf, generator in self._levels if source_tf == self._base_tf]
+        return min(timestamps) if timestamps else 0
+
+    def generate_from_ticks(self, ticks):
+        """
+        Generate any timeframe from a list of ticks tuples or a 2d array of (timestamp, bid, ofr, volume).
+        @return List of (timeframe, list of closed candles, current non consolidated candle or None)
+            ordered by timeframe.
+        """
+        if len(ticks) >= CandleGenerator.MIN_VECTORIZED_TICKS:
+            # convert only once
+            ticks = np.asarray(ticks, dtype=np.float64)
+
+        return self._cascade(lambda generator: generator.generate_from_ticks(ticks), None)
+
+    def generate_from_candles(self, candles):
+        """
+        Generate any timeframe from a list of candles of the base timeframe. The last one can be non consolidated,
+        then it is only used for the current candle of each timeframe.
+        @return List of (timeframe, list of closed candles, current non consolidated candle or None)
+            ordered by timeframe.
+        """
+        last = candles[-1] if candles else None
+        partial = last if last is not None and not last.ended else None
+
+        return self._cascade(lambda generator: generator.generate_from_candles(candles), partial, last)
+
+    def _cascade(self, from_base, base_partial, base_last=None):
+        results = []
+        per_tf = {}  # timeframe : (closed candles, current candle)
+
+        for tf, source_tf, generator in self._levels:
+            if source_tf == self._base_tf:
+                candles = list(from_base(generator))
+
+                if base_last is not None:
+                    closed = generator.close(base_last.timestamp)
+                    if closed:
+                        candles.append(closed)
+
+                if base_partial is not None:
+                    current = generator.current_with(base_partial)
+                else:
+                    current = copy.copy(generator.current) if generator.current else None
+            else:
+                source_candles, source_current = per_tf[source_tf]
+
+                candles = generator.generate_from_candles(source_candles)
+
+                if source_current is not None:
+                    # the source begins a next period
+                    closed = generator.close(source_current.timestamp)
+                    if closed:
+                        candles.append(closed)
+
+                current = generator.current_with(source_current)
+
+            per_tf[tf] = (candles, current)
+            results.append((tf, candles, current))
+
+        return results
@@ -3,13 +3,40 @@
 # @license Copyright (c) 2018 Dream Overflow
 # Instrument symbol
 
+import sys
+import time
+import bisect
+
+import numpy as np
+
 from datetime import datetime, timedelta
 from common.utils import UTC, timeframe_to_str, truncate, decimal_place
 
+from instrument.ringbuffer import CandleRingBuffer
+
 import logging
 logger = logging.getLogger('siis.strategy.instrument')
 
 
+class TimestampSequence(object):
+    """
+    Read only sequence of the timestamps of a timestamp ordered list of candles or ticks, for a binary search
+    with the bisect module without copying them.
+    """
+
+    __slots__ = '_items', '_tick'
+
+    def __init__(self, items, tick=False):
+        self._items = items
+        self._tick = tick
+
+    def __len__(self):
+        return len(self._items)
+
+    def __getitem__(self, index):
+        return self._items[index][0] if self._tick else self._items[index]._timestamp
+
+
 class Candle(object):
     """
     Candle for an instrument.
@@ -171,6 +198,28 @@ class Candle(object):
         self._ofr_low = dup._ofr_low
         self._ofr_close = dup._ofr_close
 
+    def __copy__(self):
+        # much faster than the generic copy.copy of a slotted object
+        candle = Candle.__new__(Candle)
+
+        candle._timestamp = self._timestamp
+        candle._timeframe = self._timeframe
+
+        candle._bid_open = self._bid_open
+        candle._bid_high = self._bid_high
+        candle._bid_low = self._bid_low
+        candle._bid_close = self._bid_close
+
+        candle._ofr_open = self._ofr_open
+        candle._ofr_high = self._ofr_high
+        candle._ofr_low = self._ofr_low
+        candle._ofr_close = self._ofr_close
+
+        candle._volume = self._volume
+        candle._ended = self._ended
+
+        return candle
+
     def __repr__(self):
         return "%s bid %s/%s/%s/%s ofr %s/%s/%s/%s" % (
             timeframe_to_str(self._timeframe),
@@ -184,6 +233,143 @@ class Candle(object):
             self._ofr_close)
 
 
+class CandleBatch(object):
+    """
+    Many candles of a same timeframe as parallel NumPy columns (timestamp, bid ohlc, ofr ohlc, volume, ended),
+    with the same layout as the CandleRingBuffer (2d array of CandleRingBuffer.NUM_COLUMNS rows).
+
+    A batch is 88 bytes per candle, against about 370 bytes for a Candle object and its floats, and the price and
+    volume columns are directly usable by the indicators without iterating over candles.
+
+    Iterating or indexing returns Candle objects, a slice returns a CandleBatch view.
+    """
+
+    __slots__ = '_timeframe', '_data'
+
+    def __init__(self, timeframe, data=None):
+        """
+        @param data 2d array of shape (CandleRingBuffer.NUM_COLUMNS, n) of float64, not copied.
+        """
+        self._timeframe = timeframe
+        self._data = data if data is not None else np.zeros((CandleRingBuffer.NUM_COLUMNS, 0))
+
+    @staticmethod
+    def from_candles(candles, timeframe=None):
+        """
+        Batch from a list of Candle.
+        """
+        if timeframe is None:
+            timeframe = candles[0]._timeframe if candles else 0
+
+        data = np.array([(c._timestamp, c._bid_open, c._bid_high, c._bid_low, c._bid_close,
+                c._ofr_open, c._ofr_high, c._ofr_low, c._ofr_close, c._volume, 1.0 if c._ended else 0.0) for c in candles],
+                dtype=np.float64).reshape(len(candles), CandleRingBuffer.NUM_COLUMNS)
+
+        return CandleBatch(timeframe, data.T.copy())
+
+    @staticmethod
+    def from_ohlcs(rows, timeframe):
+        """
+        Batch of consolidated candles from an array of OhlcFileStorage.OHLC_DTYPE rows.
+        """
+        data = np.empty((CandleRingBuffer.NUM_COLUMNS, len(rows)))
+
+        for i, field in enumerate(('t', 'bo', 'bh', 'bl', 'bc', 'oo', 'oh', 'ol', 'oc', 'v')):
+            data[i] = rows[field]
+
+        data[CandleRingBuffer.ENDED] = 1.0
+
+        return CandleBatch(timeframe, data)
+
+    @property
+    def timeframe(self):
+        return self._timeframe
+
+    @property
+    def data(self):
+        return self._data
+
+    @property
+    def nbytes(self):
+        return self._data.nbytes
+
+    def __len__(self):
+        return self._data.shape[1]
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return CandleBatch(self._timeframe, self._data[:, index])
+
+        return self.candle(index)
+
+    def __iter__(self):
+        for i in range(0, self._data.shape[1]):
+            yield self.candle(i)
+
+    def candle(self, index):
+        col = self._data[:, index].tolist()
+
+        candle = Candle(col[0], self._timeframe)
+
+        candle.set_bid_ohlc(col[1], col[2], col[3], col[4])
+        candle.set_ofr_ohlc(col[5], col[6], col[7], col[8])
+        candle.set_volume(col[9])
+        candle.set_consolidated(col[10] != 0.0)
+
+        return candle
+
+    def candles(self):
+        """
+        List of Candle objects.
+        """
+        return [self.candle(i) for i in range(0, self._data.shape[1])]
+
+    #
+    # columns (views)
+    #
+
+    @property
+    def timestamp(self):
+        return self._data[CandleRingBuffer.TIMESTAMP]
+
+    @property
+    def volume(self):
+        return self._data[CandleRingBuffer.VOLUME]
+
+    @property
+    def ended(self):
+        return self._data[CandleRingBuffer.ENDED] != 0.0
+
+    def bid(self, price_type):
+        return self._data[CandleRingBuffer.BID_OPEN + price_type]
+
+    def ofr(self, price_type):
+        return self._data[CandleRingBuffer.OFR_OPEN + price_type]
+
+    #
+    # average prices (not views)
+    #
+
+    def prices(self, price_type):
+        return (self.bid(price_type) + self.ofr(price_type)) * 0.5
+
+    @property
+    def open(self):
+        return self.prices(0)
+
+    @property
+    def high(self):
+        return self.prices(1)
+
+    @property
+    def low(self):
+        return self.prices(2)
+
+    @property
+    def close(self):
+        return self.prices(3)
+
+
 class BuySellSignal(object):
 
     ORDER_ENTRY = 0
@@ -350,6 +536,9 @@ class Instrument(object):
     TF_1W = TF_WEEK
     TF_MONTH = 60*60*24*30
 
+    COMPACTION_RATIO = 0.25  # ratio of the retained count exceeded before a compaction
+    MIN_COMPACTION = 64      # min number of exceeding items before a compaction
+
     PRICE_OPEN = 0
     PRICE_HIGH = 1
     PRICE_LOW = 2
@@ -374,9 +563,12 @@ class Instrument(object):
     MAKER = 0
     TAKER = 1
 
+    CANDLE_BUFFER_CAPACITY = 4096     # per timeframe ring buffer size, without retained count
+    MIN_CANDLE_BUFFER_CAPACITY = 64   # min ring buffer size when sized from the retained count
+
     __slots__ = '_watchers', '_name', '_symbol', '_market_id', '_alias', '_base_exchange_rate', '_tradeable', '_currency', '_trade_quantity', '_leverage', \
                 '_market_bid', '_market_ofr', '_last_update_time', '_vol24h_base', '_vol24h_quote', '_fees', '_size_limits', '_price_limits', '_notional_limits', \
-                '_ticks', '_candles', '_buy_sells', '_wanted'
+                '_ticks', '_tick_arrays', '_candles', '_candle_buffers', '_buy_sells', '_retentions', '_wanted'
 
     def __init__(self, name, symbol, market_id, alias=None):
         self._watchers = {}
@@ -405,9 +597,13 @@ class Instrument(object):
         self._notional_limits = (0.0, 0.0, 0.0, 0)
 
         self._ticks = []      # list of tuple(timestamp, bid, ofr, volume)
+        self._tick_arrays = []  # list of 2d array of (timestamp, bid, ofr, volume) added by blocks
         self._candles = {}    # list per timeframe
+        self._candle_buffers = {}  # CandleRingBuffer per timeframe
         self._buy_sells = {}  # list per timeframe
 
+        self._retentions = {}  # tuple(max count, max age in seconds) per timeframe, 0 for the ticks
+
         self._wanted = []  # list of wanted timeframe before be ready (its only for initialization)
 
     def add_watcher(self, watcher_type, watcher):
@@ -627,16 +823,62 @@ class Instrument(object):
             else:
                 self._ticks.append(tick)
 
+        if self._retentions:
+            self.__compact(Instrument.TF_TICK, self._ticks)
+
+    def add_tick_array(self, ticks):
+        """
+        Add a block of ticks without converting them to tuples. The blocks are returned by ticks_after as
+        a single array, and only the last tick of the block is appended to the list of ticks, for the last
+        tick, bid, ofr, price and spread accessors.
+        @param ticks 2d array of (timestamp, bid, ofr, volume), ordered by timestamp.
+        """
+        if not len(ticks):
+            return
+
+        if self._ticks:
+            # ignore the ticks older than the last one
+            ticks = ticks[ticks[:, 0] > self._ticks[-1][0]]
+
+            if not len(ticks):
+                return
+
+        self._tick_arrays.append(ticks)
+        self._ticks.append(tuple(ticks[-1].tolist()))
+
+        if self._retentions:
+            self.__compact(Instrument.TF_TICK, self._ticks)
+            self.__compact_tick_arrays()
+
     def clear_ticks(self):
         self._ticks.clear()
+        self._tick_arrays.clear()
 
     def add_candle(self, candle, max_candles=-1):
         """
         Append a new candle.
+        @param candle Candle, list of Candle or CandleBatch.
         @param max_candles Pop candles until num candles > max_candles.
 
         @todo might split in two method, and same for tick
         """
+        if isinstance(candle, CandleBatch):
+            if not len(candle):
+                return
+
+            # bulk write into the ring buffer, then the candles list as usual
+            self.__candle_buffer(candle.timeframe, max_candles).extend(candle)
+
+            if max_candles > 1:
+                # only the kept ones
+                candle = candle[-max_candles:]
+
+            candle = candle.candles()
+
+            buffered = True
+        else:
+            buffered = False
+
         if not candle:
             return
 
@@ -644,6 +886,11 @@ class Instrument(object):
             # array of candles
             tf = candle[0]._timeframe
 
+            if not buffered:
+                buffer = self.__candle_buffer(tf, max_candles)
+                for c in candle:
+                    buffer.add(c)
+
             if self._candles.get(tf):
                 candles = self._candles[tf]
 
@@ -667,12 +914,11 @@ class Instrument(object):
                 self._candles[tf] = candle
 
             # keep safe size
-            if max_candles > 1:
-                candles = self._candles[tf]
-                while(len(candles)) > max_candles:
-                    candles.pop(0)
+            self.__compact(tf, self._candles[tf], max_candles)
         else:
             # single candle
+            self.__candle_buffer(candle._timeframe, max_candles).add(candle)
+
             if self._candles.get(candle._timeframe):
                 candles = self._candles[candle._timeframe]
 
@@ -694,15 +940,186 @@ class Instrument(object):
                 self._candles[candle._timeframe] = [candle]
 
             # keep safe size
-            if max_candles > 1:
-                candles = self._candles[candle._timeframe]
-                while(len(candles)) > max_candles:
-                    candles.pop(0)
+            self.__compact(candle._timeframe, self._candles[candle._timeframe], max_candles)
 
-    def last_prices(self, tf, price_type, number):
-        prices = [0] * number
+    def set_retention(self, tf, max_count=-1, max_age=-1):
+        """
+        Define the retention policy of the candles of a timeframe, or of the ticks for 0.
+        @param max_count Max number of retained items, if lesser the max_candles given to add_candle is used.
+        @param max_age Max age in seconds of the retained items, relative to the last one.
+        """
+        if max_count > 0 or max_age > 0:
+            self._retentions[tf] = (max_count, max_age)
+        elif tf in self._retentions:
+            del self._retentions[tf]
+
+        buffer = self._candle_buffers.get(tf)
+        if buffer is not None:
+            # sized to the new retention
+            capacity = self.__buffer_capacity(tf)
+            if capacity != buffer.capacity:
+                self.__resize_buffer(tf, capacity)
+
+    def retention(self, tf):
+        """
+        Returns the tuple(max count, max age) retention policy for a timeframe (0 for the ticks), or (-1, -1).
+        """
+        return self._retentions.get(tf, (-1, -1))
+
+    def __compact(self, tf, items, max_count=-1):
+        """
+        Remove the oldest items exceeding the retention policy, but only once they exceed it by a fraction of the
+        retained count, to remove them at once rather than one at each new item.
+        """
+        retention = self._retentions.get(tf)
+        max_age = -1
+
+        if retention:
+            if retention[0] > 0 and (max_count <= 1 or retention[0] < max_count):
+                max_count = retention[0]
+
+            max_age = retention[1]
+
+        n = len(items)
+        retained = n
+
+        if max_count > 1:
+            retained = min(retained, max_count)
+
+        if max_age > 0 and n:
+            last_ts = items[-1][0] if tf == Instrument.TF_TICK else items[-1]._timestamp
+            first = bisect.bisect_left(TimestampSequence(items, tf == Instrument.TF_TICK), last_ts - max_age)
 
+            retained = min(retained, n - first)
+
+        if n - retained >= max(Instrument.MIN_COMPACTION, int(retained * Instrument.COMPACTION_RATIO)):
+            del items[:n-retained]
+
+    def __compact_tick_arrays(self):
+        """
+        Same as __compact for the blocks of ticks, merged into a single one once compacted.
+        """
+        retention = self._retentions.get(Instrument.TF_TICK)
+        if not retention or not self._tick_arrays:
+            return
+
+        n = sum(len(ticks) for ticks in self._tick_arrays)
+        retained = n
+
+        if retention[0] > 0:
+            retained = min(retained, retention[0])
+
+        if retention[1] > 0:
+            from_ts = self._tick_arrays[-1][-1, 0] - retention[1]
+            retained = min(retained, sum(len(ticks) - int(ticks[:, 0].searchsorted(from_ts, 'left')) for ticks in self._tick_arrays))
+
+        if n - retained >= max(Instrument.MIN_COMPACTION, int(retained * Instrument.COMPACTION_RATIO)):
+            ticks = np.concatenate(self._tick_arrays) if len(self._tick_arrays) > 1 else self._tick_arrays[0]
+            self._tick_arrays = [ticks[n-retained:]]
+
+    def memory_usage(self):
+        """
+        Returns an estimation of the memory used by the ticks and the candles.
+        @return dict with per timeframe (0 for the ticks) a tuple(number of items, bytes), including the ring buffers.
+        """
+        def list_size(items):
+            if not items:
+                return sys.getsizeof(items)
+
+            # the items of a list have the same layout, measure the last one and its values
+            item = items[-1]
+
+            if isinstance(item, tuple):
+                item_size = sys.getsizeof(item) + sum(sys.getsizeof(v) for v in item)
+            else:
+                item_size = sys.getsizeof(item) + sum(sys.getsizeof(getattr(item, slot)) for slot in item.__slots__)
+
+            return sys.getsizeof(items) + len(items) * item_size
+
+        results = {Instrument.TF_TICK: (len(self._ticks), list_size(self._ticks))}
+
+        if self._tick_arrays:
+            count, size = results[Instrument.TF_TICK]
+            results[Instrument.TF_TICK] = (count + sum(len(ticks) for ticks in self._tick_arrays),
+                    size + sum(ticks.nbytes for ticks in self._tick_arrays))
+
+        for tf, candles in self._candles.items():
+            results[tf] = (len(candles), list_size(candles))
+
+        for tf, buffer in self._candle_buffers.items():
+            count, size = results.get(tf, (0, 0))
+            results[tf] = (count, size + buffer.nbytes)
+
+        return results
+
+    def __candle_buffer(self, tf, max_candles=-1):
+        buffer = self._candle_buffers.get(tf)
+        capacity = self.__buffer_capacity(tf, max_candles)
+
+        if buffer is None:
+            buffer = self._candle_buffers[tf] = CandleRingBuffer(tf, capacity)
+        elif buffer.capacity < capacity:
+            buffer = self.__resize_buffer(tf, capacity)
+
+        return buffer
+
+    def __buffer_capacity(self, tf, max_candles=-1):
+        """
+        Ring buffer capacity of a timeframe : the count retained by the retention policy or by max_candles (the least),
+        with a min capacity, else the default capacity.
+        """
+        count = max_candles if max_candles > 1 else -1
+
+        retention = self._retentions.get(tf)
+        if retention:
+            if retention[0] > 0 and (count <= 0 or retention[0] < count):
+                count = retention[0]
+
+            if retention[1] > 0 and tf > 0:
+                count = min(count, int(retention[1] / tf) + 1) if count > 0 else int(retention[1] / tf) + 1
+
+        if count <= 0:
+            return Instrument.CANDLE_BUFFER_CAPACITY
+
+        return max(Instrument.MIN_CANDLE_BUFFER_CAPACITY, count)
+
+    def __resize_buffer(self, tf, capacity):
+        """
+        Replace the ring buffer of a timeframe by a new one of another capacity, keeping its last candles.
+        """
+        buffer = self._candle_buffers[tf]
+        resized = self._candle_buffers[tf] = CandleRingBuffer(tf, capacity)
+
+        if len(buffer):
+            resized.extend(CandleBatch(tf, buffer.columns(capacity)))
+
+        return resized
+
+    def candle_buffer(self, tf):
+        """
+        Returns the ring buffer of candles for a timeframe, or None.
+        Indicators can directly read the price and volume columns from it.
+        """
+        return self._candle_buffers.get(tf)
+
+    def candle_batch(self, tf, number=-1):
+        """
+        Returns the last n candles (or all if number < 0) of a timeframe as a CandleBatch view on the ring buffer.
+        @note The view is only valid until the next added candle.
+        """
+        buffer = self._candle_buffers.get(tf)
+        if buffer is None:
+            return CandleBatch(tf)
+
+        return CandleBatch(tf, buffer.columns(number))
+
+    def last_prices(self, tf, price_type, number):
+        """
+        Returns an array of the last n average prices, left padded with zeros if there is not enough samples.
+        """
         if tf == 0:
+            prices = [0] * number
+
             # get from ticks
             ticks = self._ticks
             if ticks:
@@ -710,34 +1127,44 @@ class Instrument(object):
                 for i in range(len(ticks)-1, max(-1, len(ticks)-number-1), -1):
                     prices[j] = (ticks[i][1] + ticks[i][2]) * 0.5
                     j -= 1
-        else:
-            candles = self._candles.get(tf)
-            if candles:
-                j = number - 1
-                for i in range(len(candles)-1, max(-1, len(candles)-number-1), -1):
-                    prices[j] = (candles[i].bid[price_type] + candles[i].ofr[price_type]) * 0.5
-                    j -= 1
+
+            return prices
+
+        buffer = self._candle_buffers.get(tf)
+        if buffer is None:
+            return np.zeros(number)
+
+        prices = buffer.prices(price_type, number)
+        if len(prices) < number:
+            prices = np.concatenate((np.zeros(number - len(prices)), prices))
 
         return prices
 
     def last_volumes(self, tf, number):
+        """
+        Returns the last n volumes, left padded with zeros if there is not enough samples.
+        For candles it is a view on the ring buffer if there is enough samples.
+        """
+        if tf != 0:
+            buffer = self._candle_buffers.get(tf)
+            if buffer is None:
+                return np.zeros(number)
+
+            volumes = buffer.volumes(number)
+            if len(volumes) < number:
+                volumes = np.concatenate((np.zeros(number - len(volumes)), volumes))
+
+            return volumes
+
         volumes = [0] * number
 
-        if tf == 0:
-            # get from ticks
-            ticks = self._ticks
-            if ticks:
-                j = number - 1
-                for i in range(len(ticks)-1, max(-1, len(ticks)-number-1), -1):
-                    volumes[j] = ticks[i][3]
-                    j -= 1
-        else:
-            candles = self._candles.get(tf)
-            if candles:
-                j = number - 1
-                for i in range(len(candles)-1, max(-1, len(candles)-number-1), -1):
-                    volumes[j] = candles[i].volume
-                    j -= 1
+        # get from ticks
+        ticks = self._ticks
+        if ticks:
+            j = number - 1
+            for i in range(len(ticks)-1, max(-1, len(ticks)-number-1), -1):
+                volumes[j] = ticks[i][3]
+                j -= 1
 
         return volumes
 
@@ -789,86 +1216,101 @@ class Instrument(object):
             for market closing weekend or night we don't, but on another side candles must be adjacent to have
             further calculations corrects
         """
-        results = []
-
         candles = self._candles.get(tf)
-        if candles:
-            # process for most recent to the past
-            for c in reversed(candles):
-                if c.timestamp >= from_ts:
-                    # is there a gap between the prev and current candles, introduce missing ones
-                    if len(results) and (results[0].timestamp - c.timestamp > tf):
-                        ts = results[0].timestamp - tf
-
-                        while ts > c.timestamp:
-                            filler = Candle(ts, tf)
-
-                            # same as previous
-                            filler.copy_bid(results[-1])
-                            filler.copy_ofr(results[-1])
+        if not candles:
+            return []
 
-                            # empty volume
-                            filler._volume = 0
-
-                            results.insert(0, filler)
-                            ts -= tf
-
-                    results.insert(0, c)
-                else:
-                    break
+        i = bisect.bisect_left(TimestampSequence(candles), from_ts)
 
-        return results
+        return Instrument.fill_gaps(candles[i:], tf)
 
     def candles_after(self, tf, after_ts):
         """
-        Returns candle having timestamp >= after_ts in seconds.
+        Returns candle having timestamp > after_ts in seconds.
         @param tf Timeframe
         @param after_ts In second timestamp after when to get candles
         """
-        results = []
-
         candles = self._candles.get(tf)
-        if candles:
-            # process for most recent to the past
-            for c in reversed(candles):
-                if c.timestamp > after_ts:
-                    # is there a gap between the prev and current candles, introduce missing ones
-                    if len(results) and (results[0].timestamp - c.timestamp > tf):
-                        ts = results[0].timestamp - tf
+        if not candles:
+            return []
 
-                        while ts > c.timestamp:
-                            filler = Candle(ts, tf)
+        i = bisect.bisect_right(TimestampSequence(candles), after_ts)
 
-                            # same as previous
-                            filler.copy_bid(results[-1])
-                            filler.copy_ofr(results[-1])
+        return Instrument.fill_gaps(candles[i:], tf)
 
-                            # empty volume
-                            filler._volume = 0
+    def ticks_after(self, after_ts):
+        """
+        Returns ticks having timestamp > from_ts in seconds.
+        If the ticks are added by blocks returns a 2d array of (timestamp, bid, ofr, volume).
+        """
+        if self._tick_arrays:
+            if len(self._tick_arrays) > 1:
+                self._tick_arrays = [np.concatenate(self._tick_arrays)]
 
-                            results.insert(0, filler)
-                            ts -= tf
+            ticks = self._tick_arrays[0]
 
-                    results.insert(0, c)
-                else:
-                    break
+            return ticks[ticks[:, 0].searchsorted(after_ts, 'right'):]
 
-        return results      
+        ticks = self._ticks
+        if not ticks:
+            return []
 
-    def ticks_after(self, after_ts):
+        return ticks[bisect.bisect_right(TimestampSequence(ticks, True), after_ts):]
+
+    @staticmethod
+    def fill_gaps(candles, tf):
         """
-        Returns ticks having timestamp > from_ts in seconds.
+        Insert the missing candles between non adjacent candles, with the close prices of the previous one
+        and an empty volume. The gaps are found and the fillers computed at once, then only the fillers are allocated.
+        Returns the same list if there is no gap.
+
+        @note The monthly candles are not adjacent by a constant step, then they are never filled.
         """
+        if len(candles) < 2 or tf <= 0 or tf >= Instrument.TF_MONTH:
+            return candles
+
+        if candles[-1]._timestamp - candles[0]._timestamp <= (len(candles) - 1) * tf:
+            # the candles are aligned on the timeframe, then there is no gap if the span is minimal
+            return candles
+
+        timestamps = np.fromiter((c._timestamp for c in candles), np.float64, len(candles))
+        gaps = np.flatnonzero(np.diff(timestamps) > tf)
+
+        if not len(gaps):
+            return candles
+
+        # number of fillers per gap, and the gap of each filler
+        counts = np.ceil((timestamps[gaps+1] - timestamps[gaps]) / tf).astype(np.int64) - 1
+        group = np.repeat(np.arange(len(gaps)), counts)
+        starts = np.cumsum(counts) - counts
+
+        # from the most distant to the nearest of the next candle
+        steps = counts[group] - (np.arange(len(group)) - starts[group])
+        filler_timestamps = timestamps[gaps+1][group] - steps * tf
+
+        bids = np.array([candles[i]._bid_close for i in gaps])[group]
+        ofrs = np.array([candles[i]._ofr_close for i in gaps])[group]
+
+        fillers = []
+
+        for ts, bid, ofr in zip(filler_timestamps.tolist(), bids.tolist(), ofrs.tolist()):
+            filler = Candle(ts, tf)
+
+            filler.set_bid(bid)
+            filler.set_ofr(ofr)
+
+            fillers.append(filler)
+
         results = []
+        prev = 0
 
-        ticks = self._ticks
-        if ticks:
-            # process for more recent to the past
-            for t in reversed(ticks):
-                if t[0] > after_ts:
-                    results.insert(0, t)
-                else:
-                    break
+        for i, first, count in zip(gaps.tolist(), starts.tolist(), counts.tolist()):
+            results.extend(candles[prev:i+1])
+            results.extend(fillers[first:first+count])
+
+            prev = i + 1
+
+        results.extend(candles[prev:])
 
         return results
 
@@ -1002,6 +1444,9 @@ class Instrument(object):
 
     def num_samples(self, tf):
         if tf == Instrument.TF_TICK:
+            if self._tick_arrays:
+                return sum(len(ticks) for ticks in self._tick_arrays)
+
             return len(self._ticks)
 
         if self._candles.get(tf):
@@ -1033,46 +1478,23 @@ class Instrument(object):
 
     def purge(self, older_than=60*60*24, n_last=100):
         """
-        Purge ticks and candles that are older than predefined conditions or n keep only n last candles, to avoid memory issues.
+        Purge ticks, candles and buy/sell signals that are older than older_than seconds, but keep at least the
+        n_last ones, to avoid memory issues.
         """
-        now = time.time()
+        before_ts = time.time() - older_than
 
-        # on ticks
-        m = 0
-        for n, tick in enumerate(self._ticks):
-            if now - tick[0] < older_than:
-                m = n
-                break
+        def purge_list(items, tick=False):
+            first = min(bisect.bisect_left(TimestampSequence(items, tick), before_ts), max(0, len(items) - n_last))
+            if first > 0:
+                del items[:first]
 
-        if m > 0:
-            # keep the m+1 recents
-            self._ticks = self._ticks[m:]
+        purge_list(self._ticks, True)
 
-        # per tf of candles
         for tf, candles in self._candles.items():
-            m = 0
-
-            for n, candle in enumerate(candles):
-                if now - candle.timestamp < older_than:
-                    m = n
-                    break
+            purge_list(candles)
 
-            if m > 0:
-                # keep the m+1 recents
-                self._candles[tf] = candles[m:]
-
-        # per tf of buy/sell signals
         for tf, buy_sells in self._buy_sells.items():
-            m = 0
-
-            for n, buy_sell in enumerate(buy_sells):
-                if now - buy_sell.timestamp < older_than:
-                    m = n
-                    break
-
-            if m > 0:
-                # keep the m+1 recents
-                self._buy_sells[tf] = buy_sells[m:]             
+            purge_list(buy_sells)
 
     def from_to_prices(self, tf, price_type, from_ts=0, to_ts=-1):
         prices = [0] * number
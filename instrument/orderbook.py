@@ -0,0 +1,212 @@
+# @date 2019-06-20
+# @author Frederic SCHERMA
+# @license Copyright (c) 2019 Dream Overflow
+# Order book of a market, with sorted price levels
+
+import bisect
+
+import logging
+logger = logging.getLogger('siis.instrument.orderbook')
+
+
+class OrderBookSide(object):
+    """
+    Price levels of a side of an order book. The prices are kept into a sorted array of keys, ordered such as the
+    best price is the last one, and the sizes into a dict per price.
+
+    Updating a level is a binary search, plus an insert or a remove into the array for a new or an emptied level,
+    that are mostly near the best price, at the end of the array. The best price is the last key.
+
+    @param sign 1 for the bids (best is the highest), -1 for the asks (best is the lowest).
+    """
+
+    __slots__ = '_sign', '_keys', '_sizes'
+
+    def __init__(self, sign):
+        self._sign = sign
+        self._keys = []    # sign * price ascending
+        self._sizes = {}   # price : size
+
+    def clear(self):
+        self._keys = []
+        self._sizes = {}
+
+    def __len__(self):
+        return len(self._keys)
+
+    def set_level(self, price, size):
+        """
+        Set the size at a price level, a null size removes the level.
+        """
+        if size > 0.0:
+            if price not in self._sizes:
+                bisect.insort(self._keys, self._sign * price)
+
+            self._sizes[price] = size
+
+        elif price in self._sizes:
+            del self._sizes[price]
+
+            key = self._sign * price
+
+            if self._keys[-1] == key:
+                # mostly the best price is consumed
+                self._keys.pop()
+            else:
+                del self._keys[bisect.bisect_left(self._keys, key)]
+
+    def size(self, price):
+        return self._sizes.get(price, 0.0)
+
+    @property
+    def best_price(self):
+        return self._sign * self._keys[-1] if self._keys else 0.0
+
+    @property
+    def best_size(self):
+        return self._sizes[self._sign * self._keys[-1]] if self._keys else 0.0
+
+    def top(self, depth=-1):
+        """
+        Returns a list of (price, size) of the n best levels (or any if depth < 0), from the best.
+        """
+        keys = self._keys[-depth:] if depth > 0 else self._keys
+        sign = self._sign
+        sizes = self._sizes
+
+        return [(sign * key, sizes[sign * key]) for key in reversed(keys)]
+
+
+class OrderBook(object):
+    """
+    Order book of a market, with the bids and asks price levels, updated by snapshots and incremental updates.
+
+    The incremental updates can be sequenced by first and last update ids, as for binance.com (U and u) :
+    an update older than the book is ignored, and a gap between the book and the first update id of an update
+    marks the book as out of sync, until the next snapshot.
+
+    Not thread safe.
+    """
+
+    __slots__ = '_market_id', '_bids', '_asks', '_sequence', '_timestamp', '_synced', '_gaps'
+
+    def __init__(self, market_id):
+        self._market_id = market_id
+
+        self._bids = OrderBookSide(1)
+        self._asks = OrderBookSide(-1)
+
+        self._sequence = None  # last update id or None if not sequenced
+        self._timestamp = 0.0  # last update timestamp
+        self._synced = False   # True once a snapshot is applied and while there is no gap
+        self._gaps = 0         # number of detected gaps
+
+    @property
+    def market_id(self):
+        return self._market_id
+
+    @property
+    def bids(self):
+        return self._bids
+
+    @property
+    def asks(self):
+        return self._asks
+
+    @property
+    def sequence(self):
+        return self._sequence
+
+    @property
+    def timestamp(self):
+        return self._timestamp
+
+    @property
+    def synced(self):
+        return self._synced
+
+    @property
+    def gaps(self):
+        return self._gaps
+
+    @property
+    def best_bid(self):
+        return self._bids.best_price
+
+    @property
+    def best_ask(self):
+        return self._asks.best_price
+
+    def snapshot(self, bids, asks, sequence=None, timestamp=0.0):
+        """
+        Replace the content of the book.
+        @param bids Iterable of (price, size, ...), price and size can be strings.
+        @param asks Iterable of (price, size, ...), price and size can be strings.
+        @param sequence Last update id of the snapshot or None.
+        """
+        self._bids.clear()
+        self._asks.clear()
+
+        for level in bids:
+            self._bids.set_level(float(level[0]), float(level[1]))
+
+        for level in asks:
+            self._asks.set_level(float(level[0]), float(level[1]))
+
+        self._sequence = sequence
+        self._timestamp = timestamp
+        self._synced = True
+
+    def update(self, bids, asks, first_id=None, last_id=None, timestamp=0.0):
+        """
+        Apply an incremental update of some levels, a null size removes the level.
+        @param first_id First update id of the update, or None if not sequenced.
+        @param last_id Last update id of the update.
+        @return False if the book is out of sync (gap detected now or before), then a new snapshot is needed.
+        """
+        if not self._synced:
+            return False
+
+        if self._sequence is not None and first_id is not None:
+            if last_id <= self._sequence:
+                # older than the book
+                return True
+
+            if first_id > self._sequence + 1:
+                self._synced = False
+                self._gaps += 1
+
+                logger.warning("Gap into order book %s, from %s to %s" % (self._market_id, self._sequence, first_id))
+                return False
+
+            self._sequence = last_id
+
+        for level in bids:
+            self._bids.set_level(float(level[0]), float(level[1]))
+
+        for level in asks:
+            self._asks.set_level(float(level[0]), float(level[1]))
+
+        if timestamp:
+            self._timestamp = timestamp
+
+        return True
+
+    def set_bid(self, price, size):
+        self._bids.set_level(price, size)
+
+    def set_ask(self, price, size):
+        self._asks.set_level(price, size)
+
+    def top(self, depth=10):
+        """
+        Returns a tuple with the list of the n best bids and the list of the n best asks, each as (price, size).
+        """
+        return self._bids.top(depth), self._asks.top(depth)
+
+    def signal_data(self, depth=10):
+        """
+        Data for a SIGNAL_ORDER_BOOK, (market_id, bids, asks) of the n best levels.
+        """
+        bids, asks = self.top(depth)
+        return self._market_id, bids, asks
@@ -0,0 +1,209 @@
+# @date 2019-06-10
+# @author Frederic SCHERMA
+# @license Copyright (c) 2019 Dream Overflow
+# Fixed capacity NumPy backed candle ring buffer
+
+import numpy as np
+
+
+class CandleRingBuffer(object):
+    """
+    Fixed capacity ring buffer of candles stored as NumPy columns, for a single timeframe.
+
+    Each column is allocated twice the capacity and every sample is written at its position and at
+    its position plus the capacity (mirrored buffer). Then the last n samples are always contiguous,
+    and are returned as zero-copy views, with O(1) append or replace of the last sample.
+
+    @note The returned views are only valid until the next append, they must be copied if they are kept.
+    """
+
+    TIMESTAMP = 0
+    BID_OPEN = 1
+    BID_HIGH = 2
+    BID_LOW = 3
+    BID_CLOSE = 4
+    OFR_OPEN = 5
+    OFR_HIGH = 6
+    OFR_LOW = 7
+    OFR_CLOSE = 8
+    VOLUME = 9
+    ENDED = 10
+
+    NUM_COLUMNS = 11
+
+    __slots__ = '_timeframe', '_capacity', '_data', '_head', '_size'
+
+    def __init__(self, timeframe, capacity):
+        self._timeframe = timeframe
+        self._capacity = capacity
+
+        self._data = np.zeros((CandleRingBuffer.NUM_COLUMNS, capacity * 2), dtype=np.float64)
+
+        self._head = 0  # next write position
+        self._size = 0
+
+    @property
+    def timeframe(self):
+        return self._timeframe
+
+    @property
+    def capacity(self):
+        return self._capacity
+
+    @property
+    def nbytes(self):
+        return self._data.nbytes
+
+    def __len__(self):
+        return self._size
+
+    def clear(self):
+        self._head = 0
+        self._size = 0
+
+    def last_timestamp(self):
+        if self._size:
+            return self._data[CandleRingBuffer.TIMESTAMP, self._head - 1 + self._capacity]
+
+        return 0.0
+
+    def last_ended(self):
+        if self._size:
+            return self._data[CandleRingBuffer.ENDED, self._head - 1 + self._capacity] != 0.0
+
+        return True
+
+    #
+    # writing
+    #
+
+    def __write(self, pos, candle):
+        data = self._data
+
+        for p in (pos, pos + self._capacity):
+            data[:, p] = (
+                candle._timestamp,
+                candle._bid_open, candle._bid_high, candle._bid_low, candle._bid_close,
+                candle._ofr_open, candle._ofr_high, candle._ofr_low, candle._ofr_close,
+                candle._volume,
+                1.0 if candle._ended else 0.0)
+
+    def append(self, candle):
+        """
+        Append a candle, overwriting the oldest one once the capacity is reached.
+        """
+        self.__write(self._head, candle)
+
+        self._head = (self._head + 1) % self._capacity
+        self._size = min(self._size + 1, self._capacity)
+
+    def replace_last(self, candle):
+        """
+        Replace the last candle (non consolidated update), or append if empty.
+        """
+        if not self._size:
+            self.append(candle)
+        else:
+            self.__write((self._head - 1) % self._capacity, candle)
+
+    def add(self, candle):
+        """
+        Same logic as Instrument.add_candle for a single candle : append if more recent (replacing the
+        last one if not consolidated), replace the last one if at the same timestamp, else ignore it.
+        """
+        if not self._size:
+            self.append(candle)
+            return
+
+        last_ts = self.last_timestamp()
+
+        if candle._timestamp > last_ts:
+            if not self.last_ended():
+                self.replace_last(candle)
+            else:
+                self.append(candle)
+
+        elif candle._timestamp == last_ts:
+            self.replace_last(candle)
+
+    def extend(self, batch):
+        """
+        Same logic as add for each candle of an ordered CandleBatch, but with a single bulk write.
+        """
+        data = batch.data
+
+        if self._size:
+            # ignore the older ones
+            data = data[:, data[CandleRingBuffer.TIMESTAMP] >= self.last_timestamp()]
+
+        n = data.shape[1]
+        if not n:
+            return
+
+        t = data[CandleRingBuffer.TIMESTAMP]
+
+        if self._size and (t[0] == self.last_timestamp() or not self.last_ended()):
+            # the first one replaces the last one
+            self._head = (self._head - 1) % self._capacity
+            self._size -= 1
+
+        # a non consolidated or a same timestamp candle is replaced by the next one
+        keep = np.ones(n, dtype=bool)
+        keep[:-1] = (t[1:] != t[:-1]) & (data[CandleRingBuffer.ENDED, :-1] != 0.0)
+
+        if not keep.all():
+            data = data[:, keep]
+            n = data.shape[1]
+
+        if n > self._capacity:
+            data = data[:, n-self._capacity:]
+            n = self._capacity
+
+        pos = (self._head + np.arange(n)) % self._capacity
+
+        self._data[:, pos] = data
+        self._data[:, pos + self._capacity] = data
+
+        self._head = (self._head + n) % self._capacity
+        self._size = min(self._size + n, self._capacity)
+
+    #
+    # reading (zero-copy views)
+    #
+
+    def column(self, col, number=-1):
+        """
+        Returns a view on the last n samples of a column, or on all the samples if number < 0.
+        """
+        n = self._size if number < 0 else min(number, self._size)
+        end = self._head + self._capacity
+
+        return self._data[col, end-n:end]
+
+    def columns(self, number=-1):
+        """
+        Returns a view on the last n samples of every columns, or on all the samples if number < 0.
+        """
+        n = self._size if number < 0 else min(number, self._size)
+        end = self._head + self._capacity
+
+        return self._data[:, end-n:end]
+
+    def timestamps(self, number=-1):
+        return self.column(CandleRingBuffer.TIMESTAMP, number)
+
+    def bid(self, price_type, number=-1):
+        return self.column(CandleRingBuffer.BID_OPEN + price_type, number)
+
+    def ofr(self, price_type, number=-1):
+        return self.column(CandleRingBuffer.OFR_OPEN + price_type, number)
+
+    def volumes(self, number=-1):
+        return self.column(CandleRingBuffer.VOLUME, number)
+
+    def prices(self, price_type, number=-1):
+        """
+        Average of bid and ofr prices for a price type (open, high, low, close).
+        @note This one is not a view.
+        """
+        return (self.bid(price_type, number) + self.ofr(price_type, number)) * 0.5
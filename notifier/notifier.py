@@ -7,18 +7,104 @@ from notifier.signal import Signal
 from notifier.notifiable import Notifiable
 
 
+class Subscription(object):
+	"""
+	Subscription of a listener to the signals of a notifier, filtered by signal type, source name and market id.
+	A None filter accepts any value. The source names and market ids filters are containers (set, dict...) kept
+	by reference, so the listener can update them in place.
+
+	The market ids filter only applies to the signals whose data starts with the market id (Signal.MARKET_SIGNALS).
+
+	@param queue If defined (SignalQueue or any append-able) the accepted signals are pushed into, else the
+		receiver method of the listener is called.
+	"""
+
+	__slots__ = '_listener', '_signal_types', '_source_names', '_market_ids', '_queue'
+
+	def __init__(self, listener, signal_types=None, source_names=None, market_ids=None, queue=None):
+		self._listener = listener
+		self._signal_types = frozenset(signal_types) if signal_types is not None else None
+		self._source_names = source_names
+		self._market_ids = market_ids
+		self._queue = queue
+
+	@property
+	def listener(self):
+		return self._listener
+
+	@property
+	def queue(self):
+		return self._queue
+
+	def listen(self, signal_type):
+		return self._signal_types is None or signal_type in self._signal_types
+
+	def accept(self, signal):
+		if self._source_names is not None and signal.source_name not in self._source_names:
+			return False
+
+		if self._market_ids is not None and signal.signal_type in Signal.MARKET_SIGNALS and signal.data[0] not in self._market_ids:
+			return False
+
+		return True
+
+	def deliver(self, signal):
+		if self._queue is not None:
+			self._queue.append(signal)
+		else:
+			self._listener.receiver(signal)
+
+
 class Notifier(object):
+	"""
+	Dispatch the signals of a service to its subscribers, in the order of subscription.
+	The subscribers are indexed per signal type, then a signal is only offered to the interested ones.
+
+	Not thread safe, the service must lock around subscribe/unsubscribe and notify.
+	"""
 
 	def __init__(self, service):
 		self._service = service
-		self._listeners = []
+		self._subscriptions = []
+		self._per_type = {}  # cache signal type : list of subscriptions listening it
+
+	def subscribe(self, listener, signal_types=None, source_names=None, market_ids=None, queue=None):
+		"""
+		Subscribe a listener, replacing its previous subscription if any.
+		@return Subscription
+		"""
+		subscription = Subscription(listener, signal_types, source_names, market_ids, queue)
+
+		for i, sub in enumerate(self._subscriptions):
+			if sub.listener is listener:
+				self._subscriptions[i] = subscription
+				break
+		else:
+			self._subscriptions.append(subscription)
+
+		self._per_type = {}
+
+		return subscription
+
+	def unsubscribe(self, listener):
+		self._subscriptions = [sub for sub in self._subscriptions if sub.listener is not listener]
+		self._per_type = {}
 
 	def add_listener(self, listener):
-		self._listeners.append(listener)
+		"""
+		Subscribe a listener to any signal, delivered to its receiver method.
+		"""
+		self.subscribe(listener)
 
 	def remove_listener(self, listener):
-		self._listeners.remove(listener)
+		self.unsubscribe(listener)
 
 	def notify(self, signal):
-		for listener in self._listeners:
-			listener.receiver(signal)
+		subscriptions = self._per_type.get(signal.signal_type)
+
+		if subscriptions is None:
+			subscriptions = self._per_type[signal.signal_type] = [sub for sub in self._subscriptions if sub.listen(signal.signal_type)]
+
+		for sub in subscriptions:
+			if sub.accept(signal):
+				sub.deliver(signal)
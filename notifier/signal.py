@@ -51,6 +51,11 @@ class Signal(object):
 	SIGNAL_STRATEGY_TRADE_LIST = 700    # data is a an array of tuple with (market_id, integer trade_id, integer trade_type, dict data, dict operations)
 	SIGNAL_STRATEGY_TRADER_LIST = 701   # data is a an array of tuple with (market_id, boolean activity, dict data, dict regions)
 
+	# signals whose data starts with the market id, filterable per market
+	MARKET_SIGNALS = frozenset((
+		SIGNAL_CANDLE_DATA, SIGNAL_TICK_DATA, SIGNAL_CANDLE_DATA_BULK, SIGNAL_TICK_DATA_BULK, SIGNAL_ORDER_BOOK,
+		SIGNAL_MARKET_DATA, SIGNAL_MARKET_INFO_DATA))
+
 	SOURCE_UNDEFINED = 0
 	SOURCE_WATCHER = 1
 	SOURCE_TRADER = 2
@@ -0,0 +1,120 @@
+# @date 2019-06-18
+# @author Frederic SCHERMA
+# @license Copyright (c) 2019 Dream Overflow
+# Bounded signal queue of a subscriber, with drop or coalesce policy for the market data
+
+import threading
+import collections
+import itertools
+
+from notifier.signal import Signal
+
+
+class SignalQueue(object):
+	"""
+	Bounded FIFO of the signals of a subscriber, filled by the notifier and consumed by the subscriber thread.
+	Same usage as a deque (append, popleft, len).
+
+	Only the market data signals are subject to the policy, the others signals (order, position, account...)
+	are always queued, even above the max size.
+
+	POLICY_DROP ignore the incoming market data once the queue is full.
+	POLICY_COALESCE merge an incoming market data into the pending one of the same source and market if any,
+	keeping its position into the queue, and ignore it if the queue is full and there is no pending one.
+	"""
+
+	POLICY_DROP = 0
+	POLICY_COALESCE = 1
+
+	__slots__ = '_max_size', '_policy', '_mutex', '_queue', '_pending', '_dropped', '_coalesced'
+
+	def __init__(self, max_size, policy=POLICY_COALESCE):
+		self._max_size = max_size
+		self._policy = policy
+
+		self._mutex = threading.Lock()
+
+		self._queue = collections.deque()  # of [signal, coalesce key or None]
+		self._pending = {}                 # coalesce key : queued item
+
+		self._dropped = 0
+		self._coalesced = 0
+
+	@staticmethod
+	def merge_market_data(prev, data):
+		"""
+		Merge two market data tuples, the non None values of the last override the previous ones.
+		Bid and ofr are only defined when non zero.
+		"""
+		merged = []
+
+		for i, (p, n) in enumerate(itertools.zip_longest(prev, data)):
+			if i in (3, 4):
+				merged.append(n or p)
+			else:
+				merged.append(n if n is not None else p)
+
+		return tuple(merged)
+
+	def append(self, signal):
+		with self._mutex:
+			if signal.signal_type != Signal.SIGNAL_MARKET_DATA:
+				self._queue.append([signal, None])
+				return True
+
+			if self._policy == SignalQueue.POLICY_COALESCE:
+				key = (signal.source_name, signal.data[0])
+				item = self._pending.get(key)
+
+				if item is not None:
+					prev = item[0]
+					item[0] = Signal(prev.source, prev.source_name, prev.signal_type, SignalQueue.merge_market_data(prev.data, signal.data))
+
+					self._coalesced += 1
+					return True
+			else:
+				key = None
+
+			if len(self._queue) >= self._max_size:
+				self._dropped += 1
+				return False
+
+			item = [signal, key]
+			self._queue.append(item)
+
+			if key is not None:
+				self._pending[key] = item
+
+			return True
+
+	def popleft(self):
+		with self._mutex:
+			signal, key = self._queue.popleft()
+
+			if key is not None:
+				del self._pending[key]
+
+			return signal
+
+	def clear(self):
+		with self._mutex:
+			self._queue.clear()
+			self._pending.clear()
+
+	def __len__(self):
+		return len(self._queue)
+
+	def __bool__(self):
+		return len(self._queue) > 0
+
+	@property
+	def max_size(self):
+		return self._max_size
+
+	@property
+	def dropped(self):
+		return self._dropped
+
+	@property
+	def coalesced(self):
+		return self._coalesced
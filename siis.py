@@ -120,6 +120,21 @@ def application(argv):
                 elif arg.startswith('--time-factor='):
                     # backtesting time-factor
                     options['time-factor'] = float(arg.split('=')[1])
+                elif arg.startswith('--shards='):
+                    # backtesting distributed over many processes
+                    options['shards'] = int(arg.split('=')[1])
+                elif arg.startswith('--sweep='):
+                    # optimizer parameters sweep name
+                    options['sweep'] = arg.split('=')[1]
+                elif arg.startswith('--workers='):
+                    # optimizer parameters sweep number of processes
+                    options['workers'] = int(arg.split('=')[1])
+                elif arg.startswith('--market-hours='):
+                    # optimizer ticks gaps detection market hours preset
+                    options['market-hours'] = arg.split('=')[1]
+                elif arg.startswith('--max-gap='):
+                    # optimizer ticks gaps detection threshold in seconds of open market
+                    options['max-gap'] = float(arg.split('=')[1])
 
                 elif arg.startswith('--from='):
                     # if backtest from date (if ommited use whoole data) date format is "yyyy-mm-dd-hh:mm:ss", fetch, binarize, optimize to date
@@ -218,7 +233,10 @@ def application(argv):
     #
 
     if options.get('optimize'):
-        if options.get('market') and options.get('from') and options.get('to') and options.get('broker') and options.get('timeframe'):
+        if options.get('sweep') and options.get('from') and options.get('to'):
+            from tools.optimizer import do_optimizer
+            do_optimizer(options, siis_logger)
+        elif options.get('market') and options.get('from') and options.get('to') and options.get('broker') and options.get('timeframe'):
             from tools.optimizer import do_optimizer
             do_optimizer(options, siis_logger)
         else:
@@ -239,6 +257,20 @@ def application(argv):
 
         sys.exit(0)
 
+    #
+    # sharded backtesting mode
+    #
+
+    if options.get('backtesting') and options.get('shards', 1) > 1:
+        if options.get('time-factor'):
+            Terminal.inst().error("Option --time-factor is not supported with --shards")
+            sys.exit(-1)
+
+        from tools.backtester import do_backtester
+        do_backtester(options, siis_logger)
+
+        sys.exit(0)
+
     #
     # normal mode
     #
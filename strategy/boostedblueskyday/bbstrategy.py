@@ -3,6 +3,7 @@
 # @license Copyright (c) 2018 Dream Overflow
 # Blue Sky Day boosted strategy
 
+import math
 import time
 import copy
 import traceback
@@ -122,8 +123,7 @@ class BoostedBlueSkyDayStrategy(Strategy):
             self.reset()
 
             # listen to watchers and strategy signals
-            self.watcher_service.add_listener(self)
-            self.service.add_listener(self)
+            self.subscribe_signals()
 
             return True
         else:
@@ -505,6 +505,25 @@ class BoostedBlueSkyDayStrategy(Strategy):
 
             strategy_trader.count = 0
 
+    def next_backtest_timestamp(self):
+        timestamp = math.inf
+
+        for market_id, instrument in self._instruments.items():
+            strategy_trader = self._strategy_traders.get(instrument)
+
+            for tf in (Instrument.TF_MIN, Instrument.TF_5MIN, Instrument.TF_HOUR):
+                candles = strategy_trader.candles.get(tf)
+                next_candle = strategy_trader.next_candle.get(tf)
+
+                if next_candle is None or candles is None:
+                    # not loaded, unknown
+                    return 0.0
+
+                if next_candle < len(candles):
+                    timestamp = min(timestamp, candles[next_candle].timestamp)
+
+        return timestamp
+
     def backtest_update(self, timestamp, total_ts):
         for market_id, instrument in self._instruments.items():
             strategy_trader = self._strategy_traders.get(instrument)
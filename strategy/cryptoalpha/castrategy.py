@@ -46,8 +46,7 @@ class CryptoAlphaStrategy(Strategy):
             self.reset()
 
             # listen to watchers and strategy signals
-            self.watcher_service.add_listener(self)
-            self.service.add_listener(self)
+            self.subscribe_signals()
 
             return True
         else:
@@ -116,7 +115,7 @@ class CryptoAlphaStrategy(Strategy):
                         instrument.want_timeframe(timeframe['timeframe'])
 
             # create a feeder per instrument and fetch ticks and candles + ticks
-            feeder = StrategyDataFeeder(self, instrument.market_id, [], True)
+            feeder = StrategyDataFeeder(self, instrument.market_id, [], True, self.parameters['backtest-batch'])
             self.add_feeder(feeder)
 
             # fetch market info from the DB
@@ -57,8 +57,7 @@ class CrystalBallStrategy(Strategy):
             self.reset()
 
             # listen to watchers and strategy signals
-            self.watcher_service.add_listener(self)
-            self.service.add_listener(self)
+            self.subscribe_signals()
 
             return True
         else:
@@ -127,7 +126,7 @@ class CrystalBallStrategy(Strategy):
                         instrument.want_timeframe(timeframe['timeframe'])
 
             # create a feeder per instrument and fetch ticks and candles + ticks
-            feeder = StrategyDataFeeder(self, instrument.market_id, [], True)
+            feeder = StrategyDataFeeder(self, instrument.market_id, [], True, self.parameters['backtest-batch'])
             self.add_feeder(feeder)
 
             # fetch market info from the DB
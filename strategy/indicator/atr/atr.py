@@ -5,6 +5,7 @@
 
 from strategy.indicator.indicator import Indicator
 from strategy.indicator.utils import down_sample, MM_n
+from strategy.indicator.incremental import IncrementalEMA
 from talib import ATR as ta_ATR, SMA as ta_SMA
 
 import numpy as np
@@ -22,7 +23,7 @@ class ATRIndicator(Indicator):
         - ATR est une moyenne mobile (habituellement a 14 jours) de ces True Ranges
     """
 
-    __slots__ = '_length', '_coeff', '_atrs', '_last', '_prev', '_long_sl', '_short_sl'
+    __slots__ = '_length', '_coeff', '_atrs', '_last', '_prev', '_long_sl', '_short_sl', '_atr', '_prev_close', '_last_close'
 
     @classmethod
     def indicator_type(cls):
@@ -49,6 +50,16 @@ class ATRIndicator(Indicator):
         self._long_sl = 0
         self._short_sl = 0
 
+        # Wilder's smoothed true range
+        self._atr = IncrementalEMA(length, wilder=True)
+
+        self._prev_close = None  # close before the last sample
+        self._last_close = None
+
+    @classmethod
+    def incremental(cls):
+        return True
+
     @property
     def length(self):
         return self._length
@@ -57,6 +68,9 @@ class ATRIndicator(Indicator):
     def length(self, length):
         self._length = length
 
+        self._atr = IncrementalEMA(length, wilder=True)
+        self.reset()
+
     @property
     def prev(self):
         return self._prev
@@ -140,5 +154,34 @@ class ATRIndicator(Indicator):
 
         return self._atrs
 
+    def reset(self):
+        self._atr.reset()
+
+        self._prev_close = None
+        self._last_close = None
+
+    def update(self, timestamp, high, low, close, new=True):
+        if new or self._last_close is None:
+            self._prev = self._last
+            self._prev_close = self._last_close
+
+            if self._prev_close is not None:
+                self._last = self._atr.push(max(high, self._prev_close) - min(low, self._prev_close))
+
+        elif self._prev_close is not None:
+            self._last = self._atr.replace(max(high, self._prev_close) - min(low, self._prev_close))
+
+        self._last_close = close
+
+        if not self._atr.ready():
+            self._last = np.nan
+
+        # update the last ATR stop-loss for long and short directions
+        self._update_stop_loss(close)
+
+        self._last_timestamp = timestamp
+
+        return self._last
+
     def trace(self):
         return tuple(self._last)
@@ -6,6 +6,7 @@
 
 from strategy.indicator.indicator import Indicator
 from strategy.indicator.utils import down_sample, MM_n
+from strategy.indicator.incremental import IncrementalSMA
 from talib import BBANDS as ta_BBANDS
 
 import statistics as stat
@@ -19,7 +20,7 @@ class BollingerBandsIndicator(Indicator):
     https://www.fidelity.com/learning-center/trading-investing/technical-analysis/technical-indicator-guide/bollinger-band-width
     """
 
-    __slots__ = '_length', '_prev_bottom', '_prev_ma', '_prev_top', '_last_bottom', '_last_ma', '_last_top'
+    __slots__ = '_length', '_prev_bottom', '_prev_ma', '_prev_top', '_last_bottom', '_last_ma', '_last_top', '_sma'
 
     @classmethod
     def indicator_type(cls):
@@ -42,6 +43,12 @@ class BollingerBandsIndicator(Indicator):
         self._last_ma = 0.0
         self._last_top = 0.0
 
+        self._sma = IncrementalSMA(length, squares=True)
+
+    @classmethod
+    def incremental(cls):
+        return True
+
     @property
     def length(self):
         return self._length
@@ -49,6 +56,7 @@ class BollingerBandsIndicator(Indicator):
     @length.setter
     def length(self, length):
         self._length = length
+        self._sma = IncrementalSMA(length, squares=True)
 
     # @property
     # def step(self):
@@ -147,5 +155,28 @@ class BollingerBandsIndicator(Indicator):
 
         return top, ma, bottom
 
+    def reset(self):
+        self._sma.reset()
+
+    def update(self, timestamp, price, new=True):
+        if new:
+            self._prev_top = self._last_top
+            self._prev_ma = self._last_ma
+            self._prev_bottom = self._last_bottom
+
+            ma = self._sma.push(price)
+        else:
+            ma = self._sma.replace(price)
+
+        sigma = self._sma.stddev()
+
+        self._last_top = ma + 2.0 * sigma
+        self._last_ma = ma
+        self._last_bottom = ma - 2.0 * sigma
+
+        self._last_timestamp = timestamp
+
+        return self._last_top, self._last_ma, self._last_bottom
+
     def trace(self):
         return tuple(self._last_top, self._last_ma, self._last_bottom)
@@ -6,6 +6,7 @@
 
 from strategy.indicator.indicator import Indicator
 from strategy.indicator.utils import down_sample, MMexp_n
+from strategy.indicator.incremental import IncrementalEMA
 
 import numpy as np
 from talib import EMA as ta_EMA
@@ -16,7 +17,7 @@ class EMAIndicator(Indicator):
     Exponential Moving Average indicator
     """
 
-    __slots__ = '_length', '_prev', '_last', '_emas'
+    __slots__ = '_length', '_prev', '_last', '_emas', '_ema'
 
     @classmethod
     def indicator_type(cls):
@@ -39,6 +40,12 @@ class EMAIndicator(Indicator):
 
         self._emas = np.array([])
 
+        self._ema = IncrementalEMA(length)
+
+    @classmethod
+    def incremental(cls):
+        return True
+
     @property
     def length(self):
         return self._length
@@ -46,6 +53,7 @@ class EMAIndicator(Indicator):
     @length.setter
     def length(self, length):
         self._length = length
+        self._ema = IncrementalEMA(length)
 
     @property
     def prev(self):
@@ -85,5 +93,19 @@ class EMAIndicator(Indicator):
 
         return self._emas
 
+    def reset(self):
+        self._ema.reset()
+
+    def update(self, timestamp, price, new=True):
+        if new:
+            self._prev = self._last
+            self._last = self._ema.push(price)
+        else:
+            self._last = self._ema.replace(price)
+
+        self._last_timestamp = timestamp
+
+        return self._last
+
     def trace(self):
         return tuple(self._last)
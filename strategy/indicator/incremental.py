@@ -0,0 +1,226 @@
+# @date 2019-06-11
+# @author Frederic SCHERMA
+# @license Copyright (c) 2019 Dream Overflow
+# Incremental (streaming) computation helpers for the indicators
+
+import collections
+import math
+
+import numpy as np
+
+
+class IncrementalSMA(object):
+    """
+    Simple moving average over a window of N samples, updated in O(1).
+    Optionally maintain the sum of squares for the standard deviation.
+
+    push adds a new sample, replace updates the last pushed one (non consolidated candle).
+    Values are NaN until N samples are pushed, as TA-Lib does.
+    """
+
+    __slots__ = '_length', '_window', '_pos', '_count', '_sum', '_sum2', '_squares'
+
+    def __init__(self, length, squares=False):
+        self._length = length
+        self._squares = squares
+
+        self._window = np.zeros(length)
+        self.reset()
+
+    def reset(self):
+        self._window.fill(0.0)
+
+        self._pos = 0    # next write position into the window
+        self._count = 0
+
+        self._sum = 0.0
+        self._sum2 = 0.0
+
+    @property
+    def count(self):
+        return self._count
+
+    def ready(self):
+        return self._count >= self._length
+
+    def push(self, x):
+        evicted = self._window[self._pos]
+
+        self._window[self._pos] = x
+        self._pos = (self._pos + 1) % self._length
+        self._count += 1
+
+        if self._pos == 0:
+            # once per window exact sums, avoid the drift of the running sums
+            self._sum = self._window.sum()
+            if self._squares:
+                self._sum2 = np.dot(self._window, self._window)
+        else:
+            self._sum += x - evicted
+            if self._squares:
+                self._sum2 += x*x - evicted*evicted
+
+        return self.value()
+
+    def replace(self, x):
+        if not self._count:
+            return self.push(x)
+
+        last = (self._pos - 1) % self._length
+        prev = self._window[last]
+
+        self._window[last] = x
+
+        self._sum += x - prev
+        if self._squares:
+            self._sum2 += x*x - prev*prev
+
+        return self.value()
+
+    def value(self):
+        if self._count < self._length:
+            return math.nan
+
+        return self._sum / self._length
+
+    def stddev(self):
+        """
+        Population standard deviation over the window (as TA-Lib STDDEV).
+        """
+        if self._count < self._length:
+            return math.nan
+
+        mean = self._sum / self._length
+        variance = self._sum2 / self._length - mean * mean
+
+        return math.sqrt(variance) if variance > 0.0 else 0.0
+
+
+class IncrementalEMA(object):
+    """
+    Exponential moving average updated in O(1), seeded by the simple average of the N first samples,
+    as TA-Lib does.
+
+    @param k Smoothing factor, default to 2/(N+1). Wilder's smoothing (RSI, ATR) uses 1/N.
+    """
+
+    __slots__ = '_length', '_k', '_wilder', '_count', '_seed', '_value', '_prev_value', '_last_x'
+
+    def __init__(self, length, wilder=False):
+        self._length = length
+        self._wilder = wilder
+        self._k = 1.0 / length if wilder else 2.0 / (length + 1)
+
+        self.reset()
+
+    def reset(self):
+        self._count = 0
+        self._seed = 0.0
+
+        self._value = math.nan       # with the last sample
+        self._prev_value = math.nan  # before the last sample
+
+        self._last_x = 0.0
+
+    @property
+    def count(self):
+        return self._count
+
+    def ready(self):
+        return self._count >= self._length
+
+    def __step(self, x):
+        if self._count < self._length:
+            self._value = math.nan
+        elif self._count == self._length:
+            self._value = self._seed / self._length
+        elif self._wilder:
+            self._value = (self._prev_value * (self._length - 1) + x) / self._length
+        else:
+            self._value = (x - self._prev_value) * self._k + self._prev_value
+
+        self._last_x = x
+
+        return self._value
+
+    def push(self, x):
+        self._prev_value = self._value
+        self._count += 1
+
+        if self._count <= self._length:
+            self._seed += x
+
+        return self.__step(x)
+
+    def replace(self, x):
+        if not self._count:
+            return self.push(x)
+
+        if self._count <= self._length:
+            self._seed += x - self._last_x
+
+        return self.__step(x)
+
+    def value(self):
+        return self._value
+
+
+class IncrementalExtremum(object):
+    """
+    Highest or lowest value over a window of N samples, using a monotonic deque (amortized O(1)).
+    The last push can be undone to support the replace of the last sample.
+    """
+
+    __slots__ = '_length', '_highest', '_deque', '_index', '_undo'
+
+    def __init__(self, length, highest=True):
+        self._length = length
+        self._highest = highest
+
+        self._deque = collections.deque()
+        self.reset()
+
+    def reset(self):
+        self._deque.clear()
+
+        self._index = -1
+        self._undo = None
+
+    def __dominates(self, a, b):
+        return a >= b if self._highest else a <= b
+
+    def push(self, x):
+        self._index += 1
+
+        popped = []
+        while self._deque and self.__dominates(x, self._deque[-1][1]):
+            popped.append(self._deque.pop())
+
+        self._deque.append((self._index, x))
+
+        expired = None
+        if self._deque[0][0] <= self._index - self._length:
+            expired = self._deque.popleft()
+
+        self._undo = (popped, expired)
+
+        return self._deque[0][1]
+
+    def replace(self, x):
+        if self._undo is None:
+            return self.push(x)
+
+        popped, expired = self._undo
+
+        # undo the last push
+        self._deque.pop()
+        self._deque.extend(reversed(popped))
+        if expired is not None:
+            self._deque.appendleft(expired)
+
+        self._index -= 1
+
+        return self.push(x)
+
+    def value(self):
+        return self._deque[0][1] if self._deque else math.nan
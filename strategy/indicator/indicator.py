@@ -60,6 +60,35 @@ class Indicator(object):
     def compute(self, timestamp):
         return None
 
+    #
+    # incremental computation
+    #
+
+    @classmethod
+    def incremental(cls):
+        """
+        True if the indicator supports the incremental computation (update method).
+        """
+        return False
+
+    def reset(self):
+        """
+        Reset the state of the incremental computation.
+        """
+        pass
+
+    def update(self, timestamp, *sample, new=True):
+        """
+        Incremental computation from a single sample, in O(1), instead of a compute over the full window.
+
+        @param sample The values of the sample, in the same order as for compute (ie price, or high, low, close).
+        @param new True if it is a new sample, False if it updates the last one (non consolidated candle).
+        @return The last value(s) of the indicator.
+
+        This method must be overrided by the incremental indicators.
+        """
+        return None
+
     def trace(self):
         """
         Return a tuple or dict of the state of the indicator.
@@ -6,6 +6,7 @@
 
 from strategy.indicator.indicator import Indicator
 from strategy.indicator.utils import down_sample, MMexp_n, MM_n
+from strategy.indicator.incremental import IncrementalEMA
 from talib import MACD as ta_MACD
 
 import numpy as np
@@ -17,7 +18,7 @@ class MACDIndicator(Indicator):
     https://fr.wikipedia.org/wiki/MACD
     """
 
-    __slots__ = '_short_l', '_long_l', '_signal_l', '_prev', '_last', '_macds'
+    __slots__ = '_short_l', '_long_l', '_signal_l', '_prev', '_last', '_macds', '_last_signal', '_count', '_short_ema', '_long_ema', '_signal_ema'
 
     @classmethod
     def indicator_type(cls):
@@ -39,6 +40,24 @@ class MACDIndicator(Indicator):
 
         self._macds = np.array([])
 
+        self._last_signal = 0.0
+
+        self._count = 0
+        self.__init_emas()
+
+    def __init_emas(self):
+        if self._short_l > self._long_l:
+            # swapped as TA-Lib does, the short EMA must be seeded on the tail of the long EMA seed
+            self._short_l, self._long_l = self._long_l, self._short_l
+
+        self._short_ema = IncrementalEMA(self._short_l)
+        self._long_ema = IncrementalEMA(self._long_l)
+        self._signal_ema = IncrementalEMA(self._signal_l)
+
+    @classmethod
+    def incremental(cls):
+        return True
+
     @property
     def prev(self):
         return self._prev
@@ -47,6 +66,10 @@ class MACDIndicator(Indicator):
     def last(self):
         return self._last
 
+    @property
+    def last_signal(self):
+        return self._last_signal
+
     @property
     def short_length(self):
         return self._short_l
@@ -54,6 +77,7 @@ class MACDIndicator(Indicator):
     @short_length.setter
     def short_length(self, length):
         self._short_l = length
+        self.reset()
 
     @property
     def long_length(self):
@@ -62,6 +86,7 @@ class MACDIndicator(Indicator):
     @long_length.setter
     def long_length(self, length):
         self._long_l = length
+        self.reset()
 
     @property
     def macds(self):
@@ -93,12 +118,46 @@ class MACDIndicator(Indicator):
         self._prev = self._last
 
         # self._macds = MACDIndicator.MACD(self._short_l, self._long_l, prices)
-        self._macds, macdsignal, macdhist = MACD(prices, fastperiod=self._short_l, slowperiod=self._long_l, signalperiod=self._short_l)
+        self._macds, macdsignal, macdhist = ta_MACD(prices, fastperiod=self._short_l, slowperiod=self._long_l, signalperiod=self._signal_l)
 
         self._last = self._macds[-1]
         self._last_timestamp = timestamp
 
         return self._macds
 
+    def reset(self):
+        self._count = 0
+        self.__init_emas()
+
+    def update(self, timestamp, price, new=True):
+        """
+        Same alignment as TA-Lib : the short EMA is seeded on the last short length prices of the
+        long EMA seed, so that both are ready at the same sample.
+        """
+        if new or not self._count:
+            self._prev = self._last
+            self._count += 1
+            method = 'push'
+        else:
+            method = 'replace'
+
+        index = self._count - 1
+
+        long_ema = getattr(self._long_ema, method)(price)
+
+        if index >= self._long_l - self._short_l:
+            short_ema = getattr(self._short_ema, method)(price)
+
+        if self._long_ema.ready():
+            self._last = short_ema - long_ema
+            self._last_signal = getattr(self._signal_ema, method)(self._last)
+        else:
+            self._last = np.nan
+            self._last_signal = np.nan
+
+        self._last_timestamp = timestamp
+
+        return self._last
+
     def trace(self):
         return tuple(self._last)
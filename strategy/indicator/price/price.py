@@ -5,6 +5,7 @@
 
 from strategy.indicator.indicator import Indicator
 from strategy.indicator.utils import down_sample
+from instrument.instrument import CandleBatch
 
 import numpy as np
 
@@ -92,6 +93,16 @@ class PriceIndicator(Indicator):
     def Price(method, data):
         prices = []
 
+        if isinstance(data, CandleBatch):
+            if method == PriceIndicator.PRICE_CLOSE:
+                prices = data.close
+            elif method == PriceIndicator.PRICE_HLC3:
+                prices = (data.high + data.low + data.close) / 3.0
+            elif method == PriceIndicator.PRICE_OHLC4:
+                prices = (data.open + data.high + data.low + data.close) / 4.0
+
+            return prices
+
         if method == PriceIndicator.PRICE_CLOSE:
             # average of bid/ofr close price
             prices = np.array([x.close for x in data])
@@ -158,49 +169,49 @@ class PriceIndicator(Indicator):
         return prices
 
     def compute(self, timestamp, candles):
+        """
+        @param candles List of Candle or CandleBatch.
+        """
         self._prev = self._last
 
-        # price = PriceIndicator.Price(self._method, candles)  # , self._step, self._filtering)
-        if self._method == PriceIndicator.PRICE_CLOSE:
-            # average of bid/ofr close price
-            self._prices = np.array([x.close for x in candles])
-
-            self._open = np.array([x.open for x in candles])
-            self._high = np.array([x.high for x in candles])
-            self._low = np.array([x.low for x in candles])
-            self._close = np.array(self._prices)
+        if isinstance(candles, CandleBatch):
+            # directly from the columns
+            o_prices = candles.open
+            h_prices = candles.high
+            l_prices = candles.low
+            c_prices = candles.close
 
-        elif self._method == PriceIndicator.PRICE_HLC3:
+            timestamps = candles.timestamp.copy()
+        else:
+            o_prices = np.array([x.open for x in candles])
             h_prices = np.array([x.high for x in candles])
             l_prices = np.array([x.low for x in candles])
             c_prices = np.array([x.close for x in candles])
 
-            self._prices = (h_prices + l_prices + c_prices) / 3.0
+            timestamps = np.array([x.timestamp for x in candles])
+
+        # price = PriceIndicator.Price(self._method, candles)  # , self._step, self._filtering)
+        if self._method == PriceIndicator.PRICE_CLOSE:
+            # average of bid/ofr close price
+            self._prices = c_prices
 
-            self._open = np.array([x.open for x in candles])
-            self._high = h_prices
-            self._low = l_prices
-            self._close = c_prices
+        elif self._method == PriceIndicator.PRICE_HLC3:
+            self._prices = (h_prices + l_prices + c_prices) / 3.0
 
         elif self._method == PriceIndicator.PRICE_OHLC4:
-            o_prices = np.array([x.open for x in candles])
-            h_prices = np.array([x.high for x in candles])
-            l_prices = np.array([x.low for x in candles])
-            c_prices = np.array([x.close for x in candles])
-
             self._prices = (o_prices + h_prices + l_prices + c_prices) / 4.0
 
-            self._open = o_prices
-            self._high = h_prices
-            self._low = l_prices
-            self._close = c_prices            
+        self._open = o_prices
+        self._high = h_prices
+        self._low = l_prices
+        self._close = np.array(c_prices)
 
         # related timestamps
-        self._timestamp = np.array([x.timestamp for x in candles])
+        self._timestamp = timestamps
 
         # low/high
-        self._min = min(self._prices)
-        self._max = max(self._prices)
+        self._min = np.min(self._prices)
+        self._max = np.max(self._prices)
 
         self._last = self._prices[-1]
         self._last_timestamp = timestamp
@@ -6,6 +6,7 @@
 
 from strategy.indicator.indicator import Indicator
 from strategy.indicator.utils import down_sample, MMexp_n, MM_n
+from strategy.indicator.incremental import IncrementalEMA
 
 import numpy as np
 from talib import RSI as ta_RSI
@@ -16,7 +17,7 @@ class RSIIndicator(Indicator):
     Relative Strengh Index indicator
     """
 
-    __slots__ = '_length', '_prev', '_last', '_rsis'
+    __slots__ = '_length', '_prev', '_last', '_rsis', '_gain', '_loss', '_prev_price', '_last_price'
 
     @classmethod
     def indicator_type(cls):
@@ -35,6 +36,17 @@ class RSIIndicator(Indicator):
 
         self._rsis = np.array([])
 
+        # Wilder's smoothed average gain and loss
+        self._gain = IncrementalEMA(length, wilder=True)
+        self._loss = IncrementalEMA(length, wilder=True)
+
+        self._prev_price = None  # price before the last sample
+        self._last_price = None
+
+    @classmethod
+    def incremental(cls):
+        return True
+
     @property
     def length(self):
         return self._length
@@ -43,6 +55,10 @@ class RSIIndicator(Indicator):
     def length(self, length):
         self._length = length
 
+        self._gain = IncrementalEMA(length, wilder=True)
+        self._loss = IncrementalEMA(length, wilder=True)
+        self.reset()
+
     @property
     def prev(self):
         return self._prev
@@ -68,8 +84,8 @@ class RSIIndicator(Indicator):
         # b = np.array(list(map(lambda x: abs(min(x,0)), variations)))
 
         # or that to avoid zeros
-        h = np.array(list(map(lambda x: max(x,0.000000001), variations)))
-        b = np.array(list(map(lambda x: abs(min(x,-0.000000001)), variations)))
+        h = np.maximum(variations, 0.000000001)
+        b = np.abs(np.minimum(variations, -0.000000001))
 
         # exp or linear
         hn = MM_n(N, h)  # MMexp_n(N, h)
@@ -96,8 +112,8 @@ class RSIIndicator(Indicator):
         # b = np.array(list(map(lambda x: abs(min(x,0)), variations)))
 
         # or that to avoid zeros
-        h = np.array(list(map(lambda x: max(x,0.000000001), variations)))
-        b = np.array(list(map(lambda x: abs(min(x,-0.000000001)), variations)))
+        h = np.maximum(variations, 0.000000001)
+        b = np.abs(np.minimum(variations, -0.000000001))
 
         # exp or linear
         # hn = np.interp(range(len(data)), t_subdata[1:], MMexp_n(N, h))
@@ -120,5 +136,44 @@ class RSIIndicator(Indicator):
 
         return self._rsis
 
+    def reset(self):
+        self._gain.reset()
+        self._loss.reset()
+
+        self._prev_price = None
+        self._last_price = None
+
+    def update(self, timestamp, price, new=True):
+        if new or self._last_price is None:
+            self._prev = self._last
+            self._prev_price = self._last_price
+
+            if self._prev_price is not None:
+                variation = price - self._prev_price
+
+                self._gain.push(max(variation, 0.0))
+                self._loss.push(max(-variation, 0.0))
+
+        elif self._prev_price is not None:
+            variation = price - self._prev_price
+
+            self._gain.replace(max(variation, 0.0))
+            self._loss.replace(max(-variation, 0.0))
+
+        self._last_price = price
+
+        if self._gain.ready():
+            gain = self._gain.value()
+            total = gain + self._loss.value()
+
+            # in normalized 0..1
+            self._last = gain / total if total != 0.0 else 0.0
+        else:
+            self._last = np.nan
+
+        self._last_timestamp = timestamp
+
+        return self._last
+
     def trace(self):
         return tuple(self._last)
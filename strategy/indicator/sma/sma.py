@@ -6,6 +6,7 @@
 
 from strategy.indicator.indicator import Indicator
 from strategy.indicator.utils import down_sample, MM_n
+from strategy.indicator.incremental import IncrementalSMA
 
 import numpy as np
 from talib import SMA as ta_SMA
@@ -16,7 +17,7 @@ class SMAIndicator(Indicator):
     Simple Moving Average indicator
     """
 
-    __slots__ = '_length', '_prev', '_last', '_smas'
+    __slots__ = '_length', '_prev', '_last', '_smas', '_sma'
 
     @classmethod
     def indicator_type(cls):
@@ -36,6 +37,12 @@ class SMAIndicator(Indicator):
 
         self._smas = np.array([])
 
+        self._sma = IncrementalSMA(length)
+
+    @classmethod
+    def incremental(cls):
+        return True
+
     @property
     def length(self):
         return self._length
@@ -43,6 +50,7 @@ class SMAIndicator(Indicator):
     @length.setter
     def length(self, length):
         self._length = length
+        self._sma = IncrementalSMA(length)
 
     @property
     def prev(self):
@@ -81,5 +89,19 @@ class SMAIndicator(Indicator):
 
         return self._smas
 
+    def reset(self):
+        self._sma.reset()
+
+    def update(self, timestamp, price, new=True):
+        if new:
+            self._prev = self._last
+            self._last = self._sma.push(price)
+        else:
+            self._last = self._sma.replace(price)
+
+        self._last_timestamp = timestamp
+
+        return self._last
+
     def trace(self):
         return tuple(self._last)
@@ -6,6 +6,7 @@
 
 from strategy.indicator.indicator import Indicator
 from strategy.indicator.utils import down_sample, MMexp_n, MM_n
+from strategy.indicator.incremental import IncrementalSMA, IncrementalExtremum
 
 import numpy as np
 from talib import STOCH as ta_STOCH, STOCHF as to_STOCHF
@@ -17,7 +18,7 @@ class StochasticIndicator(Indicator):
     https://www.fidelity.com/learning-center/trading-investing/technical-analysis/technical-indicator-guide/slow-stochastic
     """
 
-    __slots__ = '_len_K', '_len_D', '_prev_k', '_last_k', '_prev_d', '_last_d', '_ks', '_ds'
+    __slots__ = '_len_K', '_len_D', '_prev_k', '_last_k', '_prev_d', '_last_d', '_ks', '_ds', '_count', '_highest', '_lowest', '_d_sma'
 
     @classmethod
     def indicator_type(cls):
@@ -42,6 +43,18 @@ class StochasticIndicator(Indicator):
         self._ks = np.array([])
         self._ds = np.array([])
 
+        self.__init_incremental()
+
+    def __init_incremental(self):
+        self._count = 0
+        self._highest = IncrementalExtremum(self._len_K, highest=True)
+        self._lowest = IncrementalExtremum(self._len_K, highest=False)
+        self._d_sma = IncrementalSMA(self._len_D)
+
+    @classmethod
+    def incremental(cls):
+        return True
+
     @property
     def length(self):
         return self._length
@@ -73,6 +86,7 @@ class StochasticIndicator(Indicator):
     @len_K.setter
     def len_K(self, len_K):
         self._len_K = len_K
+        self.__init_incremental()
 
     @property
     def len_D(self):
@@ -81,6 +95,7 @@ class StochasticIndicator(Indicator):
     @len_D.setter
     def len_D(self, len_D):
         self._len_D = len_D
+        self.__init_incremental()
 
     @property
     def ks(self):
@@ -153,5 +168,42 @@ class StochasticIndicator(Indicator):
 
         return self._ks, self._ds
 
+    def reset(self):
+        self._count = 0
+        self._highest.reset()
+        self._lowest.reset()
+        self._d_sma.reset()
+
+    def update(self, timestamp, high, low, close, new=True):
+        """
+        Fast stochastic (as compute), K and D in 0..100.
+        """
+        if new or not self._count:
+            self._prev_k = self._last_k
+            self._prev_d = self._last_d
+            self._count += 1
+
+            highest = self._highest.push(high)
+            lowest = self._lowest.push(low)
+            method = 'push'
+        else:
+            highest = self._highest.replace(high)
+            lowest = self._lowest.replace(low)
+            method = 'replace'
+
+        if self._count >= self._len_K:
+            # K defined from the N-th sample
+            diff = highest - lowest
+            self._last_k = (close - lowest) / diff * 100.0 if diff > 0.0 else 0.0
+
+            self._last_d = getattr(self._d_sma, method)(self._last_k)
+        else:
+            self._last_k = np.nan
+            self._last_d = np.nan
+
+        self._last_timestamp = timestamp
+
+        return self._last_k, self._last_d
+
     def trace(self):
         return tuple(self._last_k, self._last_d)
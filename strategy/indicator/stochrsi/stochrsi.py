@@ -85,8 +85,8 @@ class StochRSIIndicator(Indicator):
         # b = np.array(list(map(lambda x: abs(min(x,0)), variations)))
 
         # or that to avoid zeros
-        h = np.array(list(map(lambda x: max(x,0.000001), variations)))
-        b = np.array(list(map(lambda x: abs(min(x,-0.000001)), variations)))
+        h = np.maximum(variations, 0.000001)
+        b = np.abs(np.minimum(variations, -0.000001))
 
         # exp or linear
         hn = MM_n(N, h)  # MMexp_n(N, h)
@@ -109,8 +109,8 @@ class StochRSIIndicator(Indicator):
         # b = np.array(list(map(lambda x: abs(min(x,0)), variations)))
 
         # or that to avoid zeros
-        h = np.array(list(map(lambda x: max(x,0.000001), variations)))
-        b = np.array(list(map(lambda x: abs(min(x,-0.000001)), variations)))
+        h = np.maximum(variations, 0.000001)
+        b = np.abs(np.minimum(variations, -0.000001))
 
         # exp or linear
         # hn = np.interp(range(len(data)), t_subdata[1:], MMexp_n(N, h))
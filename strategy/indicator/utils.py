@@ -14,13 +14,20 @@ def down_sample(data, factor, n=4, ftype='iir'):
 def MM_n(N, data):
     """
     Calcul de la moyenne mobile sur N points.
+    Les N-1 premiers points sont la moyenne des points disponibles.
+    Vectorise : moyenne cumulee pour le debut, convolution pour la fenetre glissante.
     """
+    data = np.asarray(data, dtype=np.float64)
     out = np.zeros(len(data))
 
-    for j in range(N):
-        out[j] = np.average(data[:j+1])
-    for (j,d) in enumerate(data[N-1:]):
-        out[j+N-1] = np.average(data[j:j+N])
+    if not len(data) or N <= 0:
+        return out
+
+    n = min(N, len(data))
+    out[:n] = np.cumsum(data[:n]) / np.arange(1, n+1)
+
+    if len(data) >= N:
+        out[N-1:] = np.convolve(data, np.full(N, 1.0 / N), 'valid')
 
     return out
 
@@ -31,19 +38,30 @@ def MMexp_n(N, data, has_previous_val = False, previous_value = 0):
     previous_val permet d'initialiser la 1ere valeur correctement
     Si la valeur n'est pas initialisee (False, par defaut), la fonction calcule la moyenne mobile avec 
     n=1, 2, 3, ..., N pour les N premiers echantillons
+    Vectorise : filtre IIR du premier ordre (scipy.signal.lfilter).
     """
     An = 2.0 / (1.0 + N)
+    data = np.asarray(data, dtype=np.float64)
     out = np.zeros(len(data))
 
+    if not len(data):
+        return out
+
+    # y[j] = An*x[j] + (1-An)*y[j-1]
+    b = [An]
+    a = [1.0, -(1.0 - An)]
+
     if (has_previous_val):
-        out[0] = data[0]*An + (1-An)*previous_value 
-        for (j,d) in enumerate(data[1:]):
-            out[j+1] = d*An + (1-An)*out[j]
+        out[:], _ = signal.lfilter(b, a, data, zi=[(1.0 - An) * previous_value])
     else:
-        for j in range(N):
-            out[j] = np.average(data[:j+1])
-        for (j,d) in enumerate(data[N-1:]):
-            out[j+N-1] = d*An + (1-An)*out[j+N-2]
+        n = min(N-1, len(data))
+        if n > 0:
+            out[:n] = np.cumsum(data[:n]) / np.arange(1, n+1)
+
+        if len(data) >= N:
+            # recursion from the N-th sample, starting from the average of the N-1 first
+            previous = out[N-2] if N > 1 else 0.0
+            out[N-1:], _ = signal.lfilter(b, a, data[N-1:], zi=[(1.0 - An) * previous])
 
     return out
 
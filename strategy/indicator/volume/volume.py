@@ -5,6 +5,7 @@
 
 from strategy.indicator.indicator import Indicator
 from strategy.indicator.utils import down_sample
+from instrument.instrument import CandleBatch
 
 import numpy as np
 
@@ -57,6 +58,10 @@ class VolumeIndicator(Indicator):
 
     @staticmethod
     def Volume(method, data):
+        if isinstance(data, CandleBatch):
+            # copy, the batch can be a view on the instrument buffer
+            return data.volume.copy()
+
         if method == VolumeIndicator.VOLUME_TICK:
             return np.array([x.volume for x in data])
         else:
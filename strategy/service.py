@@ -3,8 +3,10 @@
 # @license Copyright (c) 2018 Dream Overflow
 # service worker for strategy
 
+import math
 import time
 import threading
+import traceback
 
 from datetime import datetime
 from importlib import import_module
@@ -21,6 +23,9 @@ from strategy.strategy import Strategy
 from notifier.signal import Signal
 from config import config, utils
 
+import logging
+logger = logging.getLogger('siis.strategy.service')
+
 
 class StrategyService(Service):
 
@@ -73,6 +78,11 @@ class StrategyService(Service):
         self._timestep_thread = None
         self._time_factor = 0.0
 
+        # sharded backtesting, this process only runs a subset of the markets (index, count)
+        self._shard = options.get('shard')
+        self._shard_barrier = options.get('shard-barrier')  # per timestep barrier shared by the shards processes
+        self._shard_next_times = options.get('shard-next-times')  # shared array of 2 x shards next data timestamps
+
         if self._backtesting:
             # can use the time factor in backtesting only
             self._time_factor = options.get('time-factor', 0.0)
@@ -80,6 +90,9 @@ class StrategyService(Service):
         # paper mode options
         self._paper_mode = options.get('paper-mode', False)
 
+        # overrided strategy parameters per appliance, used by the optimizer parameters sweep
+        self._parameters_overrides = options.get('parameters-overrides', {})
+
         self._next_key = 1
 
         # worker pool of jobs for running data analysis
@@ -201,6 +214,9 @@ class StrategyService(Service):
                 # overrided strategy parameters
                 parameters = strategy.get('parameters', {})
 
+                if self._parameters_overrides.get(k):
+                    parameters = Strategy.override_parameters(parameters, self._parameters_overrides[k])
+
                 if not strategy or not strategy.get('name'):
                     logger.error("Invalid strategy configuration for appliance %s !" % k)
 
@@ -221,6 +237,11 @@ class StrategyService(Service):
         if self._timestep_thread and self._timestep_thread.is_alive():
             # abort backtesting
             self._timestep_thread.abort = True
+
+            if self._shard_barrier:
+                # release the others shards
+                self._shard_barrier.abort()
+
             self._timestep_thread.join()
             self._timestep_thread = None
 
@@ -285,8 +306,64 @@ class StrategyService(Service):
                         self.ts = ts
                         self.ppc = 0
                         self.tf = tf
+                        self.step = 0
+                        self.failed = False
+
+                    def next_step(self, appliances):
+                        """
+                        Move the current timestep to the next one having data to process, skipping the empty ones.
+                        The timesteps stay on the fixed grid and the last one is always processed, then the results
+                        are identical. There is no skip with a time factor (realtime simulation).
+
+                        In sharded backtesting wait for the others shards processes, and skip to the nearest data of any shard.
+                        Returns False if the barrier was aborted (a shard terminated or failed).
+                        """
+                        next_ts = self.c
+
+                        if self.tf <= 0:
+                            next_ts = math.inf
+                            for appl in appliances:
+                                next_ts = min(next_ts, appl.next_backtest_timestamp())
+
+                        barrier = self.service._shard_barrier
+                        if barrier is not None:
+                            # double buffered per shard next timestamps, a shard cannot overwrite it until everyone passed the barrier
+                            index, count = self.service._shard
+                            next_times = self.service._shard_next_times
+                            ofs = (self.step & 1) * count
+
+                            if next_times is not None:
+                                next_times[ofs+index] = next_ts
+
+                            try:
+                                barrier.wait()
+                            except threading.BrokenBarrierError:
+                                return False
+
+                            if next_times is not None:
+                                next_ts = min(next_times[ofs:ofs+count])
+
+                            self.step += 1
+
+                        while self.c < next_ts and self.c < self.e:
+                            self.c += self.ts  # empty time step
+
+                        return True
 
                     def run(self):
+                        try:
+                            self.process()
+                        except Exception as e:
+                            self.failed = True
+
+                            logger.error(repr(e))
+                            logger.error(traceback.format_exc())
+                        finally:
+                            if (self.failed or self.abort) and self.service._shard_barrier is not None:
+                                # don't let the others shards waiting forever
+                                self.service._shard_barrier.abort()
+
+                    def process(self):
                         prev = self.c
                         min_limit = 0.0001
                         limit = min_limit  # starts with min limit
@@ -327,6 +404,12 @@ class StrategyService(Service):
                                 for trader in traders:
                                     trader.update()
 
+                                # skip to the next data
+                                if not self.next_step(appliances):
+                                    break
+
+                                self.service._timestamp = self.c
+
                                 time.sleep(0)  # yield
 
                                 if self.abort:
@@ -366,6 +449,12 @@ class StrategyService(Service):
                                     for trader in traders:
                                         trader.update()
 
+                                    # skip to the next data
+                                    if not self.next_step(appliances):
+                                        break
+
+                                    self.service._timestamp = self.c
+
                                 time.sleep(0)  # yield
 
                                 if self.abort:
@@ -418,7 +507,7 @@ class StrategyService(Service):
         self._mutex.release()
 
     def command(self, command_type, data):
-        if Strategy.COMMAND_SHOW_STATS <= command_type <= Strategy.COMMAND_INFO:
+        if Strategy.COMMAND_SHOW_STATS <= command_type <= Strategy.COMMAND_MEMORY_INFO:
             # any or specific commands
             appliance_identifier = data.get('appliance')
 
@@ -478,6 +567,27 @@ class StrategyService(Service):
     def backtesting(self):
         return self._backtesting
 
+    @property
+    def backtest_finished(self):
+        """
+        True once the backtesting timestep thread has been started and is done.
+        """
+        return self._backtest and not (self._timestep_thread and self._timestep_thread.is_alive())
+
+    @property
+    def backtest_failed(self):
+        """
+        True if the backtesting timestep thread stopped on an error.
+        """
+        return self._timestep_thread is not None and self._timestep_thread.failed
+
+    @property
+    def shard(self):
+        """
+        None or a tuple (shard index, shards count) when the backtesting is sharded across processes.
+        """
+        return self._shard
+
     @property
     def from_date(self):
         return self._from_date
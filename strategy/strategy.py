@@ -4,8 +4,11 @@
 # Strategy interface
 
 import os
+import copy
+import math
 import threading
 import time
+import zlib
 import collections
 
 from datetime import datetime
@@ -13,7 +16,7 @@ from datetime import datetime
 from terminal.terminal import Terminal, Color
 
 from common.runnable import Runnable
-from monitor.streamable import Streamable, StreamMemberFloat, StreamMemberBool
+from monitor.streamable import Streamable, StreamMemberFloat, StreamMemberBool, StreamMemberInt
 from common.utils import timeframe_to_str, timeframe_from_str
 
 from notifier.signal import Signal
@@ -27,6 +30,7 @@ from trader.order import Order
 from strategy.strategyassettrade import StrategyAssetTrade
 from strategy.strategymargintrade import StrategyMarginTrade
 from strategy.strategyindmargintrade import StrategyIndMarginTrade
+from strategy.tradejournal import TradeJournal
 
 from database.database import Database
 
@@ -53,11 +57,13 @@ class Strategy(Runnable):
     @todo Move Each COMMAND_ to command/ and have a registry
     """
 
-    MAX_SIGNALS = 2000   # max size of the signals messages queue before ignore some market data (tick, ohlc)
+    MAX_SIGNALS = 2000            # size of the signals messages queues before warn of a saturation
+    MAX_SIGNALS_PER_UPDATE = 10   # max number of regular signals (candles, bulks...) processed per update
 
     COMMAND_SHOW_STATS = 1
     COMMAND_SHOW_HISTORY = 2
     COMMAND_INFO = 3
+    COMMAND_MEMORY_INFO = 4
 
     COMMAND_TRADE_ENTRY = 10    # manually create a new trade
     COMMAND_TRADE_MODIFY = 11   # modify an existing trade
@@ -89,12 +95,18 @@ class Strategy(Runnable):
 
         self._trader = None        # attached trader
 
-        self._signals = collections.deque()  # filtered received signals
+        self._signals = collections.deque()           # filtered received signals
+        self._priority_signals = collections.deque()  # lossless lane for the order, position and account signals
+        self._market_slots = {}                       # live market data and ticks per (market_id, signal type)
+        self._slots_mutex = threading.Lock()
+        self._coalesced = 0                           # number of coalesced market data and ticks
 
         self._instruments = {}       # mapped instruments
         self._feeders = {}           # feeders mapped by market id
         self._strategy_traders = {}  # per instrument strategy data analyser
 
+        self._journal = TradeJournal()  # closed trades of any strategy-trader
+
         # used during backtesting
         self._last_done_ts = 0
         self._timestamp = 0
@@ -126,6 +138,10 @@ class Strategy(Runnable):
     @property
     def watcher_service(self):
         return self._watcher_service
+
+    @property
+    def journal(self):
+        return self._journal
     
     @property
     def trader_service(self):
@@ -186,6 +202,7 @@ class Strategy(Runnable):
         self._streamable = Streamable(self.service.monitor_service, Streamable.STREAM_STRATEGY, "status", self.identifier)
 
         self._streamable.add_member(StreamMemberFloat('cpu-load'))
+        self._streamable.add_member(StreamMemberInt('coalesced'))
 
         self._last_call_ts = 0.0
 
@@ -201,6 +218,7 @@ class Strategy(Runnable):
         # once per second
         if now - self._last_call_ts >= 1.0:
             self._streamable.member('cpu-load').update(self._cpu_load)
+            self._streamable.member('coalesced').update(self._coalesced)
             self._streamable.push()
 
             for k, strategy_trader in self._strategy_traders.items():
@@ -256,6 +274,13 @@ class Strategy(Runnable):
     def cpu_load(self):
         return self._cpu_load
 
+    @property
+    def coalesced_signals(self):
+        """
+        Number of live market data and ticks signals merged into a pending one of the same market.
+        """
+        return self._coalesced
+
     def check_watchers(self):
         """
         Returns true if all watchers are retrieved and connected.
@@ -280,12 +305,13 @@ class Strategy(Runnable):
 
     def post_update(self):
         # load of the strategy
-        self._cpu_load = len(self._signals) / float(Strategy.MAX_SIGNALS)
+        pending = len(self._signals) + len(self._priority_signals)
+        self._cpu_load = pending / float(Strategy.MAX_SIGNALS)
 
-        # strategy must consume its signal else there is first a warning, and then some market data could be ignored
-        if len(self._signals) > Strategy.MAX_SIGNALS:
-            Terminal.inst().warning("Appliance %s has more than %s waiting signals, some market data could be ignored !" % (
-                self.name, Strategy.MAX_SIGNALS), view='debug')
+        # strategy must consume its signal else there is a warning (market data and ticks are coalesced meanwhile)
+        if pending > Strategy.MAX_SIGNALS:
+            Terminal.inst().warning("Appliance %s has more than %s waiting signals, %s coalesced market data !" % (
+                self.name, Strategy.MAX_SIGNALS, self._coalesced), view='debug')
 
         # dont waste the CPU in live mode
         if not self.service.backtesting:
@@ -324,6 +350,9 @@ class Strategy(Runnable):
         # get the related trader
         self._trader = self.trader_service.trader(self._trader_conf['name'])
 
+        # in sharded backtesting only keep the markets of this shard
+        shard = self.service.shard if self.service.backtesting else None
+
         for watcher_name, watcher_conf in self._watchers_conf.items():
             # retrieve the watcher instance
             watcher = self.watcher_service.watcher(watcher_name)
@@ -335,7 +364,10 @@ class Strategy(Runnable):
             strategy_symbols = watcher.matching_symbols_set(watcher_conf.get('symbols'), watcher.watched_instruments())
 
             # create an instrument per mapped symbol where to locally store received data
-            for symbol in strategy_symbols:
+            for symbol in sorted(strategy_symbols):
+                if shard and Strategy.shard_of(self.identifier, symbol, shard[1]) != shard[0]:
+                    continue
+
                 # mapped name into the instrument as market_id
                 mapped_instrument = self.mapped_instrument(symbol)
 
@@ -368,6 +400,8 @@ class Strategy(Runnable):
 
                         instrument.base_exchange_rate = CURRENCY_HACK.get(instrument.currency, 1.0)
 
+                        self.setup_retention(instrument)
+
                         self._instruments[mapped_symbol] = instrument
 
                         # and create the strategy-trader analyser per instrument
@@ -510,6 +544,16 @@ class Strategy(Runnable):
 
         return None
 
+    def setup_retention(self, instrument):
+        """
+        Define the retention policy of the ticks and of the candles of each timeframe of an instrument from the parameters.
+        """
+        instrument.set_retention(Instrument.TF_TICK, self.parameters.get('ticks-max-count') or 0, self.parameters.get('ticks-max-age') or 0)
+
+        for k, timeframe in self.parameters.get('timeframes', {}).items():
+            if timeframe.get('timeframe'):
+                instrument.set_retention(timeframe['timeframe'], timeframe.get('history') or 0, timeframe.get('max-age') or 0)
+
     def find_instrument(self, symbol_or_market_id):
         """
         Return instrument from its market-id or name or symbol or alias.
@@ -557,163 +601,26 @@ class Strategy(Runnable):
         Does not override this method. Internal update mecanism.
         """
         do_update = {}
-        count = 0
-
-        while self._signals:
-            signal = self._signals.popleft()
-
-            # if source of the signal is itself then it might be for backtesting
-            if signal.source == Signal.SOURCE_STRATEGY:
-                if signal.signal_type == Signal.SIGNAL_MARKET_INFO_DATA:
-                    # incoming market info when backtesting
-                    instrument = self.instrument(signal.data[0])
-                    if instrument is None:
-                        continue
-
-                    market = signal.data[1]
-
-                    if market:
-                        # in backtesting mode set the market object to the paper trader directly
-                        if self.service.backtesting:
-                            trader = self.trader_service.trader(self._trader_conf['name'])
-                            if trader:
-                                trader.set_market(market)
-
-                    # retrieve the feeder by the relating instrument market_id or symbol
-                    feeder = self._feeders.get(instrument.market_id) or self._feeders.get(instrument.symbol)
-                    if feeder:
-                        # set instrument once market data are fetched
-                        feeder.set_instrument(instrument)
-
-                elif signal.signal_type == Signal.SIGNAL_STRATEGY_TRADE_LIST:
-                    # for each trade, add the trade to the corresponding instrument sub
-                    for data in signal.data:
-                        instrument = self.find_instrument(data[0])
-                        if instrument:
-                            strategy_trader = self._strategy_traders.get(instrument)
-
-                            # instantiate the trade and add it
-                            strategy_trader.loads_trade(data[1], data[2], data[3], data[4])
-
-                elif signal.signal_type == Signal.SIGNAL_STRATEGY_TRADER_LIST:
-                    for data in signal.data:
-                        instrument = self.find_instrument(data[0])
-                        if instrument:
-                            strategy_trader = self._strategy_traders.get(instrument)
-
-                            # load strategy-trader data
-                            strategy_trader.set_activity(data[1])
-                            strategy_trader.loads(data[2], data[3])
-
-            elif signal.source == Signal.SOURCE_WATCHER:
-                if signal.signal_type == Signal.SIGNAL_TICK_DATA:
-                    # interest in tick data
-
-                    # symbol mapping
-                    instrument = self.instrument(signal.data[0])
-                    if instrument is None:
-                        continue
-
-                    # add the new candle to the instrument in live mode
-                    if instrument.ready():
-                        instrument.add_tick(signal.data[1])
-
-                    do_update[instrument] = 0
-
-                elif signal.signal_type == Signal.SIGNAL_CANDLE_DATA:
-                    # interest in candle data
 
-                    # symbol mapping
-                    instrument = self.instrument(signal.data[0])
-                    if instrument is None:
-                        continue
+        # lossless priority lane first (order, position, account)
+        while self._priority_signals:
+            self.process_signal(self._priority_signals.popleft(), do_update)
 
-                    # add the new candle to the instrument in live mode
-                    if instrument.ready():
-                        instrument.add_candle(signal.data[1])
+        # then the last market data and the pending ticks of each market
+        if self._market_slots:
+            with self._slots_mutex:
+                market_slots = self._market_slots
+                self._market_slots = {}
 
-                    if instrument not in do_update:
-                        do_update[instrument] = signal.data[1].timeframe
-                    else:
-                        do_update[instrument] = min(signal.data[1].timeframe, do_update[instrument])
-
-                elif signal.signal_type == Signal.SIGNAL_TICK_DATA_BULK:
-                    # incoming bulk of history ticks
-                    instrument = self.instrument(signal.data[0])
-                    if instrument is None:
-                        continue
-
-                    # initials ticks loaded
-                    instrument.ack_timeframe(0)
-
-                    # insert the bulk of ticks into the instrument
-                    if signal.data[1]:
-                        instrument.add_tick(signal.data[1])
-                        do_update[instrument] = 0
-
-                elif signal.signal_type == Signal.SIGNAL_CANDLE_DATA_BULK:
-                    # incoming bulk of history candles
-                    instrument = self.instrument(signal.data[0])
-                    if instrument is None:
-                        continue
-
-                    initial = instrument.ack_timeframe(signal.data[1])
-
-                    # insert the bulk of candles into the instrument
-                    if signal.data[2]:
-                        # in live mode directly add candles to instrument
-                        instrument.add_candle(signal.data[2])
-
-                        # initials candles loaded
-                        if initial:
-                            sub = self._strategy_traders.get(instrument)
-                            if sub:
-                                sub.on_received_initial_candles(signal.data[1])
-
-                        if instrument not in do_update:
-                            do_update[instrument] = signal.data[1]
-                        else:
-                            do_update[instrument] = min(signal.data[1], do_update[instrument])
-
-                elif signal.signal_type == Signal.SIGNAL_MARKET_DATA:
-                    # update market data state
-                    instrument = self.instrument(signal.data[0])
-                    if instrument is None:
-                        continue
-
-                    # update instrument data
-                    instrument.tradeable = signal.data[1]
-
-                    if signal.data[1]:
-                        instrument.last_update_time = signal.data[2]
-                        instrument.market_bid = signal.data[3]
-                        instrument.market_ofr = signal.data[4]
-
-                        instrument.base_exchange_rate = signal.data[5]
-                        instrument.vol24h_base = signal.data[8]
-                        instrument.vol24h_quote = signal.data[9]
-
-                elif signal.signal_type == Signal.SIGNAL_WATCHER_CONNECTED:
-                    # initiate the strategy prefetch initial data, only once all watchers are ready
-                    if self.check_watchers() and not self._preset:
-                        self.preset()
-
-                elif signal.signal_type == Signal.SIGNAL_WATCHER_DISCONNECTED:
-                    # do we want to clean-up and wait connection signal to reinitiate ?
-                    pass
-
-                elif Signal.SIGNAL_POSITION_OPENED <= signal.signal_type <= Signal.SIGNAL_POSITION_AMENDED:
-                    # position signal
-                    self.position_signal(signal.signal_type, signal.data)
+            for signal in market_slots.values():
+                self.process_signal(signal, do_update)
 
-                elif Signal.SIGNAL_ORDER_OPENED <= signal.signal_type <= Signal.SIGNAL_ORDER_TRADED:
-                    # trade signal
-                    self.order_signal(signal.signal_type, signal.data)
+        # then the others signals
+        count = 0
 
+        while self._signals and count < Strategy.MAX_SIGNALS_PER_UPDATE:
+            self.process_signal(self._signals.popleft(), do_update)
             count += 1
-            if count > 10:
-                # no more than 10 signals per loop
-                break
 
         # only for normal processing
         if not self.service.backtesting:
@@ -725,7 +632,7 @@ class Strategy(Runnable):
                     for instrument, tf in do_update.items():
                         if instrument.ready():
                             # parallelize jobs on works
-                            self.service.worker_pool.add_job(count_down, (self.update_strategy, (tf, instrument,)))
+                            self.service.worker_pool.add_job(count_down, (self.update_strategy, (tf, instrument,)), instrument)
 
                     # sync before continue
                     # count_down.wait()
@@ -746,6 +653,159 @@ class Strategy(Runnable):
 
         return True
 
+    def process_signal(self, signal, do_update):
+        """
+        Process a received signal.
+        @param do_update dict of the instruments to update with their smallest updated timeframe.
+        """
+        # if source of the signal is itself then it might be for backtesting
+        if signal.source == Signal.SOURCE_STRATEGY:
+            if signal.signal_type == Signal.SIGNAL_MARKET_INFO_DATA:
+                # incoming market info when backtesting
+                instrument = self.instrument(signal.data[0])
+                if instrument is None:
+                    return
+
+                market = signal.data[1]
+
+                if market:
+                    # in backtesting mode set the market object to the paper trader directly
+                    if self.service.backtesting:
+                        trader = self.trader_service.trader(self._trader_conf['name'])
+                        if trader:
+                            trader.set_market(market)
+
+                # retrieve the feeder by the relating instrument market_id or symbol
+                feeder = self._feeders.get(instrument.market_id) or self._feeders.get(instrument.symbol)
+                if feeder:
+                    # set instrument once market data are fetched
+                    feeder.set_instrument(instrument)
+
+            elif signal.signal_type == Signal.SIGNAL_STRATEGY_TRADE_LIST:
+                # for each trade, add the trade to the corresponding instrument sub
+                for data in signal.data:
+                    instrument = self.find_instrument(data[0])
+                    if instrument:
+                        strategy_trader = self._strategy_traders.get(instrument)
+
+                        # instantiate the trade and add it
+                        strategy_trader.loads_trade(data[1], data[2], data[3], data[4])
+
+            elif signal.signal_type == Signal.SIGNAL_STRATEGY_TRADER_LIST:
+                for data in signal.data:
+                    instrument = self.find_instrument(data[0])
+                    if instrument:
+                        strategy_trader = self._strategy_traders.get(instrument)
+
+                        # load strategy-trader data
+                        strategy_trader.set_activity(data[1])
+                        strategy_trader.loads(data[2], data[3])
+
+        elif signal.source == Signal.SOURCE_WATCHER:
+            if signal.signal_type == Signal.SIGNAL_TICK_DATA:
+                # interest in tick data
+
+                # symbol mapping
+                instrument = self.instrument(signal.data[0])
+                if instrument is None:
+                    return
+
+                # add the new candle to the instrument in live mode
+                if instrument.ready():
+                    instrument.add_tick(signal.data[1])
+
+                do_update[instrument] = 0
+
+            elif signal.signal_type == Signal.SIGNAL_CANDLE_DATA:
+                # interest in candle data
+
+                # symbol mapping
+                instrument = self.instrument(signal.data[0])
+                if instrument is None:
+                    return
+
+                # add the new candle to the instrument in live mode
+                if instrument.ready():
+                    instrument.add_candle(signal.data[1])
+
+                if instrument not in do_update:
+                    do_update[instrument] = signal.data[1].timeframe
+                else:
+                    do_update[instrument] = min(signal.data[1].timeframe, do_update[instrument])
+
+            elif signal.signal_type == Signal.SIGNAL_TICK_DATA_BULK:
+                # incoming bulk of history ticks
+                instrument = self.instrument(signal.data[0])
+                if instrument is None:
+                    return
+
+                # initials ticks loaded
+                instrument.ack_timeframe(0)
+
+                # insert the bulk of ticks into the instrument
+                if signal.data[1]:
+                    instrument.add_tick(signal.data[1])
+                    do_update[instrument] = 0
+
+            elif signal.signal_type == Signal.SIGNAL_CANDLE_DATA_BULK:
+                # incoming bulk of history candles
+                instrument = self.instrument(signal.data[0])
+                if instrument is None:
+                    return
+
+                initial = instrument.ack_timeframe(signal.data[1])
+
+                # insert the bulk of candles into the instrument
+                if signal.data[2]:
+                    # in live mode directly add candles to instrument
+                    instrument.add_candle(signal.data[2])
+
+                    # initials candles loaded
+                    if initial:
+                        sub = self._strategy_traders.get(instrument)
+                        if sub:
+                            sub.on_received_initial_candles(signal.data[1])
+
+                    if instrument not in do_update:
+                        do_update[instrument] = signal.data[1]
+                    else:
+                        do_update[instrument] = min(signal.data[1], do_update[instrument])
+
+            elif signal.signal_type == Signal.SIGNAL_MARKET_DATA:
+                # update market data state
+                instrument = self.instrument(signal.data[0])
+                if instrument is None:
+                    return
+
+                # update instrument data
+                instrument.tradeable = signal.data[1]
+
+                if signal.data[1]:
+                    instrument.last_update_time = signal.data[2]
+                    instrument.market_bid = signal.data[3]
+                    instrument.market_ofr = signal.data[4]
+
+                    instrument.base_exchange_rate = signal.data[5]
+                    instrument.vol24h_base = signal.data[8]
+                    instrument.vol24h_quote = signal.data[9]
+
+            elif signal.signal_type == Signal.SIGNAL_WATCHER_CONNECTED:
+                # initiate the strategy prefetch initial data, only once all watchers are ready
+                if self.check_watchers() and not self._preset:
+                    self.preset()
+
+            elif signal.signal_type == Signal.SIGNAL_WATCHER_DISCONNECTED:
+                # do we want to clean-up and wait connection signal to reinitiate ?
+                pass
+
+            elif Signal.SIGNAL_POSITION_OPENED <= signal.signal_type <= Signal.SIGNAL_POSITION_AMENDED:
+                # position signal
+                self.position_signal(signal.signal_type, signal.data)
+
+            elif Signal.SIGNAL_ORDER_OPENED <= signal.signal_type <= Signal.SIGNAL_ORDER_TRADED:
+                # trade signal
+                self.order_signal(signal.signal_type, signal.data)
+
     def update_strategy(self, tf, instrument):
         """
         Override this method to compute a strategy step per instrument.
@@ -768,6 +828,9 @@ class Strategy(Runnable):
         # retrieve the feeder by market_id or symbol
         feeder = self._feeders.get(instrument.market_id) or self._feeders.get(instrument.symbol)
 
+        # the ticks fed at this timestep are after the previous update
+        last_update_time = instrument.last_update_time
+
         # feed of candles prior equal the timestamp and update if new candles on configured timeframe
         updated = feeder.feed(timestamp)
 
@@ -780,9 +843,14 @@ class Strategy(Runnable):
                 # update the market instrument data before processing, but we does not have the exact base exchange rate
                 # so currency converted prices on backtesting are approximative even more invalids
 
-                # the feeder update the instrument price data, so use them directly
-                trader.on_update_market(instrument.market_id, True, instrument.last_update_time,
-                        instrument.market_bid, instrument.market_ofr, instrument.base_exchange_rate)
+                if updated[0] == Instrument.TF_TICK:
+                    # orders are matched at each tick of the timestep
+                    trader.on_update_market_ticks(instrument.market_id, True, instrument.ticks_after(last_update_time),
+                            instrument.base_exchange_rate)
+                else:
+                    # the feeder update the instrument price data, so use them directly
+                    trader.on_update_market(instrument.market_id, True, instrument.last_update_time,
+                            instrument.market_bid, instrument.market_ofr, instrument.base_exchange_rate)
 
         # update strategy as necessary
         if updated:
@@ -806,7 +874,7 @@ class Strategy(Runnable):
 
             for market_id, instrument in self._instruments.items():
                 # parallelize jobs on workers
-                self.service.worker_pool.add_job(count_down, (self.backtest_update_instrument, (trader, instrument, timestamp)))
+                self.service.worker_pool.add_job(count_down, (self.backtest_update_instrument, (trader, instrument, timestamp)), instrument)
 
             # sync before continue
             count_down.wait()
@@ -818,6 +886,26 @@ class Strategy(Runnable):
         # last done timestamp, to manage progression
         self._last_done_ts = timestamp
 
+    def next_backtest_timestamp(self):
+        """
+        During backtesting return the timestamp of the next data to process, or math.inf if there is no more data.
+        The backtesting clock skip the timesteps until this timestamp, because there is nothing to update.
+
+        Default implementation use the feeders. Override if backtest_update is overrided and does not use them.
+        """
+        if not self._feeders and self._instruments:
+            # unknown, no skip
+            return 0.0
+
+        self.lock()
+        timestamp = math.inf
+
+        for market_id, feeder in self._feeders.items():
+            timestamp = min(timestamp, feeder.next_timestamp())
+
+        self.unlock()
+        return timestamp
+
     def reset(self):
         # backtesting only, the last processed timestamp
         self._last_done_ts = 0
@@ -954,6 +1042,8 @@ class Strategy(Runnable):
             self.cmd_trade_history(data)
         elif command_type == Strategy.COMMAND_INFO:
             self.cmd_trader_info(data)
+        elif command_type == Strategy.COMMAND_MEMORY_INFO:
+            self.cmd_memory_info(data)
         elif command_type == Strategy.COMMAND_TRADE_ENTRY:
             self.trade_command("entry", data, self.cmd_trade_entry)
         elif command_type == Strategy.COMMAND_TRADE_EXIT:
@@ -977,6 +1067,14 @@ class Strategy(Runnable):
     # signals/slots
     #
 
+    def subscribe_signals(self):
+        """
+        Listen to the signals of the strategy service and of the followed watchers, limited to the mapped instruments
+        for the market signals.
+        """
+        self.watcher_service.subscribe(self, source_names=self._watchers_conf, market_ids=self._instruments)
+        self.service.subscribe(self, market_ids=self._instruments)
+
     def receiver(self, signal):
         """
         Notifiable listener.
@@ -1013,7 +1111,7 @@ class Strategy(Runnable):
                     return
 
             # signal of interest
-            self._signals.append(signal)
+            self.push_signal(signal)
 
         elif signal.source == Signal.SOURCE_WATCHER:
             if signal.source_name not in self._watchers_conf:
@@ -1050,18 +1148,50 @@ class Strategy(Runnable):
                     # non interested by this instrument/symbol
                     return
 
-            if len(self._signals) > Strategy.MAX_SIGNALS:
-                # if strategy message queue saturate its mostly because of market data too many update
-                # from the watcher (in live) so then ignore some of those message, the others ones are too important to be ignored
-                return
-
             # signal of interest
-            self._signals.append(signal)
+            self.push_signal(signal)
 
         elif signal.source == Signal.SOURCE_TRADER:
             if self._trader_conf and signal.source_name == self._trader_conf['name']:
                 # signal of interest
-                self._signals.append(signal)
+                self.push_signal(signal)
+
+    def push_signal(self, signal):
+        """
+        Queue a signal of interest into its lane :
+            - order, position and account signals into the lossless priority lane,
+            - live market data and order books into a slot per market where the last one wins,
+            - live ticks into a slot per market where they are batched,
+            - the others signals into the regular queue.
+        """
+        signal_type = signal.signal_type
+
+        if (Signal.SIGNAL_POSITION_OPENED <= signal_type <= Signal.SIGNAL_POSITION_AMENDED or
+                Signal.SIGNAL_ORDER_OPENED <= signal_type <= Signal.SIGNAL_ORDER_TRADED or
+                signal_type == Signal.SIGNAL_ACCOUNT_DATA):
+            self._priority_signals.append(signal)
+
+        elif signal_type in (Signal.SIGNAL_MARKET_DATA, Signal.SIGNAL_TICK_DATA, Signal.SIGNAL_ORDER_BOOK) and not self.service.backtesting:
+            key = (signal.data[0], signal_type)
+
+            with self._slots_mutex:
+                pending = self._market_slots.get(key)
+
+                if pending is None:
+                    if signal_type == Signal.SIGNAL_TICK_DATA:
+                        # a list of ticks, to batch the followings
+                        signal = Signal(signal.source, signal.source_name, signal_type, (signal.data[0], [signal.data[1]]))
+
+                    self._market_slots[key] = signal
+                else:
+                    if signal_type == Signal.SIGNAL_TICK_DATA:
+                        pending.data[1].append(signal.data[1])
+                    else:
+                        self._market_slots[key] = signal
+
+                    self._coalesced += 1
+        else:
+            self._signals.append(signal)
 
     def position_signal(self, signal_type, data):
         """
@@ -1113,30 +1243,32 @@ class Strategy(Runnable):
                 axp: average exit price
 
         @note Its implementation could be overrided but respect at the the described informations.
-        @note This method is slow, it need to go through all the strategy-trader, and look for any trades,
-            it can lock the strategy-trader trades processing, can causing global latency when having lot of markets.
+        @note The closed trades stats come from a snapshot of the journal, and the actives trades are read from a
+            copy of the list of each strategy-trader, so the strategy-traders are never locked.
         """
         results = []
         trader = self.trader()
 
+        closed = self._journal.snapshot().market_stats()
+
         for k, strategy_trader in self._strategy_traders.items():
             rate = 0.0
             trades = []
-            perf = 0.0
 
-            strategy_trader.lock()
+            market_stats = closed.get(strategy_trader.instrument.market_id, {})
 
-            perf = strategy_trader._stats['perf']
-            best = strategy_trader._stats['best']
-            worst = strategy_trader._stats['worst']
+            perf = market_stats.get('perf', 0.0)
+            best = market_stats.get('best', 0.0)
+            worst = market_stats.get('worst', 0.0)
 
-            success = len(strategy_trader._stats['success'])
-            failed = len(strategy_trader._stats['failed'])
-            roe = len(strategy_trader._stats['roe'])
+            success = market_stats.get('success', 0)
+            failed = market_stats.get('failed', 0)
+            roe = market_stats.get('roe', 0)
 
             market = trader.market(strategy_trader.instrument.market_id) if trader else None
             if market:
-                for trade in strategy_trader.trades:
+                # the list is replaced on trades deletion, a copy is enough to iterate safely
+                for trade in list(strategy_trader.trades):
                     # estimation at close price
                     if trade.direction > 0 and trade.entry_price:
                         trade_rate = (market.close_exec_price(trade.direction) - trade.entry_price) / trade.entry_price
@@ -1179,8 +1311,6 @@ class Strategy(Runnable):
 
                     rate += trade_rate or trade.pl
 
-            strategy_trader.unlock()
-
             results.append({
                 'symbol': strategy_trader.instrument.market_id,
                 'rate': rate,
@@ -2188,6 +2318,53 @@ class Strategy(Runnable):
                 disabled = [e if i%10 else e+'\n' for i, e in enumerate(disabled)]
                 Terminal.inst().info("Disabled instruments (%i): %s" % (len(disabled), " ".join(disabled)), view='content')
 
+    def cmd_memory_info(self, data):
+        """
+        Display the estimated memory usage of the ticks and candles of any or a specific instrument.
+        """
+        instruments = []
+        rows = []
+
+        self.lock()
+
+        if data.get('market-id'):
+            instrument = self.find_instrument(data['market-id'])
+            if instrument:
+                instruments.append(instrument)
+        else:
+            instruments = list(self._instruments.values())
+
+        total = 0
+
+        for instrument in instruments:
+            strategy_trader = self._strategy_traders.get(instrument)
+
+            if strategy_trader:
+                strategy_trader.lock()
+
+            usage = instrument.memory_usage()
+
+            if strategy_trader:
+                strategy_trader.unlock()
+
+            for tf, (count, size) in sorted(usage.items()):
+                max_count, max_age = instrument.retention(tf)
+
+                rows.append((instrument.market_id, timeframe_to_str(tf) if tf else "ticks", count, "%.1f" % (size / 1024.0),
+                        max_count if max_count > 0 else "-", timeframe_to_str(max_age) or max_age if max_age > 0 else "-"))
+
+                total += size
+
+        self.unlock()
+
+        Terminal.inst().notice("Memory usage for strategy %s - %s" % (self.name, self.identifier), view='content')
+
+        if rows:
+            columns = ('Market', 'TF', 'Count', 'Size(kB)', 'Max count', 'Max age')
+            Terminal.inst().info(tabulate(rows, headers=columns, tablefmt='psql', showindex=False, disable_numparse=True), view='content')
+
+        Terminal.inst().info("Total %.1f kB for %i instruments" % (total / 1024.0, len(instruments)), view='content')
+
     def cmd_strategy_trader_chart(self, strategy_trader, data):
         """
         Open as possible a process with chart of a specific sub-tader.
@@ -2255,6 +2432,36 @@ class Strategy(Runnable):
 
         return merge(default, user)
 
+    @staticmethod
+    def override_parameters(parameters, overrides):
+        """
+        Returns a copy of the parameters with the overrided values, given by a dict of dotted path : value,
+        as 'timeframes.daily.constants.rsi_low': 0.25. The missing dicts of the path are created.
+        """
+        parameters = copy.deepcopy(parameters) if parameters else {}
+
+        for path, value in overrides.items():
+            keys = path.split('.')
+            param = parameters
+
+            for key in keys[:-1]:
+                if not isinstance(param.get(key), dict):
+                    param[key] = {}
+
+                param = param[key]
+
+            param[keys[-1]] = value
+
+        return parameters
+
+    @staticmethod
+    def shard_of(appliance_id, symbol, count):
+        """
+        Shard index of a market of an appliance, from a stable hash of both, then the same in every shard process
+        and distributed over the shards whatever the number of appliances and of markets per appliance.
+        """
+        return zlib.crc32(("%s:%s" % (appliance_id, symbol)).encode('utf8')) % count
+
     @staticmethod
     def parse_parameters(parameters):
         def convert(param, key):
@@ -2296,5 +2503,13 @@ class Strategy(Runnable):
 
             convert(timeframe, 'timeframe')
             convert(timeframe, 'parent')
+            convert(timeframe, 'max-age')
+
+        # retention of the ticks (max age could be a timeframe code)
+        parameters.setdefault('ticks-max-count', 0)
+        convert(parameters, 'ticks-max-age')
+
+        # backtesting feed of the ticks by NumPy blocks
+        parameters.setdefault('backtest-batch', True)
 
         return parameters
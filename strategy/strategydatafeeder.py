@@ -3,6 +3,10 @@
 # @license Copyright (c) 2018 Dream Overflow
 # Backtesting strategy data feeder/promise
 
+import math
+
+import numpy as np
+
 from database.database import Database
 
 import logging
@@ -12,11 +16,15 @@ logger = logging.getLogger('siis.strategy.datafeeder')
 class StrategyDataFeeder(object):
     """
     Ticks and candles data feeder for strategy backtesting. It read data from specific streamer.
+
+    In batch mode the tick streamer is memory-mapped and all the ticks up to the timestamp are given
+    at once to the instrument as a NumPy block, instead of being popped one by one.
     """
 
-    def __init__(self, strategy, market_id, timeframes, ticks):
+    def __init__(self, strategy, market_id, timeframes, ticks, batch=False):
         """
         For backtesting only fetch data from database and stream them according the timestamp.
+        @param batch Feed the ticks by NumPy blocks.
         """
         self._strategy = strategy
         self._initialized = False
@@ -30,6 +38,8 @@ class StrategyDataFeeder(object):
         self._fetch_ticks = ticks
         self._tick_streamer = None
 
+        self._batch = batch
+
         self._finished = False
 
     @property
@@ -44,6 +54,10 @@ class StrategyDataFeeder(object):
     def instrument(self):
         return self._instrument
 
+    @property
+    def batch(self):
+        return self._batch
+
     def initialize(self, watcher_name, from_date, to_date):
         """
         Initialize data streamer.
@@ -52,7 +66,7 @@ class StrategyDataFeeder(object):
             self._candle_streamer[tf] = Database.inst().create_ohlc_streamer(watcher_name, self._market_id, tf, from_date=from_date, to_date=to_date)
 
         if self._fetch_ticks:
-            self._tick_streamer = Database.inst().create_tick_streamer(watcher_name, self._market_id, from_date=from_date, to_date=to_date)
+            self._tick_streamer = Database.inst().create_tick_streamer(watcher_name, self._market_id, from_date=from_date, to_date=to_date, use_mmap=self._batch)
 
         self._initialized = True
 
@@ -68,6 +82,21 @@ class StrategyDataFeeder(object):
         """Returns True if there is no more data for any timeframes."""
         return self._finished
 
+    def next_timestamp(self):
+        """
+        Timestamp of the next data to be fed (tick or closed candle), or math.inf if there is no more data.
+        """
+        timestamp = math.inf
+
+        for tf, streamer in self._candle_streamer.items():
+            if streamer is not None and not streamer.finished():
+                timestamp = min(timestamp, streamer.next_timestamp())
+
+        if self._tick_streamer and not self._tick_streamer.finished():
+            timestamp = min(timestamp, self._tick_streamer.next_timestamp())
+
+        return timestamp
+
     def feed(self, timestamp):
         """
         Feed the next candles to fill the passed timestamp, for the predefined timeframes and instrument.
@@ -101,7 +130,23 @@ class StrategyDataFeeder(object):
             finished = streamer.finished() and not candles
 
         # ticks must be ready
-        if self._tick_streamer and not self._tick_streamer.finished():
+        if self._tick_streamer and not self._tick_streamer.finished() and self._batch:
+            # batch version, a single block of ticks given as it to the instrument
+            ticks = self._tick_streamer.next_array(timestamp)
+
+            if len(ticks):
+                # zero-copy 2d view of the (t, b, o, v) records
+                self._instrument.add_tick_array(ticks.view(np.float64).reshape(-1, 4))
+                updated.append(0)
+
+                # defines the last market price (prefer at tick if we have candles and ticks)
+                self.instrument.last_update_time = float(ticks['t'][-1])
+                self.instrument.market_bid = float(ticks['b'][-1])
+                self.instrument.market_ofr = float(ticks['o'][-1])
+
+            finished = self._tick_streamer.finished()
+
+        elif self._tick_streamer and not self._tick_streamer.finished():
             # ticks = self._tick_streamer.next(timestamp)
 
             # if ticks:
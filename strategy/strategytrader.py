@@ -450,15 +450,10 @@ class StrategyTrader(object):
                     rate = trade.profit_loss  # realized profit/loss
 
                     # fee rate for entry and exit
-                    if trade._stats['entry-maker']:
-                        rate -= market.maker_fee
-                    else:
-                        rate -= market.taker_fee
+                    fees = market.maker_fee if trade._stats['entry-maker'] else market.taker_fee
+                    fees += market.maker_fee if trade._stats['exit-maker'] else market.taker_fee
 
-                    if trade._stats['exit-maker']:
-                        rate -= market.maker_fee
-                    else:
-                        rate -= market.taker_fee
+                    rate -= fees
 
                     # estimed commission fee rate (futur, stocks)
                     # @todo
@@ -499,6 +494,11 @@ class StrategyTrader(object):
                         'c': trade.get_conditions()
                     }
 
+                    self.strategy.journal.append(
+                        self.instrument.market_id, trade.id, trade.direction, trade.entry_open_time,
+                        trade.exit_open_time or self.strategy.timestamp, trade.entry_price, trade.exit_price,
+                        trade.exec_entry_qty, fees, rate)
+
                     if rate < 0:
                         self._stats['failed'].append(record)
                     elif rate > 0:
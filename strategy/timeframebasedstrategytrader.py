@@ -3,8 +3,6 @@
 # @license Copyright (c) 2018 Dream Overflow
 # Timeframe base strategy trader. 
 
-import copy
-
 from terminal.terminal import Terminal
 
 from strategy.strategy import Strategy
@@ -12,7 +10,7 @@ from strategy.strategytrader import StrategyTrader
 from strategy.strategysignal import StrategySignal
 
 from instrument.instrument import Instrument, Candle
-from instrument.candlegenerator import CandleGenerator
+from instrument.candlegenerator import CandleCascade
 
 from monitor.streamable import Streamable, StreamMemberInt, StreamMemberFloatTuple, StreamMemberTradeList, StreamMemberFloatScatter
 
@@ -24,8 +22,8 @@ class TimeframeBasedStrategyTrader(StrategyTrader):
     """
     Timeframe base strategy trader base class.
     Sub timeframe object must be based on TimeframeBasedSub.
-    It support the generation of the candles from tick level,
-    or from another candle timeframe with chained generation (cascaded).
+    It support the generation of the candles from tick level, or from the base candle timeframe,
+    with chained generation (cascaded) of the timeframes in a single pass.
 
     But you want either process at a close of a candle, or at any new price (base timeframe).
     Cascaded scheme could only give signals on
@@ -47,7 +45,7 @@ class TimeframeBasedStrategyTrader(StrategyTrader):
         self._wait_next_update = wait_next_update
 
         self.timeframes = {}  # analyser per timeframe
-        self.tfs_chain = []
+        self._candles_cascade = None
 
     @property
     def base_timeframe(self):
@@ -65,22 +63,37 @@ class TimeframeBasedStrategyTrader(StrategyTrader):
         if sub:
             sub.init_candle_generator()
 
+    def candles_cascade(self):
+        """
+        Cascaded candles generator of the timeframes, created at the first use. Each sub continue to use its
+        own generator through the cascade, keeping its current candle.
+        """
+        if self._candles_cascade is None:
+            self._candles_cascade = CandleCascade(self.base_timeframe, self.timeframes.keys())
+
+            for tf, sub in self.timeframes.items():
+                generator = self._candles_cascade.generator(tf)
+                if generator is None:
+                    continue
+
+                if sub.candles_gen and sub.candles_gen.current:
+                    generator.current = sub.candles_gen.current
+
+                sub.candles_gen = generator
+
+        return self._candles_cascade
+
     def gen_candles_from_ticks(self, timestamp):
         """
-        Generate the news candles from ticks.
+        Generate the news candles from ticks, any timeframes in a single pass.
         """
         self.lock()
 
-        # at tick we update any timeframes because we want the non consolidated candle
-        for tf, sub in self.timeframes.items():
-            # update at tick
-            ticks = self.instrument.ticks_after(sub.candles_gen.last_timestamp)
-
-            generated = sub.candles_gen.generate_from_ticks(ticks)
-            if generated:
-                self.instrument.add_candle(generated, sub.history)
+        cascade = self.candles_cascade()
+        ticks = self.instrument.ticks_after(cascade.last_timestamp)
 
-            self.instrument.add_candle(copy.copy(sub.candles_gen.current), sub.history)  # with the non consolidated
+        # at tick we update any timeframes because we want the non consolidated candle
+        self._add_cascaded_candles(cascade.generate_from_ticks(ticks))
 
         # no longer need them
         self.instrument.clear_ticks()
@@ -89,78 +102,28 @@ class TimeframeBasedStrategyTrader(StrategyTrader):
 
     def gen_candles_from_candles(self, timestamp):
         """
-        Generate the news candles from the same base of candle.
+        Generate the news candles from the candles of the base timeframe, any timeframes in a single pass.
         """
         self.lock()
 
-        # at tick we update any timeframes because we want the non consolidated candle
-        for tf, sub in self.timeframes.items():
-            # update at candle timeframe
-            candles = self.instrument.candles_after(sub.sub_tf, sub.candles_gen.last_timestamp)
+        cascade = self.candles_cascade()
+        candles = self.instrument.candles_after(self.base_timeframe, cascade.last_timestamp)
 
-            generated = sub.candles_gen.generate_from_candles(candles)
-            if generated:
-                self.instrument.add_candle(generated, sub.history)
-
-            self.instrument.add_candle(copy.copy(sub.candles_gen.current), sub.history)  # with the non consolidated
+        self._add_cascaded_candles(cascade.generate_from_candles(candles))
 
         self.unlock()
 
-    # def gen_candles_chain(self, tfs_chain, tf, timestamp):
-    #     """
-    #     Generate the news candles from candles of the low timeframe and from ticks.
-
-    #     @param tfs_chain A chain of timeframe value, its a dict with key the from timeframe,
-    #         and the value the target timeframe. The last key must have a None value to stop the chain.
-
-    #     @param tf The chain must begin with tf.
-    #     @deprecated Prefered way is using the min defined common timeframe for every generated timeframe
-    #     """
-    #     self.lock()
-
-    #      if not self.tfs_chain and self.timeframes:
-    #          for k, timeframe in self.timeframes.items():
-    #              self.tfs_chain[timeframe.timeframe] = 
-
-    #     # update candle chain
-    #     next_tf = tf
-
-    #     if tf == 0:
-    #         sub = self.timeframes.get(0)
-    #         if sub:
-    #             # first level of candle from ticks
-    #             ticks = self.instrument.ticks_after(sub.candles_gen.last_timestamp)
-
-    #             generated = sub.candles_gen.generate_from_ticks(ticks)
-    #             if generated:
-    #                 self.instrument.add_candle(generated, sub.history)
-
-    #             self.instrument.add_candle(copy.copy(sub.candles_gen.current), sub.history)  # with the non consolidated
+    def _add_cascaded_candles(self, results):
+        for tf, generated, current in results:
+            sub = self.timeframes.get(tf)
+            if not sub:
+                continue
 
-    #         # no longer need them
-    #         self.instrument.clear_ticks()
-
-    #         next_tf = tfs_chain.get(0)
-
-    #     # update candle chain from its precedecessor
-    #     while next_tf:
-    #         sub = self.timeframes.get(next_tf)
-    #         if not sub:
-    #             break
-
-    #         # update at candle timeframe
-    #         candles = self.instrument.candles_after(sub.sub_tf, sub.candles_gen.last_timestamp)
-
-    #         generated = sub.candles_gen.generate_from_candles(candles)
-    #         if generated:
-    #             self.instrument.add_candle(generated, sub.history)
-
-    #         self.instrument.add_candle(copy.copy(sub.candles_gen.current), sub.history)  # with the non consolidated
-
-    #         # next timeframe to generate or None
-    #         next_tf = tfs_chain.get(next_tf)
+            if generated:
+                self.instrument.add_candle(generated, sub.history)
 
-    #     self.unlock()
+            if current:
+                self.instrument.add_candle(current, sub.history)  # with the non consolidated
 
     def compute(self, timeframe, timestamp):
         """
@@ -0,0 +1,200 @@
+# @date 2019-06-24
+# @author Frederic SCHERMA
+# @license Copyright (c) 2019 Dream Overflow
+# Columnar journal of the closed trades of an appliance, and vectorized performance statistics.
+
+import threading
+
+import numpy as np
+
+import logging
+logger = logging.getLogger('siis.strategy.tradejournal')
+
+
+class TradeJournal(object):
+    """
+    Append-only journal of the closed trades of an appliance, with a numpy array per column.
+
+    The arrays grow by doubling, and a row is never modified once appended, so a snapshot is made of read-only
+    views on the filled part of the current arrays, without copy. The stats are then computed from a snapshot
+    without locking the journal, neither the strategy-traders.
+
+    Only the append and the snapshot creation are locked, by the journal own lock.
+    """
+
+    COLUMNS = (
+        ('market', np.int32),         # index of the market id into the markets list
+        ('id', np.int64),             # trade identifier
+        ('direction', np.int8),       # 1 long, -1 short
+        ('entry_time', np.float64),   # entry order opened timestamp
+        ('exit_time', np.float64),    # exit order opened timestamp, or the time of the recording
+        ('entry_price', np.float64),  # average entry price
+        ('exit_price', np.float64),   # average exit price
+        ('quantity', np.float64),     # executed entry quantity
+        ('fees', np.float64),         # entry and exit fees rate
+        ('rate', np.float64))         # realized profit/loss rate, fees deducted
+
+    INITIAL_SIZE = 256
+
+    def __init__(self):
+        self._mutex = threading.Lock()
+
+        self._markets = []       # market ids by index
+        self._market_index = {}  # market id : index
+
+        self._size = 0
+        self._columns = {name: np.zeros(TradeJournal.INITIAL_SIZE, dtype=dtype) for name, dtype in TradeJournal.COLUMNS}
+
+    def __len__(self):
+        return self._size
+
+    def append(self, market_id, trade_id, direction, entry_time, exit_time, entry_price, exit_price, quantity, fees, rate):
+        with self._mutex:
+            market = self._market_index.get(market_id)
+            if market is None:
+                market = self._market_index[market_id] = len(self._markets)
+                self._markets.append(market_id)
+
+            i = self._size
+
+            if i >= len(self._columns['id']):
+                # new arrays, the previous ones are possibly referenced by some snapshots
+                self._columns = {name: np.concatenate((col, np.zeros(len(col), dtype=col.dtype))) for name, col in self._columns.items()}
+
+            row = (market, trade_id, direction, entry_time, exit_time, entry_price, exit_price, quantity, fees, rate)
+
+            for (name, dtype), value in zip(TradeJournal.COLUMNS, row):
+                self._columns[name][i] = value or 0
+
+            self._size = i + 1
+
+    def snapshot(self):
+        """
+        @return TradeJournalSnapshot of the trades appended until now.
+        """
+        with self._mutex:
+            columns = {}
+
+            for name, col in self._columns.items():
+                view = col[:self._size]
+                view.flags.writeable = False
+                columns[name] = view
+
+            return TradeJournalSnapshot(list(self._markets), columns)
+
+
+class TradeJournalSnapshot(object):
+    """
+    Immutable view on the trades of a journal. Picklable, and can be merged with the snapshots of the others
+    shards of a backtesting.
+    """
+
+    __slots__ = '_markets', '_columns'
+
+    def __init__(self, markets, columns):
+        self._markets = markets
+        self._columns = columns
+
+    def __len__(self):
+        return len(self._columns['id'])
+
+    def __getitem__(self, name):
+        return self._columns[name]
+
+    @property
+    def markets(self):
+        return self._markets
+
+    @staticmethod
+    def merge(snapshots):
+        """
+        Merge many snapshots into a single, with a common markets list.
+        """
+        market_index = {}
+        parts = {name: [] for name, dtype in TradeJournal.COLUMNS}
+
+        for snapshot in snapshots:
+            # index of the markets of the snapshot into the merged markets list
+            remap = np.array([market_index.setdefault(market_id, len(market_index)) for market_id in snapshot.markets], dtype=np.int32)
+
+            for name, dtype in TradeJournal.COLUMNS:
+                parts[name].append(remap[snapshot[name]] if name == 'market' and len(snapshot) else snapshot[name])
+
+        columns = {name: np.concatenate(parts[name]) if parts[name] else np.zeros(0, dtype=dtype) for name, dtype in TradeJournal.COLUMNS}
+
+        return TradeJournalSnapshot(list(market_index.keys()), columns)
+
+    def stats(self):
+        """
+        Global performance statistics of the trades :
+            count: int number of trades
+            success, failed, roe: int number of trades in profit, in loss, or at zero
+            win-rate: float success / count
+            perf: float sum of the profit/loss rates
+            avg: float mean profit/loss rate
+            best, worst: float best and worst profit/loss rate
+            max-drawdown: float greatest fall of the cumulated profit/loss rate, in exit time order
+            sharpe: float mean / standard deviation of the profit/loss rates (per trade, not annualized)
+        """
+        rates = self._columns['rate']
+        count = len(rates)
+
+        if not count:
+            return {
+                'count': 0, 'success': 0, 'failed': 0, 'roe': 0, 'win-rate': 0.0, 'perf': 0.0, 'avg': 0.0,
+                'best': 0.0, 'worst': 0.0, 'max-drawdown': 0.0, 'sharpe': 0.0
+            }
+
+        success = int(np.count_nonzero(rates > 0.0))
+        failed = int(np.count_nonzero(rates < 0.0))
+
+        # drawdown of the cumulated rates, from an initial zero
+        cumulated = np.cumsum(rates[np.argsort(self._columns['exit_time'], kind='stable')])
+        peaks = np.maximum.accumulate(np.maximum(cumulated, 0.0))
+
+        std = rates.std(ddof=1) if count > 1 else 0.0
+
+        return {
+            'count': count,
+            'success': success,
+            'failed': failed,
+            'roe': count - success - failed,
+            'win-rate': success / count,
+            'perf': float(rates.sum()),
+            'avg': float(rates.mean()),
+            'best': max(float(rates.max()), 0.0),
+            'worst': min(float(rates.min()), 0.0),
+            'max-drawdown': float((peaks - cumulated).max()),
+            'sharpe': float(rates.mean() / std) if std > 0.0 else 0.0
+        }
+
+    def market_stats(self):
+        """
+        Per market statistics, as a dict of market id : dict with count, success, failed, roe, perf, best, worst.
+        As for the strategy-trader stats the best is at least 0 and the worst at most 0.
+        """
+        n = len(self._markets)
+
+        market = self._columns['market']
+        rates = self._columns['rate']
+
+        count = np.bincount(market, minlength=n)
+        success = np.bincount(market, weights=rates > 0.0, minlength=n).astype(np.int64)
+        failed = np.bincount(market, weights=rates < 0.0, minlength=n).astype(np.int64)
+        perf = np.bincount(market, weights=rates, minlength=n)
+
+        best = np.zeros(n)
+        worst = np.zeros(n)
+
+        np.maximum.at(best, market, rates)
+        np.minimum.at(worst, market, rates)
+
+        return {market_id: {
+            'count': int(count[i]),
+            'success': int(success[i]),
+            'failed': int(failed[i]),
+            'roe': int(count[i] - success[i] - failed[i]),
+            'perf': float(perf[i]),
+            'best': float(best[i]),
+            'worst': float(worst[i])
+        } for i, market_id in enumerate(self._markets)}
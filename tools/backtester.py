@@ -0,0 +1,273 @@
+# @date 2019-06-14
+# @author Frederic SCHERMA
+# @license Copyright (c) 2019 Dream Overflow
+# Sharded backtesting tools, distribute the markets of the appliances over many processes
+
+import sys
+import time
+import queue
+import logging
+import traceback
+import multiprocessing
+
+from tabulate import tabulate
+
+from terminal.terminal import Terminal
+from database.database import Database
+from strategy.tradejournal import TradeJournalSnapshot
+
+logger = logging.getLogger('siis.tools.backtester')
+
+
+def run_backtest(options, collect):
+    """
+    Run a headless backtesting into the current process until its end, and returns the result of collect.
+    The services are terminated before returning.
+
+    @param collect Callable receiving the strategy service once the backtesting is done.
+    @return The result of collect or None on error.
+    """
+    # only import here, the services are created in the backtesting process
+    from watcher.service import WatcherService
+    from trader.service import TraderService
+    from strategy.service import StrategyService
+    from monitor.service import MonitorService
+
+    LOOP_SLEEP = 0.016  # in second
+
+    watcher_service = None
+    trader_service = None
+    strategy_service = None
+
+    result = None
+
+    try:
+        monitor_service = MonitorService(options)
+
+        Database.create(options)
+        Database.inst().setup(options)
+
+        watcher_service = WatcherService(options)
+        watcher_service.start()
+
+        trader_service = TraderService(watcher_service, monitor_service, options)
+        trader_service.start()
+
+        watcher_service.add_listener(trader_service)
+
+        strategy_service = StrategyService(watcher_service, trader_service, monitor_service, options)
+        strategy_service.start()
+
+        watcher_service.add_listener(strategy_service)
+        trader_service.add_listener(strategy_service)
+
+        while not strategy_service.backtest_finished:
+            watcher_service.sync()
+            trader_service.sync()
+            strategy_service.sync()
+
+            time.sleep(LOOP_SLEEP)
+
+        if strategy_service.backtest_failed:
+            raise Exception("Backtesting failed")
+
+        result = collect(strategy_service)
+
+    except Exception as e:
+        logger.error(repr(e))
+        logger.error(traceback.format_exc())
+
+        result = None
+
+    if strategy_service:
+        strategy_service.terminate()
+    if trader_service:
+        trader_service.terminate()
+    if watcher_service:
+        watcher_service.terminate()
+
+    Database.terminate()
+
+    return result
+
+
+def collect_stats(strategy_service):
+    """
+    Stats, trades history and trade journal snapshot of each appliance.
+    """
+    stats = {}
+
+    for appl in strategy_service.get_appliances():
+        stats[appl.identifier] = {
+            'stats': appl.get_stats(),
+            'history': appl.get_history_stats(),
+            'journal': appl.journal.snapshot()
+        }
+
+    return stats
+
+
+def run_shard(options, index, count, barrier, next_times, results):
+    """
+    Shard process entry point. Run a headless backtesting limited to the markets of the shard, then
+    put the stats of each appliance into the results queue.
+
+    Each shard have its own services and paper traders, and only exchange the timestep barrier (with the timestamp
+    of its next data, to skip together the empty timesteps) and its results.
+
+    @param index Shard index from 0 to count-1.
+    @param barrier multiprocessing.Barrier waited by each shard after each timestep.
+    @param next_times multiprocessing.Array of 2 x count doubles, to exchange the next data timestamp of each shard.
+    @param results multiprocessing.Queue receiving a tuple (index, {appliance-id: {'stats', 'history', 'journal'}} or None on error).
+    """
+    options = dict(options)
+    options['shard'] = (index, count)
+    options['shard-barrier'] = barrier
+    options['shard-next-times'] = next_times
+
+    stats = run_backtest(options, collect_stats)
+
+    if stats is None:
+        # don't let the others shards waiting forever
+        barrier.abort()
+
+    results.put((index, stats))
+
+
+def merge_results(shards_results):
+    """
+    Merge the results of the shards per appliance. A market is processed by a single shard, then the
+    per market stats are simply gathered, the trades history is ordered by entry time, and the trade journals are
+    concatenated.
+    """
+    merged = {}
+
+    for index, appliances in sorted(shards_results.items()):
+        for appliance_id, data in appliances.items():
+            appliance = merged.setdefault(appliance_id, {'stats': [], 'history': [], 'journal': []})
+
+            appliance['stats'].extend(data['stats'])
+            appliance['history'].extend(data['history'])
+            appliance['journal'].append(data['journal'])
+
+    for appliance_id, appliance in merged.items():
+        appliance['stats'].sort(key=lambda r: r['symbol'])
+        appliance['history'].sort(key=lambda t: t['ts'])
+        appliance['journal'] = TradeJournalSnapshot.merge(appliance['journal'])
+
+    return merged
+
+
+def format_results(appliance_id, results):
+    """
+    Table of the merged per market stats of an appliance, with a total row.
+    """
+    columns = ('Market', 'P/L(%)', 'Perf(%)', 'Best(%)', 'Worst(%)', 'Success', 'Failed', 'ROE')
+    data = []
+
+    pl_sum = perf_sum = best_sum = worst_sum = 0.0
+    success_sum = failed_sum = roe_sum = 0
+
+    for r in results:
+        if r['perf'] == 0.0 and not r['trades'] and not (r['success'] or r['failed'] or r['roe']):
+            continue
+
+        data.append((r['symbol'], "%.2f" % (r['rate']*100.0), "%.2f" % (r['perf']*100.0), "%.2f" % (r['best']*100.0),
+                "%.2f" % (r['worst']*100.0), r['success'], r['failed'], r['roe']))
+
+        pl_sum += r['rate']
+        perf_sum += r['perf']
+        best_sum = max(best_sum, r['best'])
+        worst_sum = min(worst_sum, r['worst'])
+        success_sum += r['success']
+        failed_sum += r['failed']
+        roe_sum += r['roe']
+
+    data.append(('Total', "%.2f" % (pl_sum*100.0), "%.2f" % (perf_sum*100.0), "%.2f" % (best_sum*100.0),
+            "%.2f" % (worst_sum*100.0), success_sum, failed_sum, roe_sum))
+
+    return tabulate(data, headers=columns, tablefmt='psql', showindex=False, disable_numparse=True)
+
+
+def format_journal(journal):
+    """
+    One line summary of the overall performance of the closed trades of an appliance.
+    """
+    stats = journal.stats()
+
+    return "Win-rate %.2f%%, Avg %.2f%%, Max-drawdown %.2f%%, Sharpe %.3f (per trade)" % (
+        stats['win-rate']*100.0, stats['avg']*100.0, stats['max-drawdown']*100.0, stats['sharpe'])
+
+
+def do_backtester(options, siis_logger):
+    """
+    Sharded backtesting. Spawn a process per shard, each one running the configured appliances on a subset of
+    the markets, synchronized by a barrier at each timestep. Once done display the merged results.
+    """
+    count = options.get('shards', 1)
+
+    Terminal.inst().info("Starting SIIS sharded backtesting using %s processes..." % count)
+    Terminal.inst().flush()
+
+    barrier = multiprocessing.Barrier(count)
+    next_times = multiprocessing.Array('d', 2 * count, lock=False)
+    results = multiprocessing.Queue()
+
+    processes = []
+
+    for index in range(0, count):
+        process = multiprocessing.Process(name="backtest-%i" % index, target=run_shard, args=(options, index, count, barrier, next_times, results))
+        process.start()
+
+        processes.append(process)
+
+    shards_results = {}
+    failed = False
+
+    while len(shards_results) < count:
+        try:
+            index, stats = results.get(timeout=1.0)
+        except queue.Empty:
+            if all(process.is_alive() for i, process in enumerate(processes) if i not in shards_results):
+                continue
+
+            # a shard process exited, a last chance for a result posted just before
+            try:
+                index, stats = results.get(timeout=1.0)
+            except queue.Empty:
+                # shard process died without result (crash, killed), release and stop the others shards
+                failed = True
+
+                barrier.abort()
+
+                for process in processes:
+                    if process.is_alive():
+                        process.terminate()
+
+                break
+
+        if stats is None:
+            failed = True
+            stats = {}
+
+        shards_results[index] = stats
+
+        Terminal.inst().info("Shard %i/%i done" % (index+1, count))
+        Terminal.inst().flush()
+
+    for process in processes:
+        process.join()
+
+    if failed:
+        Terminal.inst().error("At least one shard failed, results are partials !")
+
+    for appliance_id, appliance in merge_results(shards_results).items():
+        Terminal.inst().message("Appliance %s, %i closed trades :" % (appliance_id, len(appliance['history'])))
+        Terminal.inst().message(format_results(appliance_id, appliance['stats']))
+        Terminal.inst().message(format_journal(appliance['journal']))
+
+    Terminal.inst().info("Backtesting done!")
+    Terminal.inst().flush()
+
+    Terminal.terminate()
+    sys.exit(0 if not failed else -1)
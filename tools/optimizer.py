@@ -3,17 +3,312 @@
 # @license Copyright (c) 2018 Dream Overflow
 # Siis standard implementation of the application (application main)
 
+import os
 import sys
+import random
 import logging
-import traceback
+import itertools
+import multiprocessing
+
+import numpy as np
+
+from datetime import datetime
+
+from tabulate import tabulate
 
 from common.utils import UTC, TIMEFRAME_FROM_STR_MAP
 
 from terminal.terminal import Terminal
 from database.database import Database
+from database.tickstorage import TickStreamer
+from database.ohlcstorage import OhlcStreamer
+from database.optimizer import TickOptimizer, MarketHours
+from config import utils
+
+logger = logging.getLogger('siis.tools.optimizer')
+
+
+def sweep_values(spec):
+    """
+    Values of a parameter for a grid sweep, a list of values, or a tuple (start, stop, step) with stop included.
+    """
+    if isinstance(spec, tuple) and len(spec) == 3:
+        start, stop, step = spec
+        count = int(round((stop - start) / step)) + 1
+
+        if all(isinstance(x, int) for x in spec):
+            return [start + i * step for i in range(count)]
+
+        return [round(start + i * step, 10) for i in range(count)]
+
+    return list(spec) if isinstance(spec, (list, tuple)) else [spec]
+
+
+def sweep_draw(rnd, spec):
+    """
+    Draw a value of a parameter for a random sweep, by choice into a list, or uniformly into a tuple (low, high).
+    """
+    if isinstance(spec, tuple) and len(spec) == 2:
+        low, high = spec
+
+        if isinstance(low, int) and isinstance(high, int):
+            return rnd.randint(low, high)
+
+        return rnd.uniform(low, high)
+
+    return rnd.choice(spec) if isinstance(spec, list) else spec
+
+
+def sweep_combinations(sweep):
+    """
+    List of the dicts of dotted path : value to test, from the grid or random search space of the sweep.
+    """
+    parameters = sweep.get('parameters', {})
+    paths = list(parameters.keys())
+
+    if sweep.get('mode', 'grid') == 'random':
+        rnd = random.Random(sweep.get('seed'))
+        return [{path: sweep_draw(rnd, parameters[path]) for path in paths} for i in range(sweep.get('samples', 10))]
+
+    return [dict(zip(paths, values)) for values in itertools.product(*(sweep_values(parameters[path]) for path in paths))]
+
+
+def preload_market_data(options, timeframe):
+    """
+    Read once the memory-mapped tick or OHLC files of the markets over the backtesting range, to have them into the
+    page cache, shared by the backtesting processes which map the same files.
+
+    @return Number of preloaded bytes.
+    """
+    PAGE_SIZE = 4096
+    STEP = 7*24*60*60  # one week of ticks per block
+
+    if not options.get('broker') or not options.get('market'):
+        return 0
+
+    from_date = options['from']
+    to_date = options['to']
+
+    total = 0
+
+    for market_id in options['market'].split(','):
+        if timeframe == 0:
+            streamer = TickStreamer(options['markets-path'], options['broker'], market_id, from_date, to_date, use_mmap=True)
+            timestamp = from_date.timestamp()
+
+            while not streamer.finished() and timestamp < to_date.timestamp():
+                timestamp += STEP
+                ticks = streamer.next_array(timestamp)
+
+                if len(ticks):
+                    # touch a byte per page
+                    ticks.view(np.uint8)[::PAGE_SIZE].sum()
+                    total += ticks.nbytes
+
+            streamer.close()
+        else:
+            streamer = OhlcStreamer(options['markets-path'], options['broker'], market_id, timeframe, from_date, to_date)
+            ohlcs = streamer.next_array(to_date.timestamp() + timeframe)
+
+            if len(ohlcs):
+                ohlcs.view(np.uint8)[::PAGE_SIZE].sum()
+                total += ohlcs.nbytes
+
+            streamer.close()
+
+    return total
+
+
+def run_sweep(args):
+    """
+    Sweep process entry point. Run a headless backtesting with the overrided parameters of the appliance.
+
+    @param args Tuple (options, appliance id, index of the run, dict of the overrided parameters).
+    @return Tuple (index, trade journal stats of the appliance or None on error).
+    """
+    from tools.backtester import run_backtest
+
+    options, appliance_id, index, overrides = args
+
+    options = dict(options)
+    options['parameters-overrides'] = {appliance_id: overrides}
+
+    def collect(strategy_service):
+        appl = strategy_service.appliance(appliance_id)
+        return appl.journal.snapshot().stats() if appl else None
+
+    return index, run_backtest(options, collect)
+
+
+def rank_sweep(sweep, combinations, results):
+    """
+    Ranked list of (combination, stats), the failed runs last.
+    """
+    key = sweep.get('rank', 'perf')
+    sign = 1.0 if key == 'max-drawdown' else -1.0  # lesser drawdown is better, else greater is better
+
+    ranked = [(combinations[index], stats) for index, stats in sorted(results.items(), key=lambda r: r[0])]
+    ranked.sort(key=lambda r: (r[1] is None, sign * r[1].get(key, 0.0) if r[1] else 0.0))
+
+    return ranked
+
+
+def format_sweep(sweep, ranked):
+    """
+    Table of the ranked results of a sweep, a column per swept parameter.
+    """
+    paths = list(sweep.get('parameters', {}).keys())
+
+    columns = ['#'] + paths + ['Trades', 'Win-rate(%)', 'Perf(%)', 'Avg(%)', 'Max-DD(%)', 'Sharpe']
+    data = []
+
+    for i, (combination, stats) in enumerate(ranked):
+        row = [str(i+1)] + [str(combination[path]) for path in paths]
+
+        if stats is None:
+            row += ['failed', '-', '-', '-', '-', '-']
+        else:
+            row += [str(stats['count']), "%.2f" % (stats['win-rate']*100.0), "%.2f" % (stats['perf']*100.0),
+                    "%.2f" % (stats['avg']*100.0), "%.2f" % (stats['max-drawdown']*100.0), "%.3f" % stats['sharpe']]
+
+        data.append(row)
+
+    return tabulate(data, headers=columns, tablefmt='psql', showindex=False, disable_numparse=True)
+
+
+def do_sweep(options, siis_logger):
+    """
+    Parameters sweep. Backtest the profile for each combination of the search space of the sweep, distributed over
+    a pool of processes, and write the results table ranked by the configured key.
+    """
+    sweep_name = options['sweep']
+    sweep = utils.sweeps(options.get('config-path')).get(sweep_name)
+
+    if not sweep or not sweep.get('appliance'):
+        siis_logger.error("Unknown or invalid sweep %s" % sweep_name)
+        sys.exit(-1)
+
+    timeframe = -1
+
+    if options.get('timeframe'):
+        if options['timeframe'] in TIMEFRAME_FROM_STR_MAP:
+            timeframe = TIMEFRAME_FROM_STR_MAP[options['timeframe']]
+        else:
+            try:
+                timeframe = int(options['timeframe'])
+            except:
+                pass
+
+    combinations = sweep_combinations(sweep)
+    workers = options.get('workers') or os.cpu_count() or 1
+
+    Terminal.inst().info("Starting SIIS optimizer sweep %s, %i runs using %i processes..." % (sweep_name, len(combinations), workers))
+    Terminal.inst().flush()
+
+    if timeframe >= 0:
+        size = preload_market_data(options, timeframe)
+        Terminal.inst().info("Preloaded %.1f MB of market data" % (size / (1024.0*1024.0)))
+        Terminal.inst().flush()
+
+    # each run is a backtesting in paper-mode
+    options = dict(options)
+    options['backtesting'] = True
+    options['paper-mode'] = True
+
+    args = [(options, sweep['appliance'], index, combination) for index, combination in enumerate(combinations)]
+    results = {}
+
+    # a new process per run, the services are not reused
+    pool = multiprocessing.Pool(processes=workers, maxtasksperchild=1)
+
+    try:
+        for index, stats in pool.imap_unordered(run_sweep, args):
+            results[index] = stats
+
+            if stats is None:
+                Terminal.inst().error("Run %i/%i failed" % (len(results), len(combinations)))
+            else:
+                Terminal.inst().info("Run %i/%i done, %i trades, perf %.2f%%" % (len(results), len(combinations), stats['count'], stats['perf']*100.0))
+
+            Terminal.inst().flush()
+    finally:
+        pool.terminate()
+        pool.join()
+
+    table = format_sweep(sweep, rank_sweep(sweep, combinations, results))
+
+    pathname = '/'.join((options.get('reports-path', '.'), "sweep-%s-%s.txt" % (sweep_name, datetime.now().astimezone(UTC()).strftime('%Y%m%d-%H%M%S'))))
+
+    try:
+        with open(pathname, 'w') as f:
+            f.write(table)
+            f.write('\n')
+    except Exception as e:
+        siis_logger.error(repr(e))
+
+    Terminal.inst().message("Sweep %s ranked by %s :" % (sweep_name, sweep.get('rank', 'perf')))
+    Terminal.inst().message(table)
+    Terminal.inst().info("Results written to %s" % pathname)
+
+    Terminal.inst().info("Optimization done!")
+    Terminal.inst().flush()
+
+    Terminal.terminate()
+    sys.exit(0)
+
+
+def format_ticks_report(reports, gaps):
+    """
+    Tables of the processed tick files and of the detected gaps.
+    """
+    def fmt(timestamp):
+        return datetime.utcfromtimestamp(timestamp).strftime('%Y-%m-%d %H:%M:%S')
+
+    files = tabulate([(r['month'], r['count'], r['invalid'], r['duplicates'], 'yes' if r['unsorted'] else '',
+            'yes' if r['truncated'] else '', 'yes' if r['rewritten'] else '') for r in reports],
+            headers=('Month', 'Ticks', 'Invalid', 'Duplicates', 'Unsorted', 'Truncated', 'Rewritten'),
+            tablefmt='psql', showindex=False, disable_numparse=True)
+
+    gaps = tabulate([(fmt(g[0]), fmt(g[1]), "%.1f" % (g[2] / 3600.0)) for g in gaps],
+            headers=('From (UTC)', 'To (UTC)', 'Open hours'), tablefmt='psql', showindex=False, disable_numparse=True)
+
+    return files, gaps
+
+
+def optimize_ticks(options, broker_id, market_id, market_hours, siis_logger):
+    """
+    Validate, sort and de-duplicate the tick files of a market, update its index and write the gaps report.
+    """
+    Terminal.inst().info("Optimizing ticks of %s..." % market_id)
+    Terminal.inst().flush()
+
+    optimizer = TickOptimizer(options['markets-path'], broker_id, market_id, options.get('from'), options.get('to'),
+            market_hours, options.get('max-gap', 3600.0))
+
+    reports = optimizer.optimize()
+    gaps = optimizer.detect_gaps()
+
+    files, gaps_table = format_ticks_report(reports, gaps)
+
+    pathname = '/'.join((options.get('reports-path', '.'), "ticks-%s-%s.txt" % (broker_id, market_id)))
+
+    try:
+        with open(pathname, 'w') as f:
+            f.write("Processed files :\n%s\n\nGaps :\n%s\n" % (files, gaps_table))
+    except Exception as e:
+        siis_logger.error(repr(e))
+
+    rewritten = sum(1 for r in reports if r['rewritten'])
+
+    Terminal.inst().info("%s : %i files verified, %i rewritten, %i gaps, report written to %s" % (
+        market_id, len(reports), rewritten, len(gaps), pathname))
+    Terminal.inst().flush()
 
 
 def do_optimizer(options, siis_logger):
+    if options.get('sweep'):
+        return do_sweep(options, siis_logger)
+
     Terminal.inst().info("Starting SIIS optimizer...")
     Terminal.inst().flush()
 
@@ -41,8 +336,14 @@ def do_optimizer(options, siis_logger):
 
     if timeframe == 0:
         # tick
-        pass
-        # @todo 
+        try:
+            market_hours = MarketHours.preset(options.get('market-hours'))
+        except ValueError as e:
+            siis_logger.error(str(e))
+            sys.exit(-1)
+
+        for market_id in options['market'].split(','):
+            optimize_ticks(options, broker_id, market_id, market_hours, siis_logger)
     else:
         # ohlc
         pass
@@ -75,7 +75,7 @@ class BinanceTrader(Trader):
         self._ready = False
 
         if self._watcher:
-            self.service.watcher_service.add_listener(self)
+            self.subscribe_watcher()
 
         self.unlock()
 
@@ -88,7 +88,7 @@ class BinanceTrader(Trader):
         self.lock()
 
         if self._watcher:
-            self.service.watcher_service.remove_listener(self)
+            self.unsubscribe_watcher()
             self._watcher = None
             self._ready = False
 
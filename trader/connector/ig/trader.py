@@ -70,7 +70,7 @@ class IGTrader(Trader):
         self._watcher = self.service.watcher_service.watcher(self._name)
 
         if self._watcher:
-            self.service.watcher_service.add_listener(self)
+            self.subscribe_watcher()
 
         self.unlock()
 
@@ -83,7 +83,7 @@ class IGTrader(Trader):
         self.lock()
 
         if self._watcher:
-            self.service.watcher_service.remove_listener(self)
+            self.unsubscribe_watcher()
             self._watcher = None
 
         self.unlock()
@@ -0,0 +1,222 @@
+# @date 2019-06-22
+# @author Frederic SCHERMA
+# @license Copyright (c) 2019 Dream Overflow
+# Paper trader matching engine of the limit/stop/take-profit orders of a market.
+
+import math
+import bisect
+
+import numpy as np
+
+from trader.order import Order
+from trader.position import Position
+
+import logging
+logger = logging.getLogger('siis.trader.papertrader.matching')
+
+
+class TriggerBook(object):
+    """
+    Orders sorted by trigger price, triggered by a price moving up (greater or equal to the trigger price)
+    or down (lesser or equal to the trigger price).
+
+    The prices are kept into a sorted array, with the orders into a parallel array, so the triggered orders are
+    a prefix (up) or a suffix (down) found by a binary search. At same price the first inserted comes first.
+    """
+
+    __slots__ = '_up', '_prices', '_orders'
+
+    def __init__(self, up):
+        self._up = up
+        self._prices = []
+        self._orders = []
+
+    def __len__(self):
+        return len(self._prices)
+
+    def add(self, price, order):
+        i = bisect.bisect_right(self._prices, price)
+
+        self._prices.insert(i, price)
+        self._orders.insert(i, order)
+
+    def remove(self, price, order):
+        i = bisect.bisect_left(self._prices, price)
+        n = len(self._prices)
+
+        while i < n and self._prices[i] == price:
+            if self._orders[i] is order:
+                del self._prices[i]
+                del self._orders[i]
+                return True
+
+            i += 1
+
+        return False
+
+    @property
+    def threshold(self):
+        """
+        Less aggressive price triggering at least an order, or +inf (up) -inf (down) if empty.
+        """
+        if not self._prices:
+            return math.inf if self._up else -math.inf
+
+        return self._prices[0] if self._up else self._prices[-1]
+
+    def crossed(self, price):
+        """
+        Returns the list of (trigger price, order) triggered by the price, from the most to the less aggressive.
+        """
+        if self._up:
+            # triggered when price >= trigger, lowest triggers first
+            n = bisect.bisect_right(self._prices, price)
+            return list(zip(self._prices[:n], self._orders[:n]))
+        else:
+            # triggered when price <= trigger, highest triggers first
+            n = bisect.bisect_left(self._prices, price)
+            return list(zip(reversed(self._prices[n:]), reversed(self._orders[n:])))
+
+
+class MatchingEngine(object):
+    """
+    Matching engine of the resting orders of a market, with a trigger book per side (buy orders are triggered by the
+    ofr price, sell orders by the bid price) and per crossing direction. A price update only visits the triggered
+    orders, in O(log n) plus the number of triggered orders.
+
+    - limit buy, take-profit buy : ofr <= price
+    - limit sell, take-profit sell : bid >= price
+    - stop buy : ofr >= price
+    - stop sell : bid <= price
+
+    Once triggered a stop-limit or take-profit-limit order becomes a limit order at its order price.
+    The matched orders are not removed, the trader removes them once completed, then a partially filled limit order
+    continues to be matched at the next price updates.
+
+    Not thread safe.
+    """
+
+    __slots__ = '_market_id', '_buy_down', '_buy_up', '_sell_up', '_sell_down', '_entries', '_armed', '_version'
+
+    def __init__(self, market_id):
+        self._market_id = market_id
+
+        self._buy_down = TriggerBook(False)  # triggered by ofr <= price
+        self._buy_up = TriggerBook(True)     # triggered by ofr >= price
+        self._sell_up = TriggerBook(True)    # triggered by bid >= price
+        self._sell_down = TriggerBook(False) # triggered by bid <= price
+
+        self._entries = {}  # order id : (book, price)
+        self._armed = set()  # id of the triggered stop-limit and take-profit-limit orders
+        self._version = 0    # incremented at each added order
+
+    @property
+    def market_id(self):
+        return self._market_id
+
+    def __len__(self):
+        return len(self._entries)
+
+    @property
+    def version(self):
+        """
+        Changes each time an order is added (or armed), then the trigger thresholds could be more aggressive.
+        """
+        return self._version
+
+    def has_order(self, order_id):
+        return order_id in self._entries
+
+    def add(self, order):
+        """
+        Add a resting order, or return False if its type is not supported (market) or if it has no price.
+        """
+        if order.order_type == Order.ORDER_MARKET:
+            return False
+
+        if order.order_type == Order.ORDER_LIMIT or order.order_id in self._armed:
+            price = order.order_price
+            book = self._buy_down if order.direction == Position.LONG else self._sell_up
+
+        elif order.order_type in (Order.ORDER_STOP, Order.ORDER_STOP_LIMIT):
+            price = order.trigger_price or order.order_price
+            book = self._buy_up if order.direction == Position.LONG else self._sell_down
+
+        elif order.order_type in (Order.ORDER_TAKE_PROFIT, Order.ORDER_TAKE_PROFIT_LIMIT):
+            price = order.trigger_price or order.order_price
+            book = self._buy_down if order.direction == Position.LONG else self._sell_up
+
+        else:
+            return False
+
+        if not price:
+            return False
+
+        self.remove(order)
+
+        book.add(price, order)
+        self._entries[order.order_id] = (book, price)
+
+        self._version += 1
+
+        return True
+
+    def remove(self, order):
+        entry = self._entries.pop(order.order_id, None)
+        if entry is None:
+            return False
+
+        self._armed.discard(order.order_id)
+
+        return entry[0].remove(entry[1], order)
+
+    def crossing(self, bids, ofrs):
+        """
+        Returns the boolean mask of the bid and ofr prices arrays triggering at least one order, to only match at
+        these prices. Null prices are ignored.
+        """
+        if not self._entries:
+            return np.zeros(len(bids), dtype=bool)
+
+        buys = (ofrs <= self._buy_down.threshold) | (ofrs >= self._buy_up.threshold)
+        sells = (bids >= self._sell_up.threshold) | (bids <= self._sell_down.threshold)
+
+        return (buys & (ofrs > 0.0)) | (sells & (bids > 0.0))
+
+    def match(self, bid, ofr):
+        """
+        Returns the list of (order, execution price) of the orders executable at this bid/ofr prices.
+        The limit orders are executed at their price or better (lesser ofr for a buy, greater bid for a sell),
+        and the stop and take-profit orders at market.
+        """
+        if not self._entries:
+            return []
+
+        # first arm the triggered stop-limit and take-profit-limit, as limit orders
+        if ofr:
+            self.__arm(self._buy_up.crossed(ofr) + self._buy_down.crossed(ofr))
+
+        if bid:
+            self.__arm(self._sell_down.crossed(bid) + self._sell_up.crossed(bid))
+
+        results = []
+
+        if ofr:
+            for price, order in self._buy_down.crossed(ofr) + self._buy_up.crossed(ofr):
+                results.append((order, min(price, ofr) if self.__is_limit(order) else ofr))
+
+        if bid:
+            for price, order in self._sell_up.crossed(bid) + self._sell_down.crossed(bid):
+                results.append((order, max(price, bid) if self.__is_limit(order) else bid))
+
+        return results
+
+    def __is_limit(self, order):
+        return order.order_type == Order.ORDER_LIMIT or order.order_id in self._armed
+
+    def __arm(self, crossed):
+        for price, order in crossed:
+            if order.order_type in (Order.ORDER_STOP_LIMIT, Order.ORDER_TAKE_PROFIT_LIMIT) and order.order_id not in self._armed:
+                self.remove(order)
+                self._armed.add(order.order_id)
+                self.add(order)
@@ -9,6 +9,8 @@ import copy
 import base64
 import uuid
 
+import numpy as np
+
 from datetime import datetime
 
 from notifier.notifiable import Notifiable
@@ -17,6 +19,8 @@ from notifier.signal import Signal
 from trader.trader import Trader
 
 from .account import PaperTraderAccount
+from .matching import MatchingEngine
+from .valuation import AccountValuation
 from trader.position import Position
 from trader.order import Order
 from trader.asset import Asset
@@ -98,7 +102,6 @@ class PaperTraderHistory(object):
     @todo generate/call signal for order and position (create, update, delete, reject, cancel) but how to manage them because if strategy listen from watcher ?
     @todo distinct multiple position of single per instrument and hedging mode.
     @todo add signals emit for position opened/update/closed
-    @todo execution of limit order on price not as now as market with limit price (but for now it works because of the strategy ask for the ofr price and small volume)
     @todo with limit order lock the qty of the asset
     @todo check available margin when creating margin order
     @todo Best/worst are made for margin on account currency, but need to be updated to work with asset
@@ -262,21 +265,32 @@ class PaperTrader(Trader):
     Only for simulation paper trader.
     In backtesting market data are set manually using method set_market(...).
 
+    The market orders are executed immediately. The limit, stop and take-profit orders are resting into a matching
+    engine per market, and executed at the market updates that cross their trigger price (@see MatchingEngine).
+    If the watcher publishes the order book of the market the fills are limited to its liquidity, then partial,
+    else the orders are fully filled once triggered.
+
     @todo support of slippage will need a list of order, and to process in update time, and need a tick level or order book data.
-    @note ORDER_STOP_LIMIT and ORDER_TAKE_PROFIT_LIMIT orders are not implemented at this time
     """
 
+    WATCHER_SIGNALS = Trader.WATCHER_SIGNALS + (Signal.SIGNAL_ORDER_BOOK,)
+
     def __init__(self, service, name="papertrader.siis"):
         super().__init__(name, service)
 
         self._spreads = {}  # spread per market
         self._slippage = 0  # slippage in ticks (not supported for now)
 
+        self._matching = {}   # matching engine of the resting orders per market
+        self._liquidity = {}  # last order book (bids, asks) as lists of [price, size] per market
+
         self._watcher = None  # in backtesting refers to a dummy watcher
 
         self._history = PaperTraderHistory(self)  # trades history for reporting
         self._account = PaperTraderAccount(self)
 
+        self._valuation = AccountValuation(self)  # incremental balance, margin and profit/loss
+
     @property
     def paper_mode(self):
         return True
@@ -307,7 +321,7 @@ class PaperTrader(Trader):
         self._watcher = self.service.watcher_service.watcher(self._name)
 
         if self._watcher:
-            self.service.watcher_service.add_listener(self)
+            self.subscribe_watcher()
 
         self.unlock()
 
@@ -320,7 +334,7 @@ class PaperTrader(Trader):
         self.lock()
 
         if self._watcher:
-            self.service.watcher_service.remove_listener(self)
+            self.unsubscribe_watcher()
             self._watcher = None
 
         self.unlock()
@@ -416,51 +430,33 @@ class PaperTrader(Trader):
         super().update()
 
         #
-        # update positions (margin trading)
+        # remove empty positions (margin trading)
         #
 
         if self._positions:
-            rm_list = []
-
             self.lock()
 
-            for k, position in self._positions.items():
-                if position.quantity <= 0.0:
-                    rm_list.append(k)
-                else:
-                    market = self._markets.get(position.symbol)
-                    if market:
-                        # update profit/loss of each position
-                        position.update_profit_loss(market)
+            rm_list = [k for k, position in self._positions.items() if position.quantity <= 0.0]
 
             for rm in rm_list:
-                # remove empty positions
                 del self._positions[rm]
 
             self.unlock()
 
         #
-        # update account balance and margin
+        # update account balance and margin, only the contributions of the assets and positions affected since the
+        # last update are recomputed (@see AccountValuation)
         #
 
         if self._account.account_type == PaperTraderAccount.TYPE_MARGIN:
             # margin account type
-            used_margin = 0
-            profit_loss = 0
-
             self.lock()
 
             self._account.update(None)
+            self._valuation.update_positions()
 
-            for k, position in self._positions.items():
-                market = self._markets.get(position.symbol)
-                
-                # only for non empty positions
-                if market and position.quantity > 0.0:
-                    # manually compute here because of paper trader
-                    if self._account.account_type == PaperTraderAccount.TYPE_MARGIN:
-                        profit_loss += position.profit_loss_market / market.base_exchange_rate
-                        used_margin += position.margin_cost(market) / market.base_exchange_rate
+            used_margin = self._valuation.used_margin
+            profit_loss = self._valuation.position_profit_loss
 
             self.unlock()
 
@@ -469,109 +465,14 @@ class PaperTrader(Trader):
 
         elif self._account.account_type == PaperTraderAccount.TYPE_ASSET:
             # assets account type
-            balance = 0.0
-            margin_balance = 0.0
-            profit_loss = 0.0
-
             self.lock()
 
             self._account.update(None)
+            self._valuation.update_assets()
 
-            for k, asset in self._assets.items():
-                asset_name = asset.symbol
-                free = asset.free
-                locked = asset.locked
-
-                if free or locked:
-                    # asset price in quote
-                    if asset_name == self._account.alt_currency:
-                        # asset second currency
-                        market = self._markets.get(self._account.currency+self._account.alt_currency)
-                        base_price = 1.0 / market.price if market else 1.0
-                    elif asset_name != self._account.currency:
-                        # any asset except asscount currency
-                        market = self._markets.get(asset_name+self._account.currency)
-                        base_price = market.price if market else 1.0
-                    else:
-                        # asset account currency itself
-                        base_price = 1.0
-
-                    if asset.quote == self._account.alt_currency:
-                        # change from alt currency to primary currency
-                        market = self._markets.get(self._account.currency+self._account.alt_currency)
-                        base_exchange_rate = market.price if market else 1.0
-                    elif asset.quote == self._account.currency:
-                        # asset is account currency not change
-                        base_exchange_rate = 1.0
-                    else:
-                        # change from quote to primary currency
-                        market = self._markets.get(asset.quote+self._account.currency)
-                        base_exchange_rate = 1.0 / market.price if market else 1.0
-
-                    balance += free * base_price + locked * base_price  # current total free+locked balance
-                    margin_balance += free * base_price                 # current total free balance
-
-                    # current profit/loss at market
-                    profit_loss += asset.profit_loss_market / base_exchange_rate  # current total P/L in primary account currency
-
-            self.account.set_balance(balance)
-            self.account.set_margin_balance(margin_balance)
-            self.account.set_unrealized_profit_loss(profit_loss)
-
-            self.unlock()
-
-        #
-        # limit/trigger orders executions
-        #
-
-        if self._orders:
-            self.lock()
-
-            # simulation of slippage on orders
-            # @todo
-
-            # simulate liquidation of positions
-            # but its complicated... depends of the broker strategy and lot of things so for now let negate
-
-            for k, order in self._orders.items():
-                if order.order_type == Order.ORDER_LIMIT:
-                    market = self._markets.get(order.symbol)
-                    if market is None:
-                        continue
-
-                    if market.trade == market.TRADE_BUY_SELL:
-                        self.__limit_buy_sell(order, market)
-                    elif market.trade == market.TRADE_MARGIN:
-                        self.__limit_margin(order, market)
-                    elif market.trade == market.TRADE_IND_MARGIN:
-                        # @todo might me be more specific to indivisible position
-                        self.__limit_margin(order, market)
-
-                elif order.order_type == Order.ORDER_TAKE_PROFIT_LIMIT:
-                    market = self._markets.get(order.symbol)
-                    if market is None:
-                        continue
-
-                    if market.trade == market.TRADE_BUY_SELL:
-                        self.__take_profit_buy_sell(order, market)
-                    elif market.trade == market.TRADE_MARGIN:
-                        self.__take_profit_margin(order, market)
-                    elif market.trade == market.TRADE_IND_MARGIN:
-                        # @todo might me be more specific to indivisible position
-                        self.__take_profit_margin(order, market)
-
-                elif order.order_type == Order.ORDER_STOP_LIMIT:
-                    market = self._markets.get(order.symbol)
-                    if market is None:
-                        continue
-
-                    if market.trade == market.TRADE_BUY_SELL:
-                        self.__stop_limit_buy_sell(order, market)
-                    elif market.trade == market.TRADE_MARGIN:
-                        self.__stop_limit_margin(order, market)
-                    elif market.trade == market.TRADE_IND_MARGIN:
-                        # @todo might me be more specific to indivisible position
-                        self.__stop_limit_margin(order, market)
+            self.account.set_balance(self._valuation.balance)
+            self.account.set_margin_balance(self._valuation.margin_balance)
+            self.account.set_unrealized_profit_loss(self._valuation.asset_profit_loss)
 
             self.unlock()
 
@@ -582,6 +483,7 @@ class PaperTrader(Trader):
 
         self.lock()
         self._assets[asset_name] = asset
+        self._valuation.asset_updated(asset_name)
         self.unlock()
 
     def create_order(self, order):
@@ -646,6 +548,10 @@ class PaperTrader(Trader):
                 self.name, notional, market.min_notional, order.symbol, order.order_id))
             return False
 
+        if order.order_type != Order.ORDER_MARKET:
+            # limit, stop and take-profit orders are resting until matched
+            return self.__rest_order(order, market)
+
         if self._slippage > 0.0:
             # @todo
             return False
@@ -675,19 +581,21 @@ class PaperTrader(Trader):
         if not self._activity:
             return False
 
-        result = False
-
         self.lock()
-        if order_id in self._orders:
-            del self._orders[order_id]
-            result = True
+        order = self._orders.pop(order_id, None)
+
+        if order is not None:
+            matching = self._matching.get(order.symbol)
+            if matching:
+                matching.remove(order)
         self.unlock()
 
-        if result:
+        if order is not None:
             # signal of canceled order
             self.service.watcher_service.notify(Signal.SIGNAL_ORDER_CANCELED, self.name, (order.symbol, order.order_id, ""))
+            return True
 
-        return result
+        return False
 
     def close_position(self, position_id, market=True, limit_price=None):
         if not self._activity:
@@ -725,17 +633,12 @@ class PaperTrader(Trader):
 
             market = self.market(order.symbol)
 
-            bid_price = 0
-            ofr_price = 0
-
             if order.order_type == Order.ORDER_LIMIT:
-                # @todo limit execution when limit reach bid or ofr price (depend of the direction)
-                bid_price = order.order_price
-                ofr_price = order.order_price
+                # resting until matched
+                return self.__rest_order(order, market)
 
-            elif order.order_type == Order.ORDER_MARKET:
-                bid_price = market.bid
-                ofr_price = market.ofr
+            bid_price = market.bid
+            ofr_price = market.ofr
 
             # open long are executed on bid and short on ofr, close the inverse
             if order.direction == Position.LONG:
@@ -842,25 +745,35 @@ class PaperTrader(Trader):
 
         super().on_update_market(market_id, tradable, last_update_time, bid, ofr, base_exchange_rate, contract_size, value_per_pip, vol24h_base, vol24h_quote)
 
-        # update positions profit/loss for the related market id
-        market = self.market(market_id)
+        market = self.__update_profit_loss(market_id)
 
-        # market must be valid and currently tradeable
-        if market is None:
+        if market is not None:
+            # execute the resting orders crossed by the new prices
+            self.__match_orders(market)
+
+    def on_update_market_ticks(self, market_id, tradable, ticks, base_exchange_rate):
+        """
+        Backtesting update of a market from the ticks of a timestep. The resting orders are matched at each tick,
+        and without order book their fills are limited to the volume of the ticks.
+        """
+        if not len(ticks):
             return
 
-        self.lock()
+        last_update_time, bid, ofr = ticks[-1][0], ticks[-1][1], ticks[-1][2]
 
-        # update profit/loss (informational) for each asset
-        for k, asset in self._assets.items():
-            if asset.symbol == market.base and asset.quote == market.quote:
-                asset.update_profit_loss(market)
+        super().on_update_market(market_id, tradable, last_update_time, bid, ofr, base_exchange_rate)
 
-        # update profit/loss for each positions
-        for k, position in self._positions.items():
-            if position.symbol == market.market_id:
-                position.update_profit_loss(market)
+        market = self.__update_profit_loss(market_id)
+
+        if market is not None:
+            self.__match_ticks(market, ticks)
 
+    def on_order_book(self, market_id, bids, asks):
+        """
+        Keep the last order book of the market, to limit the fills to its liquidity.
+        """
+        self.lock()
+        self._liquidity[market_id] = ([list(level) for level in bids], [list(level) for level in asks])
         self.unlock()
 
     #
@@ -881,6 +794,36 @@ class PaperTrader(Trader):
     # protected
     #
 
+    def __update_profit_loss(self, market_id):
+        """
+        Update the profit/loss of the assets and positions of a market after a price update.
+        @return The market or None if unknown.
+        """
+        market = self.market(market_id)
+
+        # market must be valid and currently tradeable
+        if market is None:
+            return None
+
+        self.lock()
+
+        # update profit/loss (informational) of the asset of the market
+        asset = self._assets.get(market.base)
+        if asset and asset.quote == market.quote:
+            asset.update_profit_loss(market)
+
+        # the related assets or positions will be revalued at the next update
+        self._valuation.market_updated(market_id)
+
+        # update profit/loss for each positions
+        for k, position in self._positions.items():
+            if position.symbol == market.market_id:
+                position.update_profit_loss(market)
+
+        self.unlock()
+
+        return market
+
     def __get_or_add_asset(self, asset_name, precision=8):
         if asset_name in self._assets:
             return self._assets[asset_name]
@@ -904,6 +847,7 @@ class PaperTrader(Trader):
                 asset.add_market_id(market.market_id)
 
         self._assets[asset_name] = asset
+        self._valuation.asset_updated(asset_name)
 
         return asset
 
@@ -918,13 +862,16 @@ class PaperTrader(Trader):
              => more complicated, could close a position easy case, if not forced position first we have to cut/reduce 
                 position that are in the opposite direction
         """
-        order_id =  "siis_" + base64.b64encode(uuid.uuid4().bytes).decode('utf8').rstrip('=\n')
+        order_id = order.order_id or self.__new_order_id()
 
         current_position = None
         positions = []
 
         self.lock()
 
+        # the positions of the market will be revalued at the next update
+        self._valuation.market_updated(order.symbol)
+
         if order.position_id:
             # @todo if TRADE_IND_MARGIN do we have position_id == market_id ?
             current_position = self._positions.get(order.position_id)
@@ -1001,7 +948,7 @@ class PaperTrader(Trader):
                     return False
 
                 # still in long, position size increase and adjust the entry price
-                entry_price = ((current_position.entry_price * current_position.quantity) + (open_exec_price * order.quantity)) / 2
+                entry_price = ((current_position.entry_price * current_position.quantity) + (open_exec_price * order.quantity)) / (current_position.quantity + order.quantity)
                 current_position.entry_price = entry_price
                 current_position.quantity += order.quantity
 
@@ -1139,7 +1086,7 @@ class PaperTrader(Trader):
             }
 
             # signal as watcher service (opened + fully traded qty)
-            self.service.watcher_service.notify(Signal.SIGNAL_ORDER_OPENED, self.name, (order.symbol, order_data, order.ref_order_id))
+            self.__order_signal(Signal.SIGNAL_ORDER_OPENED, order, order_data)
 
             order_data = {
                 'id': order.order_id,
@@ -1162,7 +1109,7 @@ class PaperTrader(Trader):
                 'commission-asset': self.account.currency
             }
 
-            self.service.watcher_service.notify(Signal.SIGNAL_ORDER_TRADED, self.name, (order.symbol, order_data, order.ref_order_id))
+            self.__order_signal(Signal.SIGNAL_ORDER_TRADED, order, order_data)
 
             #
             # position signal
@@ -1200,7 +1147,7 @@ class PaperTrader(Trader):
                 self.service.watcher_service.notify(Signal.SIGNAL_POSITION_UPDATED, self.name, (order.symbol, position_data, order.ref_order_id))
 
             # and then deleted order
-            self.service.watcher_service.notify(Signal.SIGNAL_ORDER_DELETED, self.name, (order.symbol, order.order_id, ""))
+            self.__order_signal(Signal.SIGNAL_ORDER_DELETED, order)
 
             # if position is empty -> closed -> delete it
             if current_position.quantity <= 0.0:
@@ -1251,8 +1198,8 @@ class PaperTrader(Trader):
 
             account_currency = self.account.currency
 
-            # long are open on ofr and short on bid
-            position.entry_price = market.open_exec_price(order.direction)
+            # long are open on ofr and short on bid, or at the limit price
+            position.entry_price = open_exec_price
             # logger.debug("el" if position.direction==0 else "es", position.entry_price, market.bid, market.ofr, market.bid < market.ofr)
 
             # transaction time is creation position date time
@@ -1300,7 +1247,7 @@ class PaperTrader(Trader):
             }
 
             # signal as watcher service (opened + fully traded qty)
-            self.service.watcher_service.notify(Signal.SIGNAL_ORDER_OPENED, self.name, (order.symbol, order_data, order.ref_order_id))
+            self.__order_signal(Signal.SIGNAL_ORDER_OPENED, order, order_data)
 
             order_data = {
                 'id': order.order_id,
@@ -1324,7 +1271,7 @@ class PaperTrader(Trader):
             }
 
             #logger.info("%s %s %s" % (position.entry_price, position.quantity, order.direction))
-            self.service.watcher_service.notify(Signal.SIGNAL_ORDER_TRADED, self.name, (order.symbol, order_data, order.ref_order_id))
+            self.__order_signal(Signal.SIGNAL_ORDER_TRADED, order, order_data)
 
             #
             # position signal
@@ -1345,7 +1292,7 @@ class PaperTrader(Trader):
             self.service.watcher_service.notify(Signal.SIGNAL_POSITION_OPENED, self.name, (order.symbol, position_data, order.ref_order_id))
 
             # and then deleted order
-            self.service.watcher_service.notify(Signal.SIGNAL_ORDER_DELETED, self.name, (order.symbol, order.order_id, ""))
+            self.__order_signal(Signal.SIGNAL_ORDER_DELETED, order)
 
         return result
 
@@ -1356,7 +1303,7 @@ class PaperTrader(Trader):
         result = False
 
         # more unique id
-        order_id =  "siis_" + base64.b64encode(uuid.uuid4().bytes).decode('utf8').rstrip('=\n')
+        order_id = order.order_id or self.__new_order_id()
 
         self.lock()
 
@@ -1435,7 +1382,7 @@ class PaperTrader(Trader):
             }
 
             # signal as watcher service (opened + full traded qty and immediately deleted)
-            self.service.watcher_service.notify(Signal.SIGNAL_ORDER_OPENED, self.name, (order.symbol, order_data, order.ref_order_id))
+            self.__order_signal(Signal.SIGNAL_ORDER_OPENED, order, order_data)
 
             order_data = {
                 'id': order.order_id,
@@ -1457,8 +1404,8 @@ class PaperTrader(Trader):
                 'commission-asset': commission_asset
             }
 
-            self.service.watcher_service.notify(Signal.SIGNAL_ORDER_TRADED, self.name, (order.symbol, order_data, order.ref_order_id))
-            self.service.watcher_service.notify(Signal.SIGNAL_ORDER_DELETED, self.name, (order.symbol, order.order_id, ""))
+            self.__order_signal(Signal.SIGNAL_ORDER_TRADED, order, order_data)
+            self.__order_signal(Signal.SIGNAL_ORDER_DELETED, order)
 
         elif order.direction == Position.SHORT:
             # sell
@@ -1539,7 +1486,7 @@ class PaperTrader(Trader):
             }
 
             # signal as watcher service (opened + fully traded qty and immediately deleted)
-            self.service.watcher_service.notify(Signal.SIGNAL_ORDER_OPENED, self.name, (order.symbol, order_data, order.ref_order_id))
+            self.__order_signal(Signal.SIGNAL_ORDER_OPENED, order, order_data)
 
             order_data = {
                 'id': order.order_id,
@@ -1561,8 +1508,8 @@ class PaperTrader(Trader):
                 'commission-asset': commission_asset
             }
 
-            self.service.watcher_service.notify(Signal.SIGNAL_ORDER_TRADED, self.name, (order.symbol, order_data, order.ref_order_id))
-            self.service.watcher_service.notify(Signal.SIGNAL_ORDER_DELETED, self.name, (order.symbol, order.order_id, ""))
+            self.__order_signal(Signal.SIGNAL_ORDER_TRADED, order, order_data)
+            self.__order_signal(Signal.SIGNAL_ORDER_DELETED, order)
 
         return result
 
@@ -1663,46 +1610,205 @@ class PaperTrader(Trader):
         if market:
             asset.update_profit_loss(market)
 
+        self._valuation.asset_updated(asset.symbol)
+
         return quote_price * trade_qty
 
-    def __limit_buy_sell(self, order, market):
-        if order.direction == Position.LONG:
-            pass  # @todo
+    def __new_order_id(self):
+        return "siis_" + base64.b64encode(uuid.uuid4().bytes).decode('utf8').rstrip('=\n')
 
-        elif order.direction == Position.SHORT:
-            pass  # @todo
+    def __order_signal(self, signal_type, order, order_data=None):
+        """
+        Notify an order signal. For a fill of a resting order, the opened signal was notified at its creation, the
+        traded signal reports the cumulative filled quantity, and the deleted signal is only notified once completed.
+        """
+        resting = self._orders.get(order.order_id)
 
-    def __limit_margin(self, order, market):
-        if order.direction == Position.LONG:
-            pass  # @todo
+        if resting is not None and resting is not order:
+            if signal_type == Signal.SIGNAL_ORDER_OPENED:
+                return
 
-        elif order.direction == Position.SHORT:
-            pass  # @todo
+            if signal_type == Signal.SIGNAL_ORDER_TRADED:
+                order_data['quantity'] = resting.quantity
+                order_data['cumulative-filled'] = resting.executed
 
-    def __take_profit_buy_sell(self, order, market):
-        if order.direction == Position.LONG:
-            pass  # @todo
+            elif signal_type == Signal.SIGNAL_ORDER_DELETED and resting.executed < resting.quantity:
+                return
 
-        elif order.direction == Position.SHORT:
-            pass  # @todo
+        if signal_type == Signal.SIGNAL_ORDER_DELETED:
+            self.service.watcher_service.notify(signal_type, self.name, (order.symbol, order.order_id, ""))
+        else:
+            self.service.watcher_service.notify(signal_type, self.name, (order.symbol, order_data, order.ref_order_id))
 
-    def __take_profit_margin(self, order, market):
-        if order.direction == Position.LONG:
-            pass  # @todo
+    def __rest_order(self, order, market):
+        """
+        Insert a limit, stop or take-profit order into the matching engine of its market, and execute it if it is
+        already crossed by the current prices.
+        """
+        self.lock()
 
-        elif order.direction == Position.SHORT:
-            pass  # @todo
+        matching = self._matching.get(order.symbol)
+        if matching is None:
+            matching = self._matching[order.symbol] = MatchingEngine(order.symbol)
 
-    def __stop_limit_buy_sell(self, order, market):
-        if order.direction == Position.LONG:
-            pass  # @todo
+        order.set_order_id(self.__new_order_id())
+        order.created_time = self.timestamp
 
-        elif order.direction == Position.SHORT:
-            pass  # @todo
+        if not matching.add(order):
+            self.unlock()
 
-    def __stop_limit_margin(self, order, market):
-        if order.direction == Position.LONG:
-            pass  # @todo
+            logger.error("Trader %s refuse order without price %s in order %s" % (self.name, order.symbol, order.ref_order_id))
+            return False
 
-        elif order.direction == Position.SHORT:
-            pass  # @todo
+        self._orders[order.order_id] = order
+
+        self.unlock()
+
+        order_data = {
+            'id': order.order_id,
+            'symbol': order.symbol,
+            'type': order.order_type,
+            'direction': order.direction,
+            'timestamp': order.created_time,
+            'quantity': order.quantity,
+            'order-price': order.order_price,
+            'stop-price': order.trigger_price or order.order_price,
+            'stop-loss': order.stop_loss,
+            'take-profit': order.take_profit,
+            'time-in-force': order.time_in_force
+        }
+
+        self.service.watcher_service.notify(Signal.SIGNAL_ORDER_OPENED, self.name, (order.symbol, order_data, order.ref_order_id))
+
+        self.__match_orders(market)
+
+        return True
+
+    def __match_orders(self, market, volume=None):
+        """
+        Execute the resting orders of the market crossed by its current prices, limited to the liquidity of the last
+        order book if any (consumed by the fills), else to the volume if given (consumed by the fills too).
+        """
+        matching = self._matching.get(market.market_id)
+        if not matching:
+            return
+
+        self.lock()
+        matches = matching.match(market.bid, market.ofr)
+        liquidity = self._liquidity.get(market.market_id)
+        self.unlock()
+
+        for order, exec_price in matches:
+            quantity = order.quantity - order.executed
+
+            if liquidity is not None:
+                # buy on the asks, sell on the bids, levels at the execution price or better
+                levels = liquidity[1] if order.direction == Position.LONG else liquidity[0]
+                quantity = min(quantity, self.__consume(levels, exec_price, order.direction, quantity))
+
+            elif volume is not None:
+                quantity = min(quantity, volume)
+                volume -= quantity
+
+            if quantity > 0.0:
+                self.__fill_order(order, market, exec_price, quantity)
+
+    def __match_ticks(self, market, ticks):
+        """
+        Execute the resting orders of the market crossed by the ticks, in order. Only the ticks triggering at least
+        an order are visited, found at once for the remaining ticks each time an order is added or armed.
+        A null tick volume is considered as unknown and does not limit the fills.
+
+        @param ticks List of tuples or 2d array of (timestamp, bid, ofr, volume).
+        """
+        matching = self._matching.get(market.market_id)
+        if not matching:
+            return
+
+        ticks = np.asarray(ticks, dtype=np.float64)
+
+        # restored once done
+        last_update_time, bid, ofr = market.last_update_time, market.bid, market.ofr
+
+        i = 0
+        n = len(ticks)
+
+        while i < n and len(matching):
+            self.lock()
+            version = matching.version
+            indices = np.flatnonzero(matching.crossing(ticks[i:, 1], ticks[i:, 2])) + i
+            self.unlock()
+
+            i = n
+
+            for j in indices.tolist():
+                t, market.bid, market.ofr, volume = ticks[j].tolist()
+                market.last_update_time = t
+
+                self.__match_orders(market, volume if volume > 0.0 else None)
+
+                if matching.version != version or not len(matching):
+                    # more aggressive thresholds, or nothing more to match
+                    i = j + 1
+                    break
+
+        market.last_update_time, market.bid, market.ofr = last_update_time, bid, ofr
+
+    def __consume(self, levels, price, direction, quantity):
+        """
+        Consume up to quantity of the levels [price, size] at price or better, returns the consumed quantity.
+        """
+        consumed = 0.0
+
+        for level in levels:
+            if consumed >= quantity:
+                break
+
+            if (direction == Position.LONG and level[0] > price) or (direction == Position.SHORT and level[0] < price):
+                break
+
+            size = min(level[1], quantity - consumed)
+            level[1] -= size
+            consumed += size
+
+        return consumed
+
+    def __fill_order(self, order, market, exec_price, quantity):
+        """
+        Execute a fill of a resting order, as an order of the filled quantity at the execution price.
+        The resting order is removed once completed, or if the fill is rejected.
+        """
+        fill = copy.copy(order)
+        fill.quantity = quantity
+        fill.executed = 0.0
+
+        order.executed += quantity
+        order.transact_time = self.timestamp
+
+        if market.trade == market.TRADE_BUY_SELL:
+            result = self.__exec_buysell_order(fill, market, exec_price, exec_price)
+        else:
+            result = self.__exec_margin_order(fill, market, exec_price, exec_price)
+
+        if not result:
+            order.executed -= quantity
+
+        elif fill.position_id and not order.position_id:
+            # the next fills increase the position opened by the first one
+            order.set_position_id(fill.position_id)
+
+        if not result or order.executed >= order.quantity:
+            self.lock()
+
+            self._orders.pop(order.order_id, None)
+
+            matching = self._matching.get(order.symbol)
+            if matching:
+                matching.remove(order)
+
+            self.unlock()
+
+            if not result:
+                self.service.watcher_service.notify(Signal.SIGNAL_ORDER_DELETED, self.name, (order.symbol, order.order_id, ""))
+
+        return result
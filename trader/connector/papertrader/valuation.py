@@ -0,0 +1,261 @@
+# @date 2019-06-23
+# @author Frederic SCHERMA
+# @license Copyright (c) 2019 Dream Overflow
+# Paper trader incremental account valuation.
+
+import logging
+logger = logging.getLogger('siis.trader.papertrader.valuation')
+
+
+class AssetPath(object):
+    """
+    Conversion path of an asset to the account currency, resolved once : the market giving its price and the market
+    giving the exchange rate of its quote, each possibly inverted. A missing market counts as a rate of 1.0.
+    """
+
+    __slots__ = 'quote', 'price_market_id', 'price_invert', 'rate_market_id', 'rate_invert'
+
+    def __init__(self, asset_name, quote, currency, alt_currency):
+        self.quote = quote
+
+        # asset price in the account currency
+        if asset_name == alt_currency:
+            self.price_market_id, self.price_invert = currency + alt_currency, True
+        elif asset_name != currency:
+            self.price_market_id, self.price_invert = asset_name + currency, False
+        else:
+            self.price_market_id, self.price_invert = None, False
+
+        # exchange rate of the asset quote to the account currency
+        if quote == alt_currency:
+            self.rate_market_id, self.rate_invert = currency + alt_currency, False
+        elif quote != currency:
+            self.rate_market_id, self.rate_invert = quote + currency, True
+        else:
+            self.rate_market_id, self.rate_invert = None, False
+
+    @staticmethod
+    def rate(markets, market_id, invert):
+        market = markets.get(market_id) if market_id else None
+        if market is None:
+            return 1.0
+
+        return 1.0 / market.price if invert else market.price
+
+
+class AccountValuation(object):
+    """
+    Incremental valuation of the paper trader account : the balance, the margin balance and the unrealized
+    profit/loss are the sums of a contribution per asset (asset account) or per position (margin account), and only
+    the contributions of the assets and positions affected since the last update are recomputed.
+
+    An asset is affected when its quantity changes, or when a market of its conversion path or its own market is
+    updated. A position is affected when its market is updated or when an order is executed on it.
+
+    Not thread safe, the trader must lock around.
+    """
+
+    def __init__(self, trader):
+        self._trader = trader
+
+        self._currencies = None      # account (currency, alt currency) of the paths
+        self._paths = {}             # asset name : AssetPath
+        self._assets_by_market = {}  # market id : set of asset names depending of it
+
+        self._dirty_assets = set()
+        self._dirty_markets = set()
+
+        self._asset_values = {}     # asset name : (balance, margin balance, profit/loss)
+        self._position_values = {}  # position id : (used margin, profit/loss)
+
+        self._balance = 0.0
+        self._margin_balance = 0.0
+        self._asset_profit_loss = 0.0
+
+        self._used_margin = 0.0
+        self._position_profit_loss = 0.0
+
+    @property
+    def balance(self):
+        return self._balance
+
+    @property
+    def margin_balance(self):
+        return self._margin_balance
+
+    @property
+    def asset_profit_loss(self):
+        return self._asset_profit_loss
+
+    @property
+    def used_margin(self):
+        return self._used_margin
+
+    @property
+    def position_profit_loss(self):
+        return self._position_profit_loss
+
+    def market_updated(self, market_id):
+        self._dirty_markets.add(market_id)
+
+    def asset_updated(self, asset_name):
+        self._dirty_assets.add(asset_name)
+
+    def reset(self):
+        """
+        Forget the conversion paths (account currencies changed) and recompute any contribution at the next update.
+        """
+        self._paths = {}
+        self._assets_by_market = {}
+
+        self._asset_values = {}
+        self._position_values = {}
+
+        self._balance = self._margin_balance = self._asset_profit_loss = 0.0
+        self._used_margin = self._position_profit_loss = 0.0
+
+        self._dirty_assets = set(self._trader._assets.keys())
+        self._dirty_markets = set(self._trader._markets.keys())
+
+    #
+    # assets
+    #
+
+    def __path(self, asset):
+        path = self._paths.get(asset.symbol)
+
+        if path is None or path.quote != asset.quote:
+            account = self._trader.account
+
+            if path is not None:
+                self.__unindex(asset.symbol, path)
+
+            path = self._paths[asset.symbol] = AssetPath(asset.symbol, asset.quote, account.currency, account.alt_currency)
+
+            # the asset depends of its price and rate markets, and of its own market for its profit/loss
+            for market_id in (path.price_market_id, path.rate_market_id, asset.symbol + asset.quote):
+                if market_id:
+                    self._assets_by_market.setdefault(market_id, set()).add(asset.symbol)
+
+        return path
+
+    def __unindex(self, asset_name, path):
+        for market_id in (path.price_market_id, path.rate_market_id, asset_name + path.quote):
+            if market_id and market_id in self._assets_by_market:
+                self._assets_by_market[market_id].discard(asset_name)
+
+    def update_assets(self):
+        """
+        Recompute the contributions of the affected assets.
+        @return True if something changed.
+        """
+        account = self._trader.account
+
+        if self._currencies != (account.currency, account.alt_currency):
+            self.reset()
+            self._currencies = (account.currency, account.alt_currency)
+
+        assets = self._trader._assets
+        markets = self._trader._markets
+
+        # the new assets must be indexed before resolving the affected ones by market
+        for asset_name in self._dirty_assets:
+            asset = assets.get(asset_name)
+            if asset is not None:
+                self.__path(asset)
+
+        dirty = self._dirty_assets
+
+        for market_id in self._dirty_markets:
+            names = self._assets_by_market.get(market_id)
+            if names:
+                dirty |= names
+
+        self._dirty_assets = set()
+        self._dirty_markets = set()
+
+        if not dirty:
+            return False
+
+        for asset_name in dirty:
+            asset = assets.get(asset_name)
+
+            prev = self._asset_values.pop(asset_name, None)
+            if prev is not None:
+                self._balance -= prev[0]
+                self._margin_balance -= prev[1]
+                self._asset_profit_loss -= prev[2]
+
+            if asset is None:
+                continue
+
+            free = asset.free
+            locked = asset.locked
+
+            if not free and not locked:
+                continue
+
+            path = self.__path(asset)
+
+            base_price = AssetPath.rate(markets, path.price_market_id, path.price_invert)
+            base_exchange_rate = AssetPath.rate(markets, path.rate_market_id, path.rate_invert)
+
+            value = ((free + locked) * base_price, free * base_price, asset.profit_loss_market / base_exchange_rate)
+
+            self._asset_values[asset_name] = value
+
+            self._balance += value[0]
+            self._margin_balance += value[1]
+            self._asset_profit_loss += value[2]
+
+        return True
+
+    #
+    # positions
+    #
+
+    def update_positions(self):
+        """
+        Recompute the contributions of the positions of the affected markets, and of the new or removed positions.
+        @return True if something changed.
+        """
+        positions = self._trader._positions
+        markets = self._trader._markets
+
+        dirty_markets = self._dirty_markets
+        self._dirty_markets = set()
+
+        changed = False
+
+        for position_id in [k for k in self._position_values if k not in positions]:
+            # removed position
+            prev = self._position_values.pop(position_id)
+            self._used_margin -= prev[0]
+            self._position_profit_loss -= prev[1]
+            changed = True
+
+        for position_id, position in positions.items():
+            if position.symbol not in dirty_markets and position_id in self._position_values:
+                continue
+
+            prev = self._position_values.pop(position_id, None)
+            if prev is not None:
+                self._used_margin -= prev[0]
+                self._position_profit_loss -= prev[1]
+
+            changed = True
+
+            market = markets.get(position.symbol)
+
+            # only for non empty positions
+            if market is None or position.quantity <= 0.0:
+                continue
+
+            value = (position.margin_cost(market) / market.base_exchange_rate, position.profit_loss_market / market.base_exchange_rate)
+
+            self._position_values[position_id] = value
+
+            self._used_margin += value[0]
+            self._position_profit_loss += value[1]
+
+        return changed
@@ -7,12 +7,12 @@ import time
 import copy
 import base64
 import uuid
-import collections
 
 from datetime import datetime
 
 from notifier.notifiable import Notifiable
 from notifier.signal import Signal
+from notifier.signalqueue import SignalQueue
 
 from trader.order import Order
 from trader.position import Position
@@ -46,6 +46,14 @@ class Trader(Runnable):
 
     MAX_SIGNALS = 1000                        # max signals queue size before ignore some market data updates
 
+    # signals of interest from the watcher of the same name
+    WATCHER_SIGNALS = (
+        Signal.SIGNAL_MARKET_DATA, Signal.SIGNAL_ACCOUNT_DATA, Signal.SIGNAL_WATCHER_CONNECTED, Signal.SIGNAL_WATCHER_DISCONNECTED,
+        Signal.SIGNAL_POSITION_OPENED, Signal.SIGNAL_POSITION_UPDATED, Signal.SIGNAL_POSITION_DELETED, Signal.SIGNAL_POSITION_AMENDED,
+        Signal.SIGNAL_ORDER_OPENED, Signal.SIGNAL_ORDER_UPDATED, Signal.SIGNAL_ORDER_DELETED, Signal.SIGNAL_ORDER_REJECTED,
+        Signal.SIGNAL_ORDER_CANCELED, Signal.SIGNAL_ORDER_TRADED,
+        Signal.SIGNAL_ASSET_UPDATED)
+
     PURGE_COMMANDS_DELAY = 180                # 180s keep commands in seconds
     MAX_COMMANDS_QUEUE = 100
 
@@ -87,10 +95,10 @@ class Trader(Runnable):
         self._markets = {}
 
         self._timestamp = 0
-        self._signals = collections.deque()  # filtered received signals
+        self._signals = SignalQueue(Trader.MAX_SIGNALS, SignalQueue.POLICY_COALESCE)  # filtered received signals
 
-        # listen to its service
-        self.service.add_listener(self)
+        # listen to its service (in fact it comes from the DB service but request in self trader name)
+        self.service.subscribe(self, (Signal.SIGNAL_ASSET_DATA, Signal.SIGNAL_ASSET_DATA_BULK), queue=self._signals)
 
         # streaming
         self.setup_streaming()
@@ -214,8 +222,8 @@ class Trader(Runnable):
     def post_update(self):
         if len(self._signals) > Trader.MAX_SIGNALS:
             # saturation of the signal message queue
-            Terminal.inst().warning("Trader %s has more than %s waiting signals, could ignore some market data !" % (
-                self.name, Trader.MAX_SIGNALS), view='status')
+            Terminal.inst().warning("Trader %s has more than %s waiting signals, %s market data ignored !" % (
+                self.name, Trader.MAX_SIGNALS, self._signals.dropped), view='status')
 
         # streaming
         self.stream()
@@ -249,6 +257,8 @@ class Trader(Runnable):
                 elif signal.signal_type == Signal.SIGNAL_MARKET_DATA:
                     # update instrument data during live mode
                     self.on_update_market(*signal.data)
+                elif signal.signal_type == Signal.SIGNAL_ORDER_BOOK:
+                    self.on_order_book(*signal.data)
                 elif signal.signal_type == Signal.SIGNAL_ACCOUNT_DATA:
                     self.on_account_updated(*signal.data)
 
@@ -673,43 +683,15 @@ class Trader(Runnable):
     # signals
     #
 
-    def receiver(self, signal):
+    def subscribe_watcher(self):
         """
-        Notifiable listener.
-        """ 
-        if signal.source == Signal.SOURCE_WATCHER:
-            if signal.source_name != self._name:
-                # only interested by the watcher of the same name
-                return
-
-            if signal.signal_type == Signal.SIGNAL_MARKET_DATA:
-                if not self.has_market(signal.data[0]):
-                    # non interested by this instrument/symbol
-                    return
-
-                if len(self._signals) > Trader.MAX_SIGNALS:
-                    # if trader message queue saturate its mostly because of market data too many update
-                    # then ignore some of those message, the others ones are too important to be ignored
-                    return
-
-            elif signal.signal_type not in (
-                    Signal.SIGNAL_ACCOUNT_DATA, Signal.SIGNAL_WATCHER_CONNECTED, Signal.SIGNAL_WATCHER_DISCONNECTED,
-                    Signal.SIGNAL_POSITION_OPENED, Signal.SIGNAL_POSITION_UPDATED, Signal.SIGNAL_POSITION_DELETED, Signal.SIGNAL_POSITION_AMENDED,
-                    Signal.SIGNAL_ORDER_OPENED, Signal.SIGNAL_ORDER_UPDATED, Signal.SIGNAL_ORDER_DELETED, Signal.SIGNAL_ORDER_REJECTED,
-                    Signal.SIGNAL_ORDER_CANCELED, Signal.SIGNAL_ORDER_TRADED,
-                    Signal.SIGNAL_ASSET_UPDATED):
-                return
-
-            # signal of interest
-            self._signals.append(signal)
-
-        elif signal.source == Signal.SOURCE_TRADER:  # in fact it comes from the DB service but request in self trader name
-            if signal.signal_type not in (Signal.SIGNAL_ASSET_DATA, Signal.SIGNAL_ASSET_DATA_BULK):
-                # non interested by others signals
-                return 
+        Subscribe to the signals of the watcher of the same name, for the markets of this trader.
+        The market data are coalesced per market into the signals queue.
+        """
+        self.service.watcher_service.subscribe(self, self.WATCHER_SIGNALS, (self._name,), self._markets, self._signals)
 
-            # signal of interest
-            self._signals.append(signal)
+    def unsubscribe_watcher(self):
+        self.service.watcher_service.remove_listener(self)
 
     def on_watcher_connected(self, watcher_name):
         msg = "Trader %s joined %s watcher connection." % (self.name, watcher_name)
@@ -989,6 +971,20 @@ class Trader(Runnable):
         # push last price to keep a local cache of history
         market.push_price()
 
+    def on_update_market_ticks(self, market_id, tradable, ticks, base_exchange_rate):
+        """
+        Update a market from the ticks of a backtesting timestep, list of tuples or 2d array of
+        (timestamp, bid, ofr, volume). The default implementation only uses the last tick.
+        """
+        if len(ticks):
+            self.on_update_market(market_id, tradable, ticks[-1][0], ticks[-1][1], ticks[-1][2], base_exchange_rate)
+
+    def on_order_book(self, market_id, bids, asks):
+        """
+        Order book of a market, only received if SIGNAL_ORDER_BOOK is part of the WATCHER_SIGNALS of the trader.
+        """
+        pass
+
     #
     # utils
     #
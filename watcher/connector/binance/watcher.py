@@ -21,6 +21,7 @@ from trader.order import Order
 from trader.market import Market
 
 from instrument.instrument import Instrument, Candle, Tick
+from instrument.orderbook import OrderBook
 
 from config import config
 
@@ -69,7 +70,8 @@ class BinanceWatcher(Watcher):
         super().__init__("binance.com", service, Watcher.WATCHER_PRICE_AND_VOLUME)
 
         self._connector = None
-        self._depths = {}  # depth chart per symbol tuple (last_id, bids, ofrs)
+        self._order_books = {}     # OrderBook per symbol
+        self._order_book_depth = 0  # number of levels of the order book signals, 0 for none
 
         self._acount_data = {}
         self._symbols_data = {}
@@ -112,6 +114,7 @@ class BinanceWatcher(Watcher):
                 self.__prefetch_markets()
 
                 multiplex = []
+                self._order_book_depth = self.order_book_depth()
 
                 for instrument in instruments:
                     self._available_instruments.add(instrument['symbol'])
@@ -122,7 +125,8 @@ class BinanceWatcher(Watcher):
                         symbol = instrument['symbol'].lower()
 
                         # depth - order book
-                        # multiplex.append(symbol + '@depth')
+                        if self._order_book_depth > 0:
+                            multiplex.append(symbol + '@depth')
 
                         # aggreged trade
                         multiplex.append(symbol + '@aggTrade')
@@ -209,6 +213,12 @@ class BinanceWatcher(Watcher):
         if not self.connected:
             return False
 
+        #
+        # process the websocket messages received since the last update
+        #
+
+        self._connector.ws.drain()
+
         #
         # ohlc close/open
         #
@@ -402,54 +412,22 @@ class BinanceWatcher(Watcher):
                 self.service.notify(Signal.SIGNAL_MARKET_DATA, self.name, market_data)
 
     def __on_depth_data(self, data):
-        # @todo using binance.DepthCache
-        return
-
         if data['e'] == 'depthUpdate':
             symbol = data['s']
 
-            if symbol not in self._depths:
-                # initial snapshot of the order book from REST API
-                initial = self._connector.client.get_order_book(symbol=symbol, limit=100)
-
-                bids = {}
-                asks = {}
-
-                for bid in initial['bids']:
-                    bids[bid[0]] = bid[1]
-
-                for ask in initial['asks']:
-                    asks[ask[0]] = ask[1]
+            order_book = self._order_books.get(symbol)
+            if order_book is None:
+                order_book = self._order_books[symbol] = OrderBook(symbol)
 
-                self._depths[symbol] = [initial.get('lastUpdateId', 0), bids, asks]
-
-            depth = self._depths[symbol]
-
-            # The first processed should have U <= lastUpdateId+1 AND u >= lastUpdateId+1
-            if data['u'] <= depth[0] or data['U'] >= depth[0]:
-                # drop event if older than the last snapshot
-                return
-
-            if data['U'] != depth[0] + 1:
-                logger.warning("Watcher %s, there is a gap into depth data for symbol %s" % (self._name, symbol))
-
-            for bid in data['b']:
-                # if data['U'] <= depth[0]+1 and data['u'] >= depth[0]+1:
-                if bid[1] == 0:
-                    del depth[1][bid[0]]  # remove at price
-                else:
-                    depth[2][bid[0]] = bid[1]  # price : volume
-
-            for ask in data['a']:
-                if ask[1] == 0:
-                    del depth[2][ask[0]]
-                else:
-                    depth[2][ask[0]] = ask[1]
+            if not order_book.update(data['b'], data['a'], data['U'], data['u'], data['E'] * 0.001):
+                # not initialized or gap, snapshot of the order book from REST API and retry
+                snapshot = self._connector.client.get_order_book(symbol=symbol, limit=100 if self._order_book_depth <= 100 else 1000)
+                order_book.snapshot(snapshot['bids'], snapshot['asks'], snapshot.get('lastUpdateId', 0), data['E'] * 0.001)
 
-            # last processed id, next must be +1
-            depth[0] = data['u']
+                if not order_book.update(data['b'], data['a'], data['U'], data['u'], data['E'] * 0.001):
+                    return
 
-            # self.service.notify(Signal.SIGNAL_ORDER_BOOK, self.name, (symbol, depth[1], depth[2]))
+            self.service.notify(Signal.SIGNAL_ORDER_BOOK, self.name, order_book.signal_data(self._order_book_depth))
 
     def __on_multiplex_data(self, data):
         """
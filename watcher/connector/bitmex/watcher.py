@@ -48,6 +48,7 @@ class BitMexWatcher(Watcher):
         super().__init__("bitmex.com", service, Watcher.WATCHER_PRICE_AND_VOLUME)
 
         self._connector = None
+        self._order_book_depth = 0  # number of levels of the order book signals, 0 for none
 
     def connect(self):
         super().connect()
@@ -57,6 +58,8 @@ class BitMexWatcher(Watcher):
             identity = self.service.identity(self._name)
 
             if identity:
+                self._order_book_depth = self.order_book_depth()
+
                 if not self._connector:
                     self._connector = Connector(
                         self.service,
@@ -64,7 +67,8 @@ class BitMexWatcher(Watcher):
                         identity.get('api-secret'),
                         self.configured_symbols(),  # want WS subscribes to thats instruments or all if ['*']
                         identity.get('host'),
-                        (self, BitMexWatcher._ws_message))
+                        (self, BitMexWatcher._ws_message),
+                        self._order_book_depth > 0)
 
                 # get list of all availables instruments, and list of subscribed
                 self._available_instruments = set(self._connector.all_instruments)
@@ -485,10 +489,10 @@ class BitMexWatcher(Watcher):
             #
             
             elif data[1] == 'orderBookL2_25' and data[2]:
-                pass
-                # for market_id in data[2]:
-                #   market_depth = self.connector.ws.market_depth(market_id)
-                #   self.service.notify(Signal.SIGNAL_ORDER_BOOK, self.name, (market_id, market_depth[0], market_depth[1]))
+                for market_id in data[2]:
+                    order_book = self.connector.ws.order_book(market_id)
+                    if order_book:
+                        self.service.notify(Signal.SIGNAL_ORDER_BOOK, self.name, order_book.signal_data(self._order_book_depth))
 
     def fetch_market(self, market_id):
         """
@@ -10,6 +10,7 @@ from importlib import import_module
 
 from config import utils
 from common.service import Service
+from common.wsingest import WebSocketIngest
 
 from notifier.signal import Signal
 
@@ -104,6 +105,9 @@ class WatcherService(Service):
 
         self._watchers = {}
 
+        # and the websocket streams shared by the watchers
+        WebSocketIngest.terminate()
+
     def notify(self, signal_type, source_name, signal_data):
         if signal_data is None:
             return
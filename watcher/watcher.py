@@ -137,6 +137,16 @@ class Watcher(Runnable):
 
         return set(configured_symbols)
 
+    def order_book_depth(self):
+        """
+        Configured number of levels of the order book signals, 0 if the order books are not watched.
+        """
+        watcher_config = self.service.watcher_config(self._name)
+        if watcher_config:
+            return watcher_config.get('order-book-depth', 0)
+
+        return 0
+
     def matching_symbols_set(self, configured_symbols, available_symbols):
         """
         Special '*' symbol mean every symbol.